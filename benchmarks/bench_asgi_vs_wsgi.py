@@ -0,0 +1,119 @@
+"""
+Throughput of an I/O-bound route with many concurrent clients, served by the threaded Werkzeug server
+and by uvicorn through MLServer.asgi_app().
+
+The ML function sleeps for DELAY seconds to stand in for a call to a remote model. The WSGI server holds
+one thread per connection while the ASGI server awaits the async function on its event loop.
+
+Needs uvicorn: pip install flask_ml[asgi]
+Run with: python benchmarks/bench_asgi_vs_wsgi.py
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict
+
+import requests
+from werkzeug.serving import make_server
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import ResponseBody, TextInput, TextResponse
+
+DELAY = 0.05
+CLIENTS = 64
+REQUESTS = 1024
+
+
+class Inputs(TypedDict):
+    text_input: TextInput
+
+
+class Parameters(TypedDict):
+    pass
+
+
+server = MLServer(__name__)
+
+
+@server.route("/remote_model")
+async def remote_model(inputs: Inputs, parameters: Parameters) -> ResponseBody:
+    await asyncio.sleep(DELAY)
+    return ResponseBody(root=TextResponse(value=inputs["text_input"].text))
+
+
+PAYLOAD = {"inputs": {"text_input": {"text": "hello"}}, "parameters": {}}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str):
+    for _ in range(100):
+        try:
+            requests.get(url + "/api/routes", timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def measure(url: str) -> float:
+    session_local = threading.local()
+
+    def send(_):
+        if not hasattr(session_local, "session"):
+            session_local.session = requests.Session()
+        response = session_local.session.post(url + "/remote_model", json=PAYLOAD)
+        assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        list(pool.map(send, range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def bench_wsgi() -> float:
+    port = free_port()
+    wsgi_server = make_server("127.0.0.1", port, server.app, threaded=True)
+    thread = threading.Thread(target=wsgi_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}")
+        return measure(f"http://127.0.0.1:{port}")
+    finally:
+        wsgi_server.shutdown()
+
+
+def bench_asgi(uvicorn) -> float:
+    port = free_port()
+    config = uvicorn.Config(server.asgi_app(), host="127.0.0.1", port=port, log_level="warning")
+    asgi_server = uvicorn.Server(config)
+    thread = threading.Thread(target=asgi_server.run, daemon=True)
+    thread.start()
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}")
+        return measure(f"http://127.0.0.1:{port}")
+    finally:
+        asgi_server.should_exit = True
+        thread.join()
+
+
+def main():
+    try:
+        import uvicorn
+    except ImportError:
+        print("Skipping: uvicorn is not installed. Install it with: pip install flask_ml[asgi]")
+        return
+    print(f"{CLIENTS} clients, {REQUESTS} requests, {DELAY * 1000:.0f}ms per request")
+    print(f"WSGI (werkzeug, threaded): {bench_wsgi():8.1f} req/s")
+    print(f"ASGI (uvicorn):            {bench_asgi(uvicorn):8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Per-request overhead of turning a small JSON payload into ML function arguments.
+
+Compares the old path, which re-ran the task schema function, the schema/type-hint checks and the key
+lookups on every request, with the request plan compiled once at route registration.
+
+Run with: python benchmarks/bench_request_plan.py
+"""
+
+import timeit
+from typing import TypedDict, get_type_hints
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import (
+    EnumParameterDescriptor,
+    EnumVal,
+    InputSchema,
+    InputType,
+    ParameterSchema,
+    ResponseBody,
+    TaskSchema,
+    TextInput,
+    TextResponse,
+)
+from flask_ml.flask_ml_server.request_plan import compile_schema_request_plan
+from flask_ml.flask_ml_server.utils import (
+    ensure_ml_func_hinting_and_task_schemas_are_valid,
+    no_schema_get_inputs,
+    no_schema_get_parameters,
+    schema_get_inputs,
+    schema_get_parameters,
+    validate_data_has_keys,
+)
+
+NUMBER = 5000
+
+
+class Inputs(TypedDict):
+    text_input: TextInput
+
+
+class Parameters(TypedDict):
+    to_case: str
+
+
+def task_schema() -> TaskSchema:
+    return TaskSchema(
+        inputs=[InputSchema(key="text_input", label="Text", input_type=InputType.TEXT)],
+        parameters=[
+            ParameterSchema(
+                key="to_case",
+                label="Case",
+                value=EnumParameterDescriptor(
+                    enum_vals=[EnumVal(key="upper", label="UPPER"), EnumVal(key="lower", label="LOWER")],
+                    default="upper",
+                ),
+            )
+        ],
+    )
+
+
+def transform(inputs: Inputs, parameters: Parameters) -> ResponseBody:
+    return ResponseBody(root=TextResponse(value=inputs["text_input"].text.upper()))
+
+
+def transform_no_schema(inputs: Inputs, parameters: Parameters) -> ResponseBody:
+    return transform(inputs, parameters)
+
+
+DATA = {"inputs": {"text_input": {"text": "hello"}}, "parameters": {"to_case": "upper"}}
+
+
+def legacy_schema_parse():
+    validate_data_has_keys(DATA, ["inputs", "parameters"])
+    schema = task_schema()
+    ensure_ml_func_hinting_and_task_schemas_are_valid(transform, schema)
+    schema_get_inputs(schema, DATA["inputs"])
+    schema_get_parameters(schema, DATA["parameters"])
+
+
+HINTS = get_type_hints(transform)
+
+
+def legacy_no_schema_parse():
+    validate_data_has_keys(DATA, ["inputs", "parameters"])
+    no_schema_get_inputs(get_type_hints(HINTS["inputs"]), DATA["inputs"])
+    no_schema_get_parameters(get_type_hints(HINTS["parameters"]), DATA["parameters"])
+
+
+PLAN = compile_schema_request_plan(task_schema())
+
+
+def plan_parse():
+    PLAN.parse(DATA)
+
+
+def build_client():
+    server = MLServer(__name__)
+    server.route("/schema", task_schema)(transform)
+    server.route("/no_schema")(transform_no_schema)
+    return server.app.test_client()
+
+
+def per_call_us(func, number=NUMBER) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    print(f"{'legacy schema parse':<32}{per_call_us(legacy_schema_parse):>10.2f} us")
+    print(f"{'legacy no-schema parse':<32}{per_call_us(legacy_no_schema_parse):>10.2f} us")
+    print(f"{'compiled plan parse':<32}{per_call_us(plan_parse):>10.2f} us")
+
+    client = build_client()
+    for rule in ["/schema", "/no_schema"]:
+        us = per_call_us(lambda: client.post(rule, json=DATA), number=NUMBER // 10)
+        print(f"{'end-to-end POST ' + rule:<32}{us:>10.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+The benchmark suite of the request pipeline, the models and the CLI.
+
+Each benchmark reports the best and median time per call over several rounds, in microseconds. Results
+can be written as JSON and compared with an earlier run, which makes the command fail when a benchmark
+got slower than the threshold allows. The cli/startup benchmarks time whole CLI processes, from the
+interpreter start to the exit, and have a wider threshold of their own.
+
+Run with:
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline results.json --threshold 0.1
+    python benchmarks/suite.py --quick --filter post
+    python benchmarks/suite.py --filter cli/startup --baseline results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, TypedDict
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import (
+    BatchTextInput,
+    BatchTextResponse,
+    EnumParameterDescriptor,
+    EnumVal,
+    FloatParameterDescriptor,
+    InputSchema,
+    InputType,
+    IntParameterDescriptor,
+    ParameterSchema,
+    ResponseBody,
+    TaskSchema,
+    TextInput,
+    TextParameterDescriptor,
+    TextResponse,
+)
+from flask_ml.flask_ml_server.utils import schema_get_sample_payload
+
+# The CLI startup benchmarks run simple_cli.py from the root of the repository.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000]
+QUICK_MAX_BATCH_SIZE = 1_000
+
+Setup = Callable[[], Callable[[], Any]]
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    name: str
+    setup: Setup
+    items: int = 1
+    quick: bool = True
+    threshold: Optional[float] = None
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, items: int = 1, quick: bool = True, threshold: Optional[float] = None):
+    """
+    Registers a setup function. It runs once, outside the timing, and returns the function to time.
+    threshold : float - the slowdown that counts as a regression for this benchmark, instead of --threshold
+    """
+
+    def register(setup: Setup) -> Setup:
+        BENCHMARKS.append(Benchmark(name, setup, items, quick, threshold))
+        return setup
+
+    return register
+
+
+class TextInputs(TypedDict):
+    text_input: TextInput
+
+
+class BatchTextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class CaseParameters(TypedDict):
+    to_case: str
+
+
+def case_task_schema() -> TaskSchema:
+    return TaskSchema(
+        inputs=[InputSchema(key="text_input", label="Text", input_type=InputType.TEXT)],
+        parameters=[
+            ParameterSchema(
+                key="to_case",
+                label="Case",
+                value=EnumParameterDescriptor(
+                    enum_vals=[EnumVal(key="upper", label="UPPER"), EnumVal(key="lower", label="LOWER")],
+                    default="upper",
+                ),
+            )
+        ],
+    )
+
+
+def batch_task_schema() -> TaskSchema:
+    return TaskSchema(
+        inputs=[InputSchema(key="text_inputs", label="Texts", input_type=InputType.BATCHTEXT)],
+        parameters=[
+            ParameterSchema(key="to_case", label="Case", value=TextParameterDescriptor(default="upper"))
+        ],
+    )
+
+
+def build_server() -> MLServer:
+    server = MLServer(__name__)
+
+    def transform(inputs: TextInputs, parameters: CaseParameters) -> ResponseBody:
+        return ResponseBody(root=TextResponse(value=inputs["text_input"].text.upper()))
+
+    def transform_no_schema(inputs: TextInputs, parameters: CaseParameters) -> ResponseBody:
+        return transform(inputs, parameters)
+
+    def transform_batch(inputs: BatchTextInputs, parameters: CaseParameters) -> ResponseBody:
+        texts = [TextResponse(value=text_input.text.upper()) for text_input in inputs["text_inputs"].texts]
+        return ResponseBody(root=BatchTextResponse(texts=texts))
+
+    server.route("/schema", case_task_schema)(transform)
+    server.route("/no_schema")(transform_no_schema)
+    server.route("/batch", batch_task_schema)(transform_batch)
+    return server
+
+
+SINGLE_TEXT = {"inputs": {"text_input": {"text": "hello"}}, "parameters": {"to_case": "upper"}}
+
+
+def batch_payload(size: int) -> Dict[str, Any]:
+    texts = [{"text": f"text number {i}"} for i in range(size)]
+    return {"inputs": {"text_inputs": {"texts": texts}}, "parameters": {"to_case": "upper"}}
+
+
+def post(rule: str, data: Dict[str, Any]) -> Callable[[], Any]:
+    client = build_server().app.test_client()
+    body = json.dumps(data)
+
+    def send():
+        response = client.post(rule, data=body, content_type="application/json")
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    return send
+
+
+@benchmark("post/schema")
+def post_schema():
+    return post("/schema", SINGLE_TEXT)
+
+
+@benchmark("post/no_schema")
+def post_no_schema():
+    return post("/no_schema", SINGLE_TEXT)
+
+
+for size in BATCH_SIZES:
+    benchmark(f"post/batch/{size}", items=size, quick=size <= QUICK_MAX_BATCH_SIZE)(
+        lambda size=size: post("/batch", batch_payload(size))
+    )
+
+
+@benchmark("schema_get_sample_payload")
+def sample_payload():
+    task_schema = TaskSchema(
+        inputs=[
+            InputSchema(key="text_input", label="Text", input_type=InputType.TEXT),
+            InputSchema(key="file_inputs", label="Files", input_type=InputType.BATCHFILE),
+            InputSchema(key="directory", label="Directory", input_type=InputType.DIRECTORY),
+        ],
+        parameters=[
+            ParameterSchema(key="threshold", label="Threshold", value=FloatParameterDescriptor(default=0.5)),
+            ParameterSchema(key="top_k", label="Top k", value=IntParameterDescriptor(default=5)),
+            ParameterSchema(key="to_case", label="Case", value=TextParameterDescriptor(default="upper")),
+        ],
+    )
+    return lambda: schema_get_sample_payload(task_schema)
+
+
+for size in BATCH_SIZES:
+    benchmark(f"model_dump_json/batch/{size}", items=size, quick=size <= QUICK_MAX_BATCH_SIZE)(
+        lambda size=size: ResponseBody(
+            root=BatchTextResponse(texts=[TextResponse(value=f"text number {i}") for i in range(size)])
+        ).model_dump_json
+    )
+
+
+@benchmark("cli/setup")
+def cli_setup():
+    from flask_ml.flask_ml_cli import MLCli
+
+    server = build_server()
+
+    def setup():
+        cli = MLCli(server, argparse.ArgumentParser())
+        cli._setup_cli()
+        cli._parse_args(["schema", "--text_input", "hello"])
+
+    return setup
+
+
+# Starting a process is noisier than the in-process benchmarks, so the startup ones get a wider threshold.
+STARTUP_THRESHOLD = 0.25
+
+
+def startup(command: List[str]) -> Callable[[], Any]:
+    def start():
+        subprocess.run(command, cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL)
+
+    return start
+
+
+@benchmark("cli/startup/import", threshold=STARTUP_THRESHOLD)
+def cli_startup_import():
+    return startup([sys.executable, "-c", "import flask_ml.flask_ml_cli"])
+
+
+@benchmark("cli/startup", threshold=STARTUP_THRESHOLD)
+def cli_startup():
+    return startup([sys.executable, os.path.join(REPO_ROOT, "simple_cli.py"), "--help"])
+
+
+@benchmark("cli/startup/run", threshold=STARTUP_THRESHOLD)
+def cli_startup_run():
+    simple_cli = os.path.join(REPO_ROOT, "simple_cli.py")
+    return startup([sys.executable, simple_cli, "transform_case", "--text_inputs", "hello"])
+
+
+@dataclass
+class Result:
+    min_us: float
+    median_us: float
+    number: int
+    repeat: int
+    items_per_second: Optional[float] = None
+
+
+def measure(func: Callable[[], Any], repeat: int, items: int) -> Result:
+    timer = timeit.Timer(func)
+    # autorange picks the number of calls that takes at least 0.2 seconds and times them once.
+    number, first = timer.autorange()
+    rounds = [first] + timer.repeat(repeat=repeat - 1, number=number)
+    per_call = [seconds / number for seconds in rounds]
+    best = min(per_call)
+    return Result(
+        min_us=best * 1e6,
+        median_us=statistics.median(per_call) * 1e6,
+        number=number,
+        repeat=repeat,
+        items_per_second=items / best if items > 1 else None,
+    )
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float
+) -> List[str]:
+    """
+    Prints the change of every benchmark in both runs and returns the names of those that got slower than
+    the threshold allows, or the threshold of the benchmark when it has one. The best time is compared, as
+    it is the least affected by noise.
+    """
+    thresholds = {bench.name: bench.threshold for bench in BENCHMARKS if bench.threshold is not None}
+    regressions = []
+    print(f"\n{'benchmark':<32}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["min_us"], result["min_us"]
+        change = after / before - 1
+        flag = ""
+        if change > thresholds.get(name, threshold):
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<32}{before:>12.1f}us{after:>12.1f}us{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="the slowdown that counts as a regression (0.1 = 10%%)"
+    )
+    parser.add_argument("--filter", default="", help="only run the benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="the number of timed rounds per benchmark")
+    parser.add_argument("--quick", action="store_true", help=f"skip batches above {QUICK_MAX_BATCH_SIZE} items")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for bench in BENCHMARKS:
+        if args.filter not in bench.name or (args.quick and not bench.quick):
+            continue
+        result = measure(bench.setup(), args.repeat, bench.items)
+        results[bench.name] = asdict(result)
+        throughput = f"{result.items_per_second:>14,.0f} items/s" if result.items_per_second else ""
+        print(f"{bench.name:<32}{result.min_us:>12.1f}us{result.median_us:>12.1f}us{throughput}")
+
+    if args.output:
+        report = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,20 @@
 from argparse import ArgumentParser, Namespace
+import asyncio
+import inspect
 import json
+import sys
 from typing import Callable, Optional, Sequence, Union
 from typing_extensions import assert_never
 
+from flask_ml.flask_ml_cli.batch import BatchSummary, run_jsonl
 from flask_ml.flask_ml_cli.utils import (
     get_float_range_check_func_arg_parser,
     get_int_range_check_func_arg_parser,
     is_pathname_valid_arg_parser,
 )
 from flask_ml.flask_ml_server import MLServer
-from flask_ml.flask_ml_server.MLServer import EndpointDetails
+from flask_ml.flask_ml_server.MLServer import EndpointDetails, EndpointDetailsNoSchema
+from flask_ml.flask_ml_server.streaming import collect_stream, is_stream
 from flask_ml.flask_ml_server.models import (
     BatchDirectoryInput,
     BatchFileInput,
@@ -73,6 +78,41 @@ def get_enum_parameter_choices(parameter_schema: ParameterSchema):
     return [item.key for item in parameter_schema.value.enum_vals]
 
 
+def add_batch_arguments(parser: ArgumentParser):
+    group = parser.add_argument_group(
+        "batch mode", "Run every request of a JSONL file in one process instead of a subcommand."
+    )
+    group.add_argument(
+        "--from-jsonl",
+        metavar="FILE",
+        help="a file with one request per line, shaped like a request body. Use - for stdin.",
+    )
+    group.add_argument("--task", help="the subcommand to run the requests with, if there are several")
+    group.add_argument(
+        "--output", metavar="FILE", default="-", help="the file to write the results to. Defaults to stdout."
+    )
+    group.add_argument(
+        "--parallelism", type=int, default=1, help="the number of requests to run at the same time"
+    )
+
+
+class _LazySubcommandParser(ArgumentParser):
+    """
+    A subcommand parser whose arguments are only added once it parses, so that the task schemas of the
+    subcommands that were not chosen are never built.
+    """
+
+    def __init__(self, *args, populate: Optional[Callable[[ArgumentParser], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._populate = populate
+
+    def parse_known_args(self, args=None, namespace=None):  # type: ignore
+        if self._populate is not None:
+            populate, self._populate = self._populate, None
+            populate(self)
+        return super().parse_known_args(args, namespace)
+
+
 class MLCli:
     def __init__(self, server: MLServer, argument_parser: ArgumentParser, verbose=False):
         self._server = server
@@ -150,6 +190,10 @@ class MLCli:
             for parameter_schema in task_schema.parameters:
                 parameters[parameter_schema.key] = getattr(args, parameter_schema.key)
             result = ml_func(inputs, parameters)
+            if inspect.isawaitable(result):
+                result = asyncio.run(result)
+            if is_stream(result):
+                result = collect_stream(result)
             return result
 
         parser.set_defaults(func=func)
@@ -158,18 +202,15 @@ class MLCli:
         name = self._get_name_of_subcommand(endpoint)
         helpp = endpoint.short_title
 
-        task_schema = endpoint.task_schema_func()
-
-        input_schemas = task_schema.inputs
-        parameter_schemas = task_schema.parameters
-
-        subcommand_parser = subparsers.add_parser(name, help=helpp)
+        def populate(subcommand_parser: ArgumentParser):
+            task_schema = endpoint.task_schema_func()
+            for input_schema in task_schema.inputs:
+                self._add_input_argument_to_parser(subcommand_parser, input_schema)
+            for parameter_schema in task_schema.parameters:
+                self._add_parameter_argument_to_parser(subcommand_parser, parameter_schema)
+            self._set_function_on_parser(subcommand_parser, task_schema, endpoint.func)
 
-        for input_schema in input_schemas:
-            self._add_input_argument_to_parser(subcommand_parser, input_schema)
-        for parameter_schema in parameter_schemas:
-            self._add_parameter_argument_to_parser(subcommand_parser, parameter_schema)
-        self._set_function_on_parser(subcommand_parser, task_schema, endpoint.func)
+        subparsers.add_parser(name, help=helpp, populate=populate)
 
     @staticmethod
     def _print_response_body(response: ResponseBody):
@@ -225,9 +266,13 @@ class MLCli:
                 print("FATAL: At least one schema endpoint must be defined")
             raise ValueError("This model does not support the CLI. Run with verbose=True to see the error")
 
-        subparsers = self._parser.add_subparsers(help="Subcommands", required=True)
+        # Only the chosen subcommand gets its arguments, from its task schema, when it is parsed.
+        subparsers = self._parser.add_subparsers(
+            help="Subcommands", required=True, parser_class=_LazySubcommandParser
+        )
         for endpoint in schema_endpoints:
             self._add_subparser(subparsers, endpoint)
+        add_batch_arguments(self._parser)
 
     def _parse_args(self, args: Sequence[str] | None = None):
         parsed_args = self._parser.parse_args(args)
@@ -243,7 +288,72 @@ class MLCli:
             return response
         raise SystemExit("FATAL: No function defined")  # pragma: no cover
 
+    def _find_batch_endpoint(self, task: Optional[str]) -> EndpointDetailsNoSchema:
+        endpoints = {self._get_name_of_subcommand(endpoint): endpoint for endpoint in self._server.endpoints}
+        if task is None:
+            if len(endpoints) == 1:
+                return next(iter(endpoints.values()))
+            self._parser.error(f"--task is required with --from-jsonl. Choose from {sorted(endpoints)}")
+        for name, endpoint in endpoints.items():
+            if task in (name, endpoint.rule):
+                return endpoint
+        self._parser.error(f"Unknown task {task!r} for --from-jsonl. Choose from {sorted(endpoints)}")
+
+    def run_batch(
+        self, path: str, task: Optional[str] = None, output: str = "-", parallelism: int = 1
+    ) -> BatchSummary:
+        """
+        Runs every request of a JSONL file with one task, and writes the results to a JSONL file. The ML
+        functions are loaded once for all the requests. Unlike a subcommand, which calls the ML function
+        directly, the lines go through the batching, dedupe, cache and max_concurrency of the route, so
+        parallel lines are combined the way requests to the server are; they are never rejected by
+        max_concurrency, they wait for a slot. See flask_ml_cli.batch.run_jsonl.
+        path : str - the file of requests, shaped like request bodies, or - for stdin
+        task : str - the subcommand name or the rule of the task. Optional when the server has one task.
+        output : str - the file to write the results to, or - for stdout
+        parallelism : int - the number of requests to run at the same time
+        """
+        endpoint = self._find_batch_endpoint(task)
+        # Lines wait for a slot of the route instead of being rejected at its max_queue; parallelism
+        # already bounds how many of them can wait.
+        limiter = self._server.limiters.get(endpoint.rule)
+        if limiter is not None:
+            limiter.blocking = True
+        lines = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        out = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+        try:
+            summary = run_jsonl(endpoint, lines, out, parallelism)
+        finally:
+            if limiter is not None:
+                limiter.blocking = False
+            if lines is not sys.stdin:
+                lines.close()
+            if out is not sys.stdout:
+                out.close()
+        print(
+            f"{summary.requests} requests, {summary.failed} failed, in {summary.elapsed:.2f}s",
+            file=sys.stderr,
+        )
+        return summary
+
+    def _is_batch(self, args: Sequence[str]) -> bool:
+        # Batch mode is chosen by a --from-jsonl before any subcommand, so that the options of a
+        # subcommand are never taken for the batch options.
+        subcommands = {self._get_name_of_subcommand(endpoint) for endpoint in self._server.endpoints}
+        for arg in args:
+            if arg == "--from-jsonl" or arg.startswith("--from-jsonl="):
+                return True
+            if arg in subcommands:
+                return False
+        return False
+
     def run_cli(self, args: Sequence[str] | None = None):
+        if self._is_batch(sys.argv[1:] if args is None else args):
+            batch_parser = ArgumentParser(prog=self._parser.prog, allow_abbrev=False)
+            add_batch_arguments(batch_parser)
+            batch_args = batch_parser.parse_args(args)
+            self.run_batch(batch_args.from_jsonl, batch_args.task, batch_args.output, batch_args.parallelism)
+            return
         self._setup_cli()
         parsed_args = self._parse_args(args)
         response_body = self._run_cli_and_return(parsed_args)
@@ -0,0 +1,91 @@
+import asyncio
+import inspect
+import json
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import IO, Any, Deque, Dict, Iterable
+
+from pydantic import ValidationError
+
+from flask_ml.flask_ml_server.errors import BadRequestError, TooManyRequestsError
+from flask_ml.flask_ml_server.MLServer import EndpointDetailsNoSchema
+from flask_ml.flask_ml_server.streaming import collect_stream, is_stream
+
+
+@dataclass
+class BatchSummary:
+    requests: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+
+def error_record(e: Exception) -> Dict[str, Any]:
+    """
+    Converts an exception raised while running a request into the error and status the server would
+    respond with.
+    """
+    if isinstance(e, ValidationError):
+        return {"error": e.errors(include_url=False), "status": "VALIDATION_ERROR"}
+    if isinstance(e, (BadRequestError, json.JSONDecodeError)):
+        return {"error": str(e), "status": "VALIDATION_ERROR"}
+    if isinstance(e, TooManyRequestsError):
+        return {"error": str(e), "status": "TOO_MANY_REQUESTS"}
+    return {"error": repr(e), "status": "SERVER_ERROR"}
+
+
+def run_line(endpoint: EndpointDetailsNoSchema, number: int, line: str) -> Dict[str, Any]:
+    """
+    Runs the request of one JSONL line, shaped like a RequestBody, and returns its output line.
+    """
+    start = time.perf_counter()
+    try:
+        inputs, parameters = endpoint.plan.parse(json.loads(line))
+        result = endpoint.invoke(inputs, parameters)
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)
+        if is_stream(result):
+            result = collect_stream(result)
+        record = {"line": number, "status": "OK", "result": result.model_dump(mode="json")}
+    except Exception as e:
+        record = {"line": number, **error_record(e)}
+    record["duration"] = time.perf_counter() - start
+    return record
+
+
+def run_jsonl(
+    endpoint: EndpointDetailsNoSchema, lines: Iterable[str], output: IO[str], parallelism: int = 1
+) -> BatchSummary:
+    """
+    Runs the request of every line with the endpoint, parallelism at a time, and writes one JSON line per
+    request to output as soon as it and the requests before it are done, so the output is in input
+    order. Blank lines are skipped. Each output line has the number of its input line, its status (OK,
+    VALIDATION_ERROR, TOO_MANY_REQUESTS or SERVER_ERROR), its result or error, and its duration in
+    seconds.
+    """
+    if parallelism < 1:
+        raise ValueError("parallelism must be at least 1")
+    summary = BatchSummary()
+    start = time.perf_counter()
+
+    def write(record: Dict[str, Any]):
+        summary.requests += 1
+        if record["status"] != "OK":
+            summary.failed += 1
+        output.write(json.dumps(record, default=str) + "\n")
+        output.flush()
+
+    # Only a few lines are read ahead of the slowest request, so large files are never held in memory.
+    pending: Deque[Future] = deque()
+    with ThreadPoolExecutor(parallelism, thread_name_prefix="flask-ml-batch") as executor:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            pending.append(executor.submit(run_line, endpoint, number, line))
+            if len(pending) >= 2 * parallelism:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    summary.elapsed = time.perf_counter() - start
+    return summary
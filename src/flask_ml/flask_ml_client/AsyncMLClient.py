@@ -0,0 +1,106 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from flask_ml.flask_ml_client.MLClient import MLClient, TimedResult
+from flask_ml.flask_ml_server.models import Input, RequestBody
+
+# (url, inputs, parameters)
+Call = Tuple[str, Union[Dict[str, Input], Dict[str, Dict]], Dict[str, Any]]
+
+
+class AsyncMLClient:
+    """
+    An asyncio counterpart of MLClient, for sending many requests at once from one event loop, e.g. to
+    fan a request out to several servers.
+
+    Requests are sent by an MLClient from a thread pool of max_concurrency threads, so they share its
+    keep-alive connections, proxy settings and redirect handling. At most max_concurrency requests are in
+    flight at a time, and the others wait for their turn. Close the client when done, or use it as an
+    async context manager: async with AsyncMLClient(url) as client: ...
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        max_concurrency: int = 100,
+        connect_timeout: float = 10.0,
+        timeout: Optional[float] = 300.0,
+    ):
+        """
+        url : str - the URL of the task route, used when a request does not name one
+        max_concurrency : int - the number of requests in flight at most
+        connect_timeout : float - the number of seconds to wait for a connection
+        timeout : float - the number of seconds a request may take from the time it is made, including
+            its wait for a turn, or None to wait as long as it takes. Requests that take longer raise
+            asyncio.TimeoutError.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Requests are not retried, so that a timeout covers one try.
+        self._client = MLClient(
+            url or "", pool_size=max_concurrency, connect_timeout=connect_timeout, retries=0
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="flask-ml-async")
+
+    async def aclose(self):
+        """
+        Closes the connections and the threads of the client.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _post(self, url: str, request_json: Dict[str, Any], timeout: Optional[float]) -> TimedResult:
+        # Runs in the thread pool. The read timeout lets the thread go once the request has timed out.
+        response = self._client.session.post(url, json=request_json, timeout=(self.connect_timeout, timeout))
+        return MLClient._timed_result(response)
+
+    async def _request(self, url: str, request_json: Dict[str, Any], timeout: Optional[float]) -> TimedResult:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(self._executor, self._post, url, request_json, timeout)
+
+    async def request(
+        self,
+        inputs: Union[Dict[str, Input], Dict[str, Dict]],
+        parameters: Dict[str, Any] = {},
+        url: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> TimedResult:
+        """
+        Sends a request to the server. Returns the same as MLClient.request.
+        inputs : dict - the inputs to be sent to the server
+        parameters : dict - the parameters to be sent to the server
+        url : str - the URL of the task route, instead of the client's
+        timeout : float - the number of seconds this request may take, instead of the client's timeout
+        """
+        url = url or self.url
+        if url is None:
+            raise ValueError("The client has no URL, so each request must name one")
+        request_json = RequestBody.model_validate({"inputs": inputs, "parameters": parameters}).model_dump()
+        if timeout is None:
+            timeout = self.timeout
+        return await asyncio.wait_for(self._request(url, request_json, timeout), timeout)
+
+    async def gather(
+        self, calls: Iterable[Call], timeout: Optional[float] = None, return_exceptions: bool = True
+    ) -> List[Union[TimedResult, BaseException]]:
+        """
+        Sends (url, inputs, parameters) requests at the same time and returns their results in order.
+        With return_exceptions, a request that failed or timed out is returned as its exception instead
+        of cancelling the others.
+        """
+        requests = [
+            self.request(inputs, parameters, url=url, timeout=timeout) for url, inputs, parameters in calls
+        ]
+        return await asyncio.gather(*requests, return_exceptions=return_exceptions)
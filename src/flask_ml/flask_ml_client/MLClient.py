@@ -1,24 +1,133 @@
-from typing import Any, Dict, Union
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, Union
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from flask_ml.flask_ml_server.models import Input, RequestBody, ResponseBody
+from flask_ml.flask_ml_client.multipart import MultipartBody, upload_request_body
+from flask_ml.flask_ml_server.models import (
+    BatchDirectoryInput,
+    BatchFileInput,
+    BatchTextInput,
+    Input,
+    Job,
+    JobStatus,
+    RequestBody,
+    ResponseBody,
+)
+from flask_ml.flask_ml_server.streaming import NDJSON_MIMETYPE
 
 UNKNOWN_ERROR = "Unknown error. Please refer to the status field."
+FINISHED_JOB_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value)
+RETRY_STATUS_CODES = (429, 503)
+BATCH_INPUT_FIELDS = {BatchTextInput: "texts", BatchFileInput: "files", BatchDirectoryInput: "directories"}
+BATCH_RESPONSE_FIELDS = ("texts", "files", "directories")
+
+
+def parse_retry_after(header: Optional[str]) -> Optional[float]:
+    """
+    Reads a Retry-After header, either a number of seconds or an HTTP date, into a number of seconds.
+    """
+    if not header:
+        return None
+    try:
+        return max(float(header), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(header).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """
+    Reads a Server-Timing header into a dictionary of durations in milliseconds, e.g.
+    "parse;dur=0.04, model;dur=12.3" -> {"parse": 0.04, "model": 12.3}. Metrics without a duration are
+    skipped.
+    """
+    timings: Dict[str, float] = {}
+    for metric in (header or "").split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        for param in params:
+            key, _, value = param.partition("=")
+            if name and key.strip().lower() == "dur":
+                try:
+                    timings[name] = float(value.strip().strip('"'))
+                except ValueError:
+                    pass
+    return timings
+
+
+class TimedResult(dict):
+    """
+    The result of MLClient.request. A dictionary like before, along with server_timing: the time in
+    milliseconds the server spent in each phase of the request (parse, validate, model, serialize), so
+    the rest of the round trip can be attributed to the network and the client.
+    """
+
+    def __init__(self, result: Mapping[str, Any], server_timing: Dict[str, float]):
+        super().__init__(result)
+        self.server_timing = server_timing
 
 
 class MLClient:
     """
     The MLClient class is a wrapper class for making requests to the MLServer object.
+
+    The client keeps its connections open between requests. Close it when done, or use it as a context
+    manager: with MLClient(url) as client: ...
     """
 
-    def __init__(self, url: str):
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = 10,
+        connect_timeout: float = 10.0,
+        read_timeout: Optional[float] = None,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30.0,
+    ):
         """
         Instantiates the MLClient object.
         url : str - the URL of the server
         Ex: http://127.0.0.1:5000
+        pool_size : int - the number of connections kept open, which should be at least the number of
+            threads sharing the client
+        connect_timeout : float - the number of seconds to wait for a connection
+        read_timeout : float - the number of seconds to wait for the server to respond. The default, None,
+            waits as long as the task takes.
+        retries : int - the number of times a request is sent again after a connection error or a 429
+            or 503 response
+        backoff_factor : float - retry i waits backoff_factor * 2 ** i seconds, unless the server asks
+            for a different wait with a Retry-After header
+        max_backoff : float - the longest wait between two tries
         """
         self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        """
+        Closes the connections of the client.
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def set_url(self, url: str):
         """
@@ -27,24 +136,246 @@ class MLClient:
         """
         self.url = url
 
-    def request(self, inputs: Union[Dict[str, Input], Dict[str, Dict]], parameters: Dict[str, Any] = {}):
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return min(self.backoff_factor * 2**attempt, self.max_backoff)
+
+    def _send(self, send: Callable[[], requests.Response]) -> requests.Response:
+        """
+        Calls send, and calls it again after a connection error or a 429 or 503 response, waiting longer
+        each time. The last response is returned, and the last connection error is raised.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = send()
+            except requests.ConnectionError:
+                if attempt >= self.retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _unknown_error(response: requests.Response):
+        return {
+            "status": f"Unknown error. status_code={str(response.status_code)}",
+            "errors": [{"msg": UNKNOWN_ERROR}],
+        }
+
+    @classmethod
+    def _timed_result(cls, response: requests.Response) -> TimedResult:
+        server_timing = parse_server_timing(response.headers.get("Server-Timing"))
+        if "application/json" not in response.headers.get("Content-Type", ""):
+            return TimedResult(cls._unknown_error(response), server_timing)
+        if response.status_code != 200:
+            return TimedResult(response.json(), server_timing)
+        response_model = ResponseBody(**response.json())
+        return TimedResult(response_model.model_dump(mode="json"), server_timing)
+
+    def request(
+        self,
+        inputs: Union[Dict[str, Input], Dict[str, Dict]],
+        parameters: Dict[str, Any] = {},
+        upload: bool = False,
+    ):
         """
         Sends a request to the server.
         inputs : list - the list of dictionaries containing the data to be sent to the server
         data_type : str - the type of the input data
         parameters : dict - the parameters to be sent to the server
+        upload : bool - send the files of the file inputs along with the request, for servers that do not
+            share a filesystem with the client. The files are streamed, not loaded into memory.
+        Returns a TimedResult: the response as a dictionary, with the server's phase timings in its
+        server_timing attribute.
+        """
+        request_model = RequestBody.model_validate({"inputs": inputs, "parameters": parameters})
+        if upload:
+            request_json, files = upload_request_body(request_model)
+
+            def send_upload() -> requests.Response:
+                # A body is read as it is sent, so every try needs a new one.
+                body = MultipartBody(request_json, files)
+                return self.session.post(
+                    self.url, data=body, headers={"Content-Type": body.content_type}, timeout=self.timeout
+                )
+
+            response = self._send(send_upload)
+        else:
+            request_json = request_model.model_dump()
+            response = self._send(
+                lambda: self.session.post(self.url, json=request_json, timeout=self.timeout)
+            )
+        return self._timed_result(response)
+
+    def _batch_input(self, request_model: RequestBody) -> Tuple[str, str]:
+        batch_inputs = [
+            (key, BATCH_INPUT_FIELDS[type(value.root)])
+            for key, value in request_model.inputs.items()
+            if type(value.root) in BATCH_INPUT_FIELDS
+        ]
+        if len(batch_inputs) != 1:
+            keys = [key for key, _ in batch_inputs]
+            raise ValueError(f"request_batched needs exactly one batch input to split. Found {keys=}.")
+        return batch_inputs[0]
+
+    def request_batched(
+        self,
+        inputs: Union[Dict[str, Input], Dict[str, Dict]],
+        parameters: Dict[str, Any] = {},
+        chunk_size: int = 1000,
+        parallelism: int = 4,
+        retries: int = 2,
+    ):
+        """
+        Sends a large batch as several smaller requests, parallelism of them at a time, and merges their
+        responses in order. Returns the same as request() would for the whole batch.
+        inputs : dict - the inputs to be sent to the server, with exactly one BatchTextInput,
+            BatchFileInput or BatchDirectoryInput, which is split
+        parameters : dict - the parameters to be sent with every chunk
+        chunk_size : int - the number of items per request
+        parallelism : int - the number of requests in flight at a time, which should not exceed the
+            client's pool_size
+        retries : int - the number of times a chunk that failed is sent again. Only the failed chunks are
+            sent again. Invalid requests are not retried, and the error of the first chunk that still
+            fails is returned.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        request_model = RequestBody.model_validate({"inputs": inputs, "parameters": parameters})
+        key, field = self._batch_input(request_model)
+        request_json = request_model.model_dump(mode="json")
+        items = request_json["inputs"][key][field]
+        if len(items) <= chunk_size:
+            return self.request(request_json["inputs"], request_json["parameters"])
+
+        def send_chunk(start: int):
+            chunk_inputs = dict(request_json["inputs"])
+            chunk_inputs[key] = {field: items[start : start + chunk_size]}
+            try:
+                return self.request(chunk_inputs, request_json["parameters"])
+            except requests.RequestException as e:
+                return TimedResult(
+                    {"status": f"Request failed: {type(e).__name__}", "errors": [{"msg": str(e)}]}, {}
+                )
+
+        results: Dict[int, TimedResult] = {}
+        pending: List[int] = list(range(0, len(items), chunk_size))
+        with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="flask-ml-client") as executor:
+            for _ in range(retries + 1):
+                for start, result in zip(pending, executor.map(send_chunk, pending)):
+                    results[start] = result
+                # Only the error responses of the server have a status.
+                pending = [start for start in pending if "status" in results[start]]
+                invalid = any(results[start]["status"] == "VALIDATION_ERROR" for start in pending)
+                if not pending or invalid:
+                    break
+        if pending:
+            return results[pending[0]]
+
+        ordered = [results[start] for start in sorted(results)]
+        merged = dict(ordered[0])
+        response_field = next((name for name in BATCH_RESPONSE_FIELDS if name in merged), None)
+        if response_field is None:
+            raise TypeError(f"Only batch responses can be merged. Got {merged.get('output_type')}.")
+        merged[response_field] = [item for result in ordered for item in result[response_field]]
+        server_timing: Dict[str, float] = {}
+        for result in ordered:
+            for phase, duration in result.server_timing.items():
+                server_timing[phase] = server_timing.get(phase, 0.0) + duration
+        return TimedResult(merged, server_timing)
+
+    def request_stream(
+        self, inputs: Union[Dict[str, Input], Dict[str, Dict]], parameters: Dict[str, Any] = {}
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Sends a request to the server and yields the response items as they arrive, for routes whose ML
+        function streams its results. Batch responses from routes that do not stream are yielded item by
+        item too. Errors are yielded in the same shape that request() returns them, and end the iteration.
+        inputs : dict - the inputs to be sent to the server
+        parameters : dict - the parameters to be sent to the server
         """
         request_model = RequestBody.model_validate({"inputs": inputs, "parameters": parameters})
-        response = requests.post(
-            self.url,
-            json=request_model.model_dump(),
+        request_json = request_model.model_dump()
+        response = self._send(
+            lambda: self.session.post(self.url, json=request_json, stream=True, timeout=self.timeout)
         )
-        if "application/json" not in response.headers.get("Content-Type", ""):
-            return {
-                "status": f"Unknown error. status_code={str(response.status_code)}",
-                "errors": [{"msg": UNKNOWN_ERROR}],
-            }
+        content_type = response.headers.get("Content-Type", "")
+        if NDJSON_MIMETYPE in content_type:
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+            return
+        if "application/json" not in content_type:
+            yield self._unknown_error(response)
+            return
         if response.status_code != 200:
+            yield response.json()
+            return
+        result = ResponseBody(**response.json()).model_dump(mode="json")
+        items = result.get("texts", result.get("files", result.get("directories")))
+        if items is None:
+            yield result
+        else:
+            yield from items
+
+    def _job_response(self, response: requests.Response):
+        if "application/json" not in response.headers.get("Content-Type", ""):
+            return self._unknown_error(response)
+        if response.status_code not in (200, 202):
             return response.json()
-        response_model = ResponseBody(**response.json())
-        return response_model.model_dump(mode="json")
+        return Job.model_validate(response.json()).model_dump(mode="json")
+
+    def submit(self, inputs: Union[Dict[str, Input], Dict[str, Dict]], parameters: Dict[str, Any] = {}):
+        """
+        Submits a background job to the server and returns the job without waiting for the result.
+        inputs : dict - the inputs to be sent to the server
+        parameters : dict - the parameters to be sent to the server
+        """
+        request_model = RequestBody.model_validate({"inputs": inputs, "parameters": parameters})
+        request_json = request_model.model_dump()
+        response = self._send(
+            lambda: self.session.post(self.url + "/jobs", json=request_json, timeout=self.timeout)
+        )
+        return self._job_response(response)
+
+    def get_job(self, job_id: str):
+        """
+        Returns the job with its status, and its result once it has completed.
+        """
+        url = f"{self.url}/jobs/{job_id}"
+        return self._job_response(self._send(lambda: self.session.get(url, timeout=self.timeout)))
+
+    def cancel(self, job_id: str):
+        """
+        Cancels a queued or running job.
+        """
+        url = f"{self.url}/jobs/{job_id}"
+        return self._job_response(self._send(lambda: self.session.delete(url, timeout=self.timeout)))
+
+    def wait(self, job_id: str, poll_interval: float = 0.5, timeout: Optional[float] = None):
+        """
+        Polls a job until it finishes. Returns the result like request() when the job completes, and the
+        job itself when it failed or was cancelled.
+        timeout : float - the number of seconds to wait before raising TimeoutError
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if job.get("status") not in FINISHED_JOB_STATUSES:
+                if "job_id" not in job:
+                    return job
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"Job {job_id} did not finish within {timeout} seconds")
+                time.sleep(poll_interval)
+                continue
+            if job["status"] == JobStatus.COMPLETED.value:
+                return job["result"]
+            return job
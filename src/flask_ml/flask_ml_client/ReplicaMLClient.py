@@ -0,0 +1,269 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, Sequence, Union
+
+import requests
+
+from flask_ml.flask_ml_client.MLClient import MLClient, TimedResult
+from flask_ml.flask_ml_client.utils import percentile
+from flask_ml.flask_ml_server.models import Input
+
+LEAST_OUTSTANDING = "least_outstanding"
+EWMA = "ewma"
+
+
+class Replica:
+    """
+    One server of a ReplicaMLClient, with what the client knows about it.
+    """
+
+    def __init__(self, base_url: str, client: MLClient):
+        self.base_url = base_url.rstrip("/")
+        self.client = client
+        self.outstanding = 0
+        self.requests = 0
+        self.ewma: Optional[float] = None
+        self.failures = 0
+        self.ejected_until: Optional[float] = None
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until is not None
+
+
+class _Failover(Exception):
+    def __init__(self, result: Optional[TimedResult] = None, error: Optional[Exception] = None):
+        self.result = result
+        self.error = error
+
+
+class ReplicaMLClient:
+    """
+    Sends the requests of a task to one of several replicas of the same server.
+
+    Replicas are picked by the fewest requests in flight (least_outstanding), or by their latency (ewma):
+    the moving average of their response times, weighted by their requests in flight. A request that cannot
+    reach its replica is sent to the next one. After max_failures failures in a row a replica is ejected
+    for ejection_time seconds, then probed with /api/routes before it gets requests again.
+
+    With hedge_percentile, a request that has not returned after that percentile of recent latencies is
+    also sent to a second replica, and the first response wins. The slower request is left to finish.
+    """
+
+    def __init__(
+        self,
+        base_urls: Sequence[str],
+        task: str,
+        policy: str = LEAST_OUTSTANDING,
+        max_failures: int = 3,
+        ejection_time: float = 10.0,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        ewma_alpha: float = 0.3,
+        **kwargs,
+    ):
+        """
+        base_urls : list - the URLs of the replicas, without the task rule
+        Ex: ["http://10.0.0.1:5000", "http://10.0.0.2:5000"]
+        task : str - the rule of the task, e.g. /summarize
+        policy : str - "least_outstanding" or "ewma"
+        max_failures : int - the number of failures in a row that eject a replica
+        ejection_time : float - the number of seconds before an ejected replica is probed again
+        hedge_percentile : float - hedge requests slower than this percentile (0-100) of recent latencies,
+            or None to never hedge
+        hedge_min_samples : int - the number of latencies observed before requests are hedged
+        ewma_alpha : float - the weight of the latest response time in the moving average
+        Other keyword arguments are passed to the MLClient of each replica.
+        """
+        if not base_urls:
+            raise ValueError("base_urls must not be empty")
+        if policy not in (LEAST_OUTSTANDING, EWMA):
+            raise ValueError(f"policy must be {LEAST_OUTSTANDING!r} or {EWMA!r}, got {policy!r}")
+        if hedge_percentile is not None and not 0 < hedge_percentile < 100:
+            raise ValueError("hedge_percentile must be between 0 and 100")
+        # Failing over to another replica replaces the client's own retries.
+        kwargs.setdefault("retries", 0)
+        self.task = "/" + task.lstrip("/")
+        self.policy = policy
+        self.max_failures = max_failures
+        self.ejection_time = ejection_time
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.ewma_alpha = ewma_alpha
+        self.replicas = [Replica(url, MLClient(url.rstrip("/") + self.task, **kwargs)) for url in base_urls]
+        self.hedged = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._turn = 0
+        # Its threads are only started by the first hedged request.
+        self._executor = ThreadPoolExecutor(thread_name_prefix="flask-ml-hedge")
+
+    def set_url(self, task: str):
+        """
+        Sets the task to send requests to.
+        task : str - the rule of the task, e.g. /summarize
+        """
+        self.task = "/" + task.lstrip("/")
+        for replica in self.replicas:
+            replica.client.set_url(replica.base_url + self.task)
+
+    def close(self):
+        for replica in self.replicas:
+            replica.client.close()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _probe(self, replica: Replica) -> bool:
+        try:
+            url = replica.base_url + "/api/routes"
+            response = replica.client.session.get(url, timeout=replica.client.timeout)
+            healthy = response.status_code == 200
+        except requests.RequestException:
+            healthy = False
+        with self._lock:
+            if healthy:
+                replica.ejected_until = None
+                replica.failures = 0
+            else:
+                replica.ejected_until = time.monotonic() + self.ejection_time
+        return healthy
+
+    def _load(self, replica: Replica) -> float:
+        if self.policy == EWMA:
+            # Replicas without a latency yet are tried first.
+            return (replica.ewma or 0.0) * (replica.outstanding + 1)
+        return replica.outstanding
+
+    def _pick(self, exclude: Sequence[Replica] = ()) -> Optional[Replica]:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [r for r in self.replicas if r not in exclude and not r.ejected]
+            due = [
+                r
+                for r in self.replicas
+                if r not in exclude and r.ejected_until is not None and r.ejected_until <= now
+            ]
+        if not candidates:
+            # Probe the replicas whose ejection is over, and then all ejected ones as a last resort.
+            for replica in due or [r for r in self.replicas if r not in exclude]:
+                if self._probe(replica):
+                    candidates = [replica]
+                    break
+        else:
+            candidates += [replica for replica in due if self._probe(replica)]
+        if not candidates:
+            return None
+        with self._lock:
+            lowest = min(self._load(replica) for replica in candidates)
+            tied = [replica for replica in candidates if self._load(replica) == lowest]
+            replica = tied[self._turn % len(tied)]
+            self._turn += 1
+            replica.outstanding += 1
+            replica.requests += 1
+        return replica
+
+    def _send(self, replica: Replica, inputs: Dict[str, Any], parameters: Dict[str, Any]) -> TimedResult:
+        start = time.perf_counter()
+        result: Optional[TimedResult] = None
+        error: Optional[Exception] = None
+        try:
+            result = replica.client.request(inputs, parameters)
+        except requests.RequestException as e:
+            error = e
+        latency = time.perf_counter() - start
+        status = result.get("status") if result is not None else None
+        # Server errors count against the replica. Failures to reach it are sent to another replica too,
+        # like responses that did not come from Flask-ML (e.g. a proxy's 502).
+        unreachable = error is not None or (isinstance(status, str) and status.startswith("Unknown error"))
+        failed = unreachable or status == "SERVER_ERROR"
+        with self._lock:
+            replica.outstanding -= 1
+            if failed:
+                replica.failures += 1
+                if replica.failures >= self.max_failures and not replica.ejected:
+                    replica.ejected_until = time.monotonic() + self.ejection_time
+            else:
+                replica.failures = 0
+                replica.ewma = (
+                    latency
+                    if replica.ewma is None
+                    else self.ewma_alpha * latency + (1 - self.ewma_alpha) * replica.ewma
+                )
+                self._latencies.append(latency)
+        if unreachable:
+            raise _Failover(result, error)
+        return result  # type: ignore
+
+    def _hedge_after(self) -> Optional[float]:
+        if self.hedge_percentile is None or len(self.replicas) < 2:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return percentile(latencies, self.hedge_percentile)
+
+    def _send_hedged(
+        self,
+        replica: Replica,
+        inputs: Dict[str, Any],
+        parameters: Dict[str, Any],
+        hedge_after: float,
+        tried: List[Replica],
+    ) -> TimedResult:
+        futures: List[Future] = [self._executor.submit(self._send, replica, inputs, parameters)]
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            second = self._pick(exclude=tried)
+            if second is not None:
+                # So that a failover does not pick it again.
+                tried.append(second)
+                with self._lock:
+                    self.hedged += 1
+                futures.append(self._executor.submit(self._send, second, inputs, parameters))
+        pending = set(futures)
+        failover: Optional[_Failover] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except _Failover as e:
+                    failover = e
+        raise failover  # type: ignore
+
+    def request(
+        self,
+        inputs: Union[Dict[str, Input], Dict[str, Dict]],
+        parameters: Dict[str, Any] = {},
+    ) -> TimedResult:
+        """
+        Sends a request to one of the replicas. Returns the same as MLClient.request. Raises the last
+        error when no replica could be reached.
+        """
+        tried: List[Replica] = []
+        failover: Optional[_Failover] = None
+        while True:
+            replica = self._pick(exclude=tried)
+            if replica is None:
+                break
+            tried.append(replica)
+            hedge_after = self._hedge_after()
+            try:
+                if hedge_after is None:
+                    return self._send(replica, inputs, parameters)
+                return self._send_hedged(replica, inputs, parameters, hedge_after, tried)
+            except _Failover as e:
+                failover = e
+        if failover is None:
+            raise requests.ConnectionError("No replica is healthy")
+        if failover.error is not None:
+            raise failover.error
+        return failover.result  # type: ignore
@@ -0,0 +1,250 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from flask_ml.flask_ml_client.MLClient import MLClient, TimedResult
+from flask_ml.flask_ml_server.errors import BadRequestError
+from flask_ml.flask_ml_server.models import (
+    APIRoutes,
+    Input,
+    NoSchemaAPIRoute,
+    ParameterType,
+    SchemaAPIRoute,
+    TaskSchema,
+)
+from flask_ml.flask_ml_server.request_plan import RequestPlan, compile_schema_request_plan
+
+
+def check_parameter_values(task_schema: TaskSchema, parameters: Dict[str, Any]):
+    """
+    Raises BadRequestError when a parameter is not one of its enum choices, is outside its range, or has
+    the wrong type. Parameters missing from the schema are left to the key check.
+    """
+    for parameter in task_schema.parameters:
+        if parameter.key not in parameters:
+            continue
+        value = parameters[parameter.key]
+        descriptor = parameter.value
+        # A ranged int descriptor read from JSON can be parsed as a ranged float one, since both have the
+        # same fields, so the parameter type is what tells them apart.
+        match descriptor.parameter_type:
+            case ParameterType.ENUM:
+                choices = [enum_val.key for enum_val in descriptor.enum_vals]  # type: ignore
+                if value not in choices:
+                    raise BadRequestError(f"Parameter {parameter.key}={value!r} must be one of {choices}.")
+            case ParameterType.TEXT:
+                if not isinstance(value, str):
+                    raise BadRequestError(f"Parameter {parameter.key}={value!r} must be a string.")
+            case ParameterType.INT | ParameterType.RANGED_INT:
+                if not isinstance(value, int) or isinstance(value, bool):
+                    raise BadRequestError(f"Parameter {parameter.key}={value!r} must be an integer.")
+            case ParameterType.FLOAT | ParameterType.RANGED_FLOAT:
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    raise BadRequestError(f"Parameter {parameter.key}={value!r} must be a number.")
+        value_range = getattr(descriptor, "range", None)
+        if value_range is not None and not value_range.min <= value <= value_range.max:
+            raise BadRequestError(
+                f"Parameter {parameter.key}={value!r} must be between {value_range.min} and {value_range.max}."
+            )
+
+
+@dataclass
+class _CachedMetadata:
+    etag: Optional[str]
+    body: Any
+    checked: float
+
+
+class SchemaMLClient(MLClient):
+    """
+    An MLClient that knows the routes and task schemas of its server. Requests are checked against the
+    task schema before they are sent, so an invalid request fails at once, without a round trip, with an
+    error in the shape the server uses. The keys, the input types, the enum choices and the ranges of
+    ranged parameters are checked. These are client-side checks: the server only checks the keys and
+    the types, so a request with a parameter outside its choices or range is rejected here although the
+    server would accept it. Every send path is checked: request, request_batched, request_stream and
+    submit. Requests to routes without a task schema are sent as is.
+
+    Tasks can be addressed by name: their rule with or without the leading slash, or their short title.
+    Ex: client = SchemaMLClient("http://127.0.0.1:5000", task="summarize")
+
+    The metadata is fetched once and revalidated with its ETag when it is older than max_age, which costs
+    an empty 304 response while it has not changed. It is also revalidated after the server rejected a
+    request that passed the local checks, in case the task schema changed.
+    """
+
+    def __init__(self, server_url: str, task: Optional[str] = None, max_age: float = 60.0, **kwargs):
+        """
+        server_url : str - the URL of the server, without a task rule
+        Ex: http://127.0.0.1:5000
+        task : str - the task to send requests to. See set_url.
+        max_age : float - the number of seconds the metadata is used before it is revalidated
+        Other keyword arguments are passed to MLClient.
+        """
+        super().__init__(server_url, **kwargs)
+        self.server_url = server_url.rstrip("/")
+        self.max_age = max_age
+        self._metadata: Dict[str, _CachedMetadata] = {}
+        # The models parsed from the metadata bodies, until a body changes.
+        self._routes: Optional[Tuple[Any, List[Union[SchemaAPIRoute, NoSchemaAPIRoute]]]] = None
+        self._plans: Dict[str, Tuple[Any, TaskSchema, RequestPlan]] = {}
+        if task is not None:
+            self.set_url(task)
+
+    def _get_metadata(self, path: str, refresh: bool = False) -> Any:
+        cached = self._metadata.get(path)
+        if cached is not None and not refresh and time.monotonic() - cached.checked < self.max_age:
+            return cached.body
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else {}
+        response = self._send(
+            lambda: self.session.get(self.server_url + path, headers=headers, timeout=self.timeout)
+        )
+        if response.status_code == 304 and cached is not None:
+            cached.checked = time.monotonic()
+            return cached.body
+        response.raise_for_status()
+        cached = _CachedMetadata(response.headers.get("ETag"), response.json(), time.monotonic())
+        self._metadata[path] = cached
+        return cached.body
+
+    def refresh(self):
+        """
+        Revalidates the metadata on the next use, whatever its age.
+        """
+        for cached in self._metadata.values():
+            cached.checked = float("-inf")
+
+    def routes(self) -> List[Union[SchemaAPIRoute, NoSchemaAPIRoute]]:
+        body = self._get_metadata("/api/routes")
+        if self._routes is None or self._routes[0] is not body:
+            self._routes = (body, APIRoutes.model_validate(body).root)
+        return self._routes[1]
+
+    def _find_route(self, task: str) -> Optional[Union[SchemaAPIRoute, NoSchemaAPIRoute]]:
+        routes = self.routes()
+        for route in routes:
+            if route.run_task in (task, "/" + task.lstrip("/")):
+                return route
+        for route in routes:
+            if isinstance(route, SchemaAPIRoute) and route.short_title == task:
+                return route
+        return None
+
+    def find_route(self, task: str) -> Union[SchemaAPIRoute, NoSchemaAPIRoute]:
+        """
+        Returns the route of a task, given its rule with or without the leading slash, or its short title.
+        """
+        route = self._find_route(task)
+        if route is None:
+            tasks = [route.run_task for route in self.routes()]
+            raise ValueError(f"The server has no task named {task!r}. Its tasks are {tasks}.")
+        return route
+
+    def set_url(self, url: str):
+        """
+        Sets the task to send requests to.
+        url : str - the full URL of a task, or the name of a task of the server
+        """
+        if "://" in url:
+            self.url = url
+        else:
+            self.url = self.server_url + self.find_route(url).run_task
+
+    def _plan(self, task: Optional[str]) -> Optional[Tuple[Any, TaskSchema, RequestPlan]]:
+        if task is None:
+            if not self.url.startswith(self.server_url):
+                return None
+            task = self.url[len(self.server_url) :]
+        route = self._find_route(task)
+        if not isinstance(route, SchemaAPIRoute):
+            return None
+        body = self._get_metadata(route.task_schema)
+        compiled = self._plans.get(route.task_schema)
+        if compiled is None or compiled[0] is not body:
+            task_schema = TaskSchema.model_validate(body)
+            compiled = (body, task_schema, compile_schema_request_plan(task_schema))
+            self._plans[route.task_schema] = compiled
+        return compiled
+
+    def task_schema(self, task: Optional[str] = None) -> Optional[TaskSchema]:
+        """
+        Returns the task schema of a task, the current one by default, or None when it has none.
+        """
+        compiled = self._plan(task)
+        return compiled[1] if compiled is not None else None
+
+    def validate(self, inputs: Dict[str, Any], parameters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Checks a request against the task schema. Returns a VALIDATION_ERROR in the shape the server uses,
+        or None when the request is valid or the task has no schema. See the class for what is checked.
+        """
+        compiled = self._plan(None)
+        if compiled is None:
+            return None
+        _, task_schema, plan = compiled
+        try:
+            plan.parse({"inputs": inputs, "parameters": parameters})
+            check_parameter_values(task_schema, parameters)
+        except ValidationError as e:
+            return {"error": e.errors(include_url=False), "status": "VALIDATION_ERROR"}
+        except BadRequestError as e:
+            return {"error": str(e), "status": "VALIDATION_ERROR"}
+        return None
+
+    def _check(
+        self, inputs: Union[Dict[str, Input], Dict[str, Dict]], parameters: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        json_inputs = {
+            key: value.model_dump(mode="json") if isinstance(value, Input) else value
+            for key, value in inputs.items()
+        }
+        return self.validate(json_inputs, parameters)
+
+    def _refresh_on_validation_error(self, result: Any):
+        if isinstance(result, dict) and result.get("status") == "VALIDATION_ERROR":
+            # The task schema may have changed since it was fetched.
+            self.refresh()
+
+    def request(
+        self,
+        inputs: Union[Dict[str, Input], Dict[str, Dict]],
+        parameters: Dict[str, Any] = {},
+        upload: bool = False,
+    ):
+        """
+        Checks the request against the task schema, then sends it like MLClient.request.
+        """
+        error = self._check(inputs, parameters)
+        if error is not None:
+            return TimedResult(error, {})
+        result = super().request(inputs, parameters, upload=upload)
+        self._refresh_on_validation_error(result)
+        return result
+
+    def request_stream(
+        self, inputs: Union[Dict[str, Input], Dict[str, Dict]], parameters: Dict[str, Any] = {}
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Checks the request against the task schema, then sends it like MLClient.request_stream. An invalid
+        request yields its error and nothing else.
+        """
+        error = self._check(inputs, parameters)
+        if error is not None:
+            yield error
+            return
+        for item in super().request_stream(inputs, parameters):
+            self._refresh_on_validation_error(item)
+            yield item
+
+    def submit(self, inputs: Union[Dict[str, Input], Dict[str, Dict]], parameters: Dict[str, Any] = {}):
+        """
+        Checks the request against the task schema, then submits it like MLClient.submit.
+        """
+        error = self._check(inputs, parameters)
+        if error is not None:
+            return error
+        result = super().submit(inputs, parameters)
+        self._refresh_on_validation_error(result)
+        return result
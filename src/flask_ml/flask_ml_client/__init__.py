@@ -1,4 +1,7 @@
 # mypy: ignore-errors
+from .AsyncMLClient import AsyncMLClient
 from .MLClient import MLClient
+from .ReplicaMLClient import ReplicaMLClient
+from .SchemaMLClient import SchemaMLClient
 
-__all__ = ["MLClient"]  # for flake8 unused import error
+__all__ = ["AsyncMLClient", "MLClient", "ReplicaMLClient", "SchemaMLClient"]  # for flake8 unused import error
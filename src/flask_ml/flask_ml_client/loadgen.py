@@ -0,0 +1,252 @@
+"""
+A load generator for Flask-ML servers, built on MLClient.
+
+Discovers the task routes of a server, sends them requests at a given concurrency, and reports the
+throughput, latency percentiles and error rate of each route.
+
+Run with:
+    python -m flask_ml.flask_ml_client.loadgen http://127.0.0.1:5000 --concurrency 8 --duration 30
+    python -m flask_ml.flask_ml_client.loadgen http://127.0.0.1:5000 --rate 50 --route /summarize
+    python -m flask_ml.flask_ml_client.loadgen http://127.0.0.1:5000 --requests-file requests.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import requests
+
+from flask_ml.flask_ml_client.MLClient import MLClient
+from flask_ml.flask_ml_client.utils import percentile
+from flask_ml.flask_ml_server.models import APIRoutes
+
+CLIENT_ERROR = "CLIENT_ERROR"
+# The number of seconds to wait for the routes and sample payloads of the server.
+METADATA_TIMEOUT = 10.0
+
+
+@dataclass
+class Target:
+    """
+    A task route and the request bodies sent to it, in turn.
+    """
+
+    route: str
+    payloads: List[Dict[str, Any]]
+
+
+@dataclass
+class RouteStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    def record(self, latency: float, error: Optional[str] = None):
+        self.latencies.append(latency)
+        if error is not None:
+            self.errors[error] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        error_count = sum(self.errors.values())
+        return {
+            "requests": self.requests,
+            "throughput": self.requests / elapsed if elapsed > 0 else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "error_rate": error_count / self.requests if self.requests else 0.0,
+            "errors": dict(self.errors),
+        }
+
+
+def discover_routes(url: str, timeout: float = METADATA_TIMEOUT) -> List[str]:
+    """
+    Returns the task routes listed by the server's /api/routes.
+    """
+    response = requests.get(url + "/api/routes", timeout=timeout)
+    response.raise_for_status()
+    return [route.run_task for route in APIRoutes.model_validate(response.json()).root]
+
+
+def sample_targets(url: str, routes: Iterable[str], timeout: float = METADATA_TIMEOUT) -> List[Target]:
+    """
+    Builds one target per route, sending the route's sample payload.
+    """
+    targets = []
+    for route in routes:
+        response = requests.get(f"{url}{route}/sample_payload", timeout=timeout)
+        response.raise_for_status()
+        targets.append(Target(route, [response.json()]))
+    return targets
+
+
+def read_targets(path: str, routes: Sequence[str]) -> List[Target]:
+    """
+    Builds the targets from a JSONL file of request bodies. A line may name its route in a "route" key,
+    otherwise it is sent to every route.
+    """
+    payloads: Dict[str, List[Dict[str, Any]]] = {route: [] for route in routes}
+    with open(path) as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            payload = json.loads(line)
+            route = payload.pop("route", None)
+            if route is None:
+                for route_payloads in payloads.values():
+                    route_payloads.append(payload)
+            elif route in payloads:
+                payloads[route].append(payload)
+            else:
+                raise ValueError(f"{path}:{number}: unknown route {route}")
+    return [Target(route, route_payloads) for route, route_payloads in payloads.items() if route_payloads]
+
+
+@dataclass
+class LoadReport:
+    elapsed: float
+    routes: Dict[str, RouteStats]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {route: stats.summary(self.elapsed) for route, stats in self.routes.items()}
+
+
+class LoadGenerator:
+    """
+    Sends requests to the targets in turn, until the duration has passed or max_requests were sent.
+
+    Closed loop (rate is None): concurrency workers each send their next request as soon as the previous
+        one returns, which measures the throughput the server sustains.
+    Open loop: requests are sent at a fixed rate per second, whether earlier ones have returned or not,
+        with at most concurrency in flight. Latencies are measured from the time each request was due, so
+        a server that falls behind shows the wait instead of hiding it.
+    """
+
+    def __init__(self, url: str, targets: List[Target], concurrency: int = 8, rate: Optional[float] = None):
+        if not targets:
+            raise ValueError("There are no routes to send requests to")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        self.targets = targets
+        self.concurrency = concurrency
+        self.rate = rate
+        # Retries would hide the errors and latencies being measured.
+        self._clients = {
+            target.route: MLClient(url + target.route, pool_size=concurrency, retries=0) for target in targets
+        }
+        self._stats = {target.route: RouteStats() for target in targets}
+        self._lock = threading.Lock()
+
+    def _target(self, index: int):
+        target = self.targets[index % len(self.targets)]
+        return target, target.payloads[(index // len(self.targets)) % len(target.payloads)]
+
+    def _send(self, index: int, due: float):
+        target, payload = self._target(index)
+        try:
+            result = self._clients[target.route].request(payload["inputs"], payload.get("parameters", {}))
+            # Only the error responses of the server have a status.
+            error = result.get("status") if isinstance(result.get("status"), str) else None
+        except Exception as e:
+            error = f"{CLIENT_ERROR}: {type(e).__name__}"
+        latency = time.perf_counter() - due
+        with self._lock:
+            self._stats[target.route].record(latency, error)
+
+    def run(self, duration: float = 10.0, max_requests: Optional[int] = None) -> LoadReport:
+        self._stats = {target.route: RouteStats() for target in self.targets}
+        start = time.perf_counter()
+        end = start + duration
+        indexes = itertools.count() if max_requests is None else iter(range(max_requests))
+        if self.rate is None:
+            lock = threading.Lock()
+
+            def worker():
+                while time.perf_counter() < end:
+                    with lock:
+                        index = next(indexes, None)
+                    if index is None:
+                        return
+                    self._send(index, time.perf_counter())
+
+            threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            with ThreadPoolExecutor(self.concurrency, thread_name_prefix="flask-ml-loadgen") as executor:
+                for index in indexes:
+                    due = start + index / self.rate
+                    if due >= end:
+                        break
+                    time.sleep(max(due - time.perf_counter(), 0))
+                    executor.submit(self._send, index, due)
+        elapsed = time.perf_counter() - start
+        for client in self._clients.values():
+            client.close()
+        return LoadReport(elapsed, self._stats)
+
+
+def format_report(report: LoadReport) -> str:
+    lines = [
+        f"{'route':<32}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}"
+    ]
+    for route, summary in report.summary().items():
+        lines.append(
+            f"{route:<32}{summary['requests']:>10}{summary['throughput']:>10.1f}{summary['p50_ms']:>10.1f}"
+            f"{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}{summary['error_rate']:>9.1%}"
+        )
+        for error, count in summary["errors"].items():
+            lines.append(f"    {error}: {count}")
+    lines.append(f"{report.elapsed:.1f}s elapsed")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m flask_ml.flask_ml_client.loadgen",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("url", help="the URL of the server, e.g. http://127.0.0.1:5000")
+    parser.add_argument(
+        "--route", action="append", help="a task route to send requests to, can be repeated (default: all)"
+    )
+    parser.add_argument(
+        "--requests-file", help="a JSONL file of request bodies (default: the sample payloads)"
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="the number of requests in flight at most")
+    parser.add_argument("--rate", type=float, help="send this many requests per second (open loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="the number of seconds to send requests")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    url = args.url.rstrip("/")
+    routes = args.route or discover_routes(url)
+    targets = read_targets(args.requests_file, routes) if args.requests_file else sample_targets(url, routes)
+    generator = LoadGenerator(url, targets, concurrency=args.concurrency, rate=args.rate)
+    report = generator.run(duration=args.duration, max_requests=args.requests)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"elapsed": report.elapsed, "routes": report.summary()}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
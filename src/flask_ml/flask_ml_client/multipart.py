@@ -0,0 +1,105 @@
+import os
+import uuid
+from typing import Dict, Iterator, List, Tuple, Union
+
+from flask_ml.flask_ml_server.models import BatchFileInput, FileInput, RequestBody
+from flask_ml.flask_ml_server.upload_scheme import REQUEST_PART, UPLOAD_SCHEME
+
+CHUNK_SIZE = 64 * 1024
+
+# A part of the body is either bytes or the path of a file that is read when the body is sent.
+Segment = Union[bytes, str]
+
+
+class MultipartBody:
+    """
+    A multipart/form-data request body that reads its files while it is sent instead of loading them into
+    memory. requests streams it because it is iterable, and sends a Content-Length because it has a length.
+    """
+
+    def __init__(self, request_json: bytes, files: Dict[str, str]):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self._segments: List[Segment] = [
+            self._part_header(REQUEST_PART, None, "application/json"),
+            request_json,
+            b"\r\n",
+        ]
+        for name, path in files.items():
+            self._segments += [
+                self._part_header(name, os.path.basename(path), "application/octet-stream"),
+                path,
+                b"\r\n",
+            ]
+        self._segments.append(f"--{self.boundary}--\r\n".encode())
+        self._length = sum(
+            os.path.getsize(segment) if isinstance(segment, str) else len(segment)
+            for segment in self._segments
+        )
+        self._chunks = self._iter_chunks()
+        self._buffer = b""
+
+    @staticmethod
+    def _quote(value: str) -> str:
+        # Line breaks would end the header, and quotes and backslashes the quoted string.
+        value = value.replace("\r", "").replace("\n", "")
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+    def _part_header(self, name: str, filename: Union[str, None], content_type: str) -> bytes:
+        disposition = f"form-data; name={self._quote(name)}"
+        if filename is not None:
+            disposition += f"; filename={self._quote(filename)}"
+        return (
+            f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\nContent-Type: {content_type}\r\n\r\n"
+        ).encode()
+
+    def _iter_chunks(self) -> Iterator[bytes]:
+        for segment in self._segments:
+            if isinstance(segment, bytes):
+                yield segment
+                continue
+            with open(segment, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield chunk
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._iter_chunks()
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def upload_request_body(request_model: RequestBody) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Replaces the path of every file input with upload://<part name>, and returns the request JSON along
+    with the local path of each part.
+    """
+    files: Dict[str, str] = {}
+
+    def upload(file_input: FileInput) -> FileInput:
+        if not os.path.isfile(file_input.path):
+            raise FileNotFoundError(f"File {file_input.path} not found")
+        name = f"file{len(files)}"
+        files[name] = file_input.path
+        return FileInput(path=UPLOAD_SCHEME + name)
+
+    request_model = request_model.model_copy(deep=True)
+    for value in request_model.inputs.values():
+        match value.root:
+            case FileInput():
+                value.root = upload(value.root)
+            case BatchFileInput():
+                value.root = BatchFileInput(files=[upload(file_input) for file_input in value.root.files])
+    return request_model.model_dump_json().encode(), files
@@ -0,0 +1,12 @@
+import math
+from typing import Sequence
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """
+    The nearest-rank percentile of values sorted in ascending order, or 0 when there are none.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
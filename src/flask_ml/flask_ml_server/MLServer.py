@@ -1,15 +1,8 @@
+import hashlib
+import inspect
 import json
-import traceback
 from dataclasses import dataclass
-from logging import getLogger
-from typing import Any, Callable, Dict, List, Optional, Union, get_type_hints
-
-from flask_ml.flask_ml_server.errors import BadRequestError
-
-logger = getLogger(__name__)
-
-from flask import Flask, Response, jsonify, request
-from pydantic import ValidationError
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
 
 from flask_ml.flask_ml_server.models import (
     APIRoutes,
@@ -22,14 +15,24 @@ from flask_ml.flask_ml_server.models import (
 from flask_ml.flask_ml_server.utils import (
     ensure_ml_func_hinting_and_task_schemas_are_valid,
     ensure_ml_func_parameters_are_typed_dict,
-    no_schema_get_inputs,
-    no_schema_get_parameters,
-    schema_get_inputs,
-    schema_get_parameters,
-    schema_get_sample_payload,
-    type_hinting_get_sample_payload,
-    validate_data_has_keys,
 )
+from flask_ml.flask_ml_server.batching import BatchingConfig, MicroBatcher
+from flask_ml.flask_ml_server.dedupe import Deduplicator
+from flask_ml.flask_ml_server.executors import EXECUTORS, ProcessPoolInvoker
+from flask_ml.flask_ml_server.file_access import with_mapping_scope
+from flask_ml.flask_ml_server.jobs import JobManager
+from flask_ml.flask_ml_server.limits import ConcurrencyLimiter
+from flask_ml.flask_ml_server.profiling import Profiler, ProfilingConfig
+from flask_ml.flask_ml_server.metrics import Metrics
+from flask_ml.flask_ml_server.result_cache import ResultCache
+from flask_ml.flask_ml_server.request_plan import (
+    RequestPlan,
+    compile_no_schema_request_plan,
+    compile_schema_request_plan,
+)
+
+if TYPE_CHECKING:
+    from flask import Flask
 
 
 @dataclass
@@ -38,6 +41,8 @@ class EndpointDetailsNoSchema:
     payload_schema_rule: str
     sample_payload_rule: str
     func: Callable[..., ResponseBody]
+    plan: RequestPlan
+    invoke: Callable[..., ResponseBody]
 
 
 @dataclass
@@ -55,53 +60,113 @@ class MLServer(object):
     into a WebService on an applet.
     """
 
-    def __init__(self, name):
+    def __init__(
+        self, name, jobs: Optional[JobManager] = None, profiling: Optional[ProfilingConfig] = None
+    ):
         """
         Instantiates the MLServer object as a wrapper for the Flask app.
+        jobs : JobManager - runs the background jobs submitted to the /jobs endpoint of every route
+        profiling : ProfilingConfig - profile the task requests that ask for it with the admin token, or a
+            sample of all of them, and serve the profiles at /api/profiles
         """
-        self.app = Flask(name, static_folder=None)
+        self.import_name = name
+        self._app: Optional["Flask"] = None
         self.endpoints: List[EndpointDetailsNoSchema] = []
         self._app_metadata: Optional[AppMetadata] = None
-
-        @self.app.route("/api/routes", methods=["GET"])
-        def list_routes():
-            """
-            Lists all the routes/endpoints available in the Flask app.
-            """
-            routes = [
-                (
-                    SchemaAPIRoute(
-                        task_schema=endpoint.task_schema_rule,
-                        run_task=endpoint.rule,
-                        sample_payload=endpoint.sample_payload_rule,
-                        payload_schema=endpoint.payload_schema_rule,
-                        short_title=endpoint.short_title,
-                        order=endpoint.order,
-                    )
-                    if isinstance(endpoint, EndpointDetails)
-                    else NoSchemaAPIRoute(
-                        run_task=endpoint.rule,
-                        sample_payload=endpoint.sample_payload_rule,
-                        payload_schema=endpoint.payload_schema_rule,
-                    )
+        self.jobs = jobs or JobManager()
+        self._metadata_cache: Dict[str, Tuple[bytes, str]] = {}
+        self._result_caches: List[ResultCache] = []
+        self.metrics = Metrics()
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}
+        self.profiler = Profiler(profiling) if profiling is not None else None
+
+    @property
+    def app(self) -> "Flask":
+        """
+        The Flask app that serves the routes. It is created on first use, so that code that only needs
+        the routes, like the CLI, does not import Flask.
+        """
+        if self._app is None:
+            from flask_ml.flask_ml_server.wsgi import build_flask_app
+
+            self._app = build_flask_app(self)
+        return self._app
+
+    def _build_api_routes(self) -> str:
+        routes = [
+            (
+                SchemaAPIRoute(
+                    task_schema=endpoint.task_schema_rule,
+                    run_task=endpoint.rule,
+                    sample_payload=endpoint.sample_payload_rule,
+                    payload_schema=endpoint.payload_schema_rule,
+                    short_title=endpoint.short_title,
+                    order=endpoint.order,
+                )
+                if isinstance(endpoint, EndpointDetails)
+                else NoSchemaAPIRoute(
+                    run_task=endpoint.rule,
+                    sample_payload=endpoint.sample_payload_rule,
+                    payload_schema=endpoint.payload_schema_rule,
                 )
-                for endpoint in self.endpoints
-            ]
-            return jsonify(APIRoutes(root=routes).model_dump(mode="json"))
-        
-        @self.app.route("/api/app_metadata", methods=["GET"])
-        def get_app_metadata():
-            if self._app_metadata is None:
-                return jsonify({"error": "App metadata not set"})
-            return jsonify(self._app_metadata.model_dump(mode="json"))
+            )
+            for endpoint in self.endpoints
+        ]
+        return APIRoutes(root=routes).model_dump_json()
+
+    def _build_app_metadata(self) -> str:
+        if self._app_metadata is None:
+            return json.dumps({"error": "App metadata not set"})
+        return self._app_metadata.model_dump_json()
+
+    def _app_version(self) -> str:
+        return self._app_metadata.version if self._app_metadata is not None else ""
+
+    def _cached_metadata(self, key: str, build: Callable[[], Union[str, bytes]]) -> Tuple[bytes, str]:
+        """
+        Returns a metadata payload and its ETag. The payload is built once and then reused until
+        invalidate_metadata drops it.
+        """
+        entry = self._metadata_cache.get(key)
+        if entry is None:
+            body = build()
+            if isinstance(body, str):
+                body = body.encode()
+            entry = (body, hashlib.sha256(body).hexdigest())
+            self._metadata_cache[key] = entry
+        return entry
+
+    def invalidate_metadata(self, rule: Optional[str] = None):
+        """
+        Drops the cached metadata payloads so they are rebuilt on the next request. Call this after the
+        output of a dynamic task_schema_func changes.
+        rule : str - the rule of the route whose task schema changed. All routes when None.
+        """
+        for endpoint in self.endpoints:
+            if rule is not None and endpoint.rule != rule:
+                continue
+            if isinstance(endpoint, EndpointDetails):
+                # A valid task schema has the keys and types of the ML function's type hints, so the
+                # request plan compiled at registration, and the invoke chain built on it, still hold.
+                ensure_ml_func_hinting_and_task_schemas_are_valid(endpoint.func, endpoint.task_schema_func())
+            for key in (endpoint.payload_schema_rule, endpoint.sample_payload_rule):
+                self._metadata_cache.pop(key, None)
+            if isinstance(endpoint, EndpointDetails):
+                self._metadata_cache.pop(endpoint.task_schema_rule, None)
+        self._metadata_cache.pop("/api/routes", None)
+        self._metadata_cache.pop("/api/app_metadata", None)
 
     def add_app_metadata(self, name: str, author: str, version: str, info: str):
+        if self._app_metadata is not None and self._app_metadata.version != version:
+            for cache in self._result_caches:
+                cache.clear()
         self._app_metadata = AppMetadata(
             name=name,
             author=author,
             version=version,
             info=info
         )
+        self._metadata_cache.pop("/api/app_metadata", None)
 
     def route(
         self,
@@ -109,156 +174,137 @@ class MLServer(object):
         task_schema_func: Optional[Callable[[], TaskSchema]] = None,
         short_title: Optional[str] = None,
         order: int = 0,
+        batching: Optional[BatchingConfig] = None,
+        executor: str = "inline",
+        workers: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+        max_concurrency: Optional[int] = None,
+        max_queue: int = 0,
+        dedupe: Optional[bool] = None,
     ):
         """
         rule : str - the name of the endpoint
         input_type : str - the type of the input data
+        batching : BatchingConfig - merge concurrent requests with equal parameters into one call of the
+            ML function. The route must take exactly one BatchTextInput or BatchFileInput.
+        executor : str - "inline" runs the ML function in the request thread. "process" runs it in a pool of
+            worker processes, for CPU-bound models. The ML function must then be defined at module level.
+        workers : int - the number of worker processes when executor="process". Defaults to the CPU count.
+        cache : ResultCache - reuse the response of an identical earlier request whose input files have not
+            changed. Only for routes whose output depends on nothing but the request.
+        max_concurrency : int - the number of calls of the ML function that may run at the same time. With
+            batching, a merged batch is one call.
+        max_queue : int - the number of requests that may wait for one of the max_concurrency slots. Any
+            request beyond that gets a 429 with a Retry-After header.
+        dedupe : bool - call the ML function once per distinct text or file of the batch input and copy the
+            results back to every position. The route must take exactly one BatchTextInput or
+            BatchFileInput and return a batch response. Defaults to the dedupe of the TextML or FileML
+            template whose task_schema_func is passed.
+
+        Every task response has a Server-Timing header with the time spent parsing the request body,
+        validating it, running the ML function and serializing its result.
+
+        The ML function may return an iterator of FileResponse, DirectoryResponse, MarkdownResponse or
+        TextResponse items instead of a ResponseBody. They are then streamed to the client as NDJSON, one
+        line per item. Streaming does not combine with batching, caching or executor="process".
+
+        The ML function may also be an async function, for I/O-bound work. It is awaited on the event loop
+        when served with asgi_app(), and run with asyncio.run in the request thread when served over WSGI.
+        Async ML functions do not combine with batching, cache, max_concurrency, dedupe or
+        executor="process": registering such a route raises ValueError.
+
+        Clients that do not share a filesystem with the server may send a multipart/form-data request
+        instead of JSON: the JSON request body goes in a part named "request", each file goes in a part of
+        its own, and the file inputs refer to it with the path upload://<part name>. The uploaded files are
+        removed once the response has been sent.
         """
+        if executor not in EXECUTORS:
+            raise ValueError(f"executor must be one of {EXECUTORS}, got {executor!r}")
+        if max_concurrency is None and max_queue:
+            raise ValueError("max_queue needs max_concurrency")
+        if dedupe is None:
+            dedupe = getattr(getattr(task_schema_func, "__self__", None), "dedupe", False)
+
+        def build_invoke(ml_function: Callable[[Any, Any], ResponseBody], plan: RequestPlan):
+            if inspect.iscoroutinefunction(ml_function):
+                options = {
+                    "batching": batching is not None,
+                    'executor="process"': executor == "process",
+                    "max_concurrency": max_concurrency is not None,
+                    "dedupe": dedupe,
+                    "cache": cache is not None,
+                }
+                for option, used in options.items():
+                    if used:
+                        raise ValueError(f"{option} does not support async ML functions")
+            invoke = with_mapping_scope(ml_function)
+            if executor == "process":
+                invoke = ProcessPoolInvoker(ml_function, workers)
+            if max_concurrency is not None:
+                limiter = ConcurrencyLimiter(invoke, max_concurrency, max_queue)
+                self.metrics.running.labels(rule).set_function(lambda: limiter.running)
+                self.metrics.queue_depth.labels(rule).set_function(lambda: limiter.waiting)
+                self.metrics.queue_capacity.labels(rule).set(max_queue)
+                self.limiters[rule] = limiter
+                invoke = limiter
+            if dedupe:
+                invoke = Deduplicator(
+                    invoke,
+                    plan,
+                    self.metrics.dedupe_input_items.labels(rule),
+                    self.metrics.dedupe_unique_items.labels(rule),
+                )
+            if batching is not None:
+                invoke = MicroBatcher(invoke, plan, batching)
+            if cache is not None:
+                invoke = cache.wrap(invoke, lambda: f"{rule}@{self._app_version()}")
+                self._result_caches.append(cache)
+            return invoke
 
         def build_route(ml_function: Callable[[Any, Any], ResponseBody]):
             ensure_ml_func_parameters_are_typed_dict(ml_function)
+            # The function name is the endpoint name of the task rule in the Flask app, which may only be
+            # built later, so a clash is caught here.
+            for other in self.endpoints:
+                if other.func.__name__ == ml_function.__name__:
+                    raise ValueError(
+                        f"The ML functions of {other.rule} and {rule} are both named {ml_function.__name__}. "
+                        "Every route needs an ML function with a name of its own."
+                    )
+            endpoint: EndpointDetailsNoSchema
             if task_schema_func is not None:
-                ensure_ml_func_hinting_and_task_schemas_are_valid(ml_function, task_schema_func())
+                task_schema = task_schema_func()
+                ensure_ml_func_hinting_and_task_schemas_are_valid(ml_function, task_schema)
+                plan = compile_schema_request_plan(task_schema)
                 endpoint = EndpointDetails(
                     rule=rule,
                     task_schema_rule=rule + "/task_schema",
                     sample_payload_rule=rule + "/sample_payload",
                     payload_schema_rule=rule + "/payload_schema",
                     func=ml_function,
+                    plan=plan,
+                    invoke=build_invoke(ml_function, plan),
                     task_schema_func=task_schema_func,
                     short_title=short_title or "",
                     order=order,
                 )
-                self.endpoints.append(endpoint)
-
-                @self.app.route(
-                    endpoint.task_schema_rule, endpoint=endpoint.task_schema_rule, methods=["GET"]
-                )
-                def get_task_schema():
-                    return jsonify(endpoint.task_schema_func().model_dump(mode="json"))
-
-                @self.app.route(
-                    endpoint.sample_payload_rule, endpoint=endpoint.sample_payload_rule, methods=["GET"]
-                )
-                def get_sample_payload():
-                    return jsonify(
-                        schema_get_sample_payload(endpoint.task_schema_func()).model_dump(mode="json")
-                    )
-
-                @self.app.route(
-                    endpoint.payload_schema_rule, endpoint=endpoint.payload_schema_rule, methods=["GET"]
-                )
-                def get_payload_schema():
-                    return jsonify(schema_get_sample_payload(endpoint.task_schema_func()).model_json_schema())
-
-                @self.app.route(rule, endpoint=ml_function.__name__, methods=["POST"])
-                def wrapper():
-                    try:
-                        data = request.get_json()
-                        validate_data_has_keys(data, ["inputs", "parameters"])
-                        json_inputs = data["inputs"]
-                        json_parameters = data["parameters"]
-
-                        assert task_schema_func is not None, "FATAL: Input schema cannot be None here"
-                        task_schema = task_schema_func()
-                        ensure_ml_func_hinting_and_task_schemas_are_valid(ml_function, task_schema)
-
-                        inputs = schema_get_inputs(task_schema, json_inputs)
-                        parameters: Dict[str, Union[str, int, float]] = schema_get_parameters(
-                            task_schema, json_parameters
-                        )
-                        result = ml_function(inputs, parameters)
-                        logger.info(f"200: Successful request")
-                        response = Response(
-                            status=200, mimetype="application/json", response=result.model_dump_json()
-                        )
-                    except ValidationError as e:
-                        error = {"error": e.errors(), "status": "VALIDATION_ERROR"}
-                        logger.error(f"400: Validation error: {error}")
-                        response = Response(
-                            status=400, mimetype="application/json", response=json.dumps(error)
-                        )
-                    except BadRequestError as e:
-                        logger.error(f"400: Bad request: {e}")
-                        response = Response(
-                            status=400,
-                            mimetype="application/json",
-                            response=json.dumps({"error": str(e), "status": "VALIDATION_ERROR"}),
-                        )
-                    except Exception as e:
-                        logger.error(f"500: Internal server error: {repr(e)}")
-                        logger.error(traceback.format_exc())
-                        response = Response(
-                            status=500,
-                            mimetype="application/json",
-                            response=json.dumps({"error": repr(e), "status": "SERVER_ERROR"}),
-                        )
-                    return response
-
-                return wrapper
             else:
+                plan = compile_no_schema_request_plan(ml_function)
                 endpoint = EndpointDetailsNoSchema(
                     rule=rule,
                     payload_schema_rule=rule + "/payload_schema",
                     sample_payload_rule=rule + "/sample_payload",
                     func=ml_function,
+                    plan=plan,
+                    invoke=build_invoke(ml_function, plan),
                 )
-                self.endpoints.append(endpoint)
-                hints = get_type_hints(ml_function)
-
-                @self.app.route(
-                    endpoint.sample_payload_rule, endpoint=endpoint.sample_payload_rule, methods=["GET"]
-                )
-                def get_sample_payload():
-                    return jsonify(type_hinting_get_sample_payload(hints).model_dump(mode="json"))
+            self.endpoints.append(endpoint)
+            self._metadata_cache.pop("/api/routes", None)
+            if self._app is not None:
+                from flask_ml.flask_ml_server.wsgi import add_endpoint_rules
 
-                @self.app.route(
-                    endpoint.payload_schema_rule, endpoint=endpoint.payload_schema_rule, methods=["GET"]
-                )
-                def get_payload_schema():
-                    return jsonify(type_hinting_get_sample_payload(hints).model_json_schema())
-
-                @self.app.route(rule, endpoint=ml_function.__name__, methods=["POST"])
-                def wrapper():
-                    try:
-                        data = request.get_json()
-                        validate_data_has_keys(data, ["inputs", "parameters"])
-                        json_inputs = data["inputs"]
-                        json_parameters = data["parameters"]
-
-                        inputs = no_schema_get_inputs(get_type_hints(hints["inputs"]), json_inputs)
-                        parameters: Dict[str, Union[str, int, float]] = no_schema_get_parameters(
-                            get_type_hints(hints["parameters"]), json_parameters
-                        )
-                        result = ml_function(inputs, parameters)
-                        logger.info(f"200: Successful request")
-                        response = Response(
-                            status=200, mimetype="application/json", response=result.model_dump_json()
-                        )
-                    except ValidationError as e:
-                        error = {"error": e.errors(), "status": "VALIDATION_ERROR"}
-                        logger.error(f"400: Validation error: {error}")
-                        response = Response(
-                            status=400, mimetype="application/json", response=json.dumps(error)
-                        )
-                    except BadRequestError as e:
-                        logger.error(f"400: Bad request: {e}")
-                        response = Response(
-                            status=400,
-                            mimetype="application/json",
-                            response=json.dumps({"error": str(e), "status": "VALIDATION_ERROR"}),
-                        )
-                    except Exception as e:
-                        logger.error(f"500: Internal server error: {repr(e)}")
-                        logger.error(traceback.format_exc())
-                        response = Response(
-                            status=500,
-                            mimetype="application/json",
-                            response=json.dumps({"error": repr(e), "status": "SERVER_ERROR"}),
-                        )
-                    return response
-
-                return wrapper
+                add_endpoint_rules(self._app, self, endpoint)
+            return ml_function
 
         return build_route
 
@@ -296,3 +342,35 @@ class MLServer(object):
             information.
         """
         self.app.run(host, port, debug, load_dotenv, **options)
+
+    def asgi_app(self, max_workers: int = 4, flask_workers: int = 4):
+        """
+        Returns an ASGI application that serves this MLServer, for use with an asyncio server such as
+        uvicorn. It holds waiting clients on the event loop instead of one thread per request.
+        max_workers : int - the number of threads that run synchronous ML functions
+        flask_workers : int - the number of threads that serve metadata, jobs and uploads through Flask
+        """
+        from flask_ml.flask_ml_server.asgi import ASGIApp
+
+        return ASGIApp(self, max_workers=max_workers, flask_workers=flask_workers)
+
+    def run_asgi(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 5000,
+        max_workers: int = 4,
+        flask_workers: int = 4,
+        **options,
+    ):
+        """
+        Runs the application on uvicorn through asgi_app(). Install it with ``pip install flask_ml[asgi]``.
+        :param options: the options to be forwarded to ``uvicorn.run``.
+        """
+        try:
+            import uvicorn
+        except ImportError as e:
+            raise ImportError(
+                "run_asgi() needs uvicorn. Install it with: pip install flask_ml[asgi]"
+            ) from e
+        app = self.asgi_app(max_workers=max_workers, flask_workers=flask_workers)
+        uvicorn.run(app, host=host, port=port, **options)
@@ -0,0 +1,242 @@
+import asyncio
+import inspect
+import io
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from flask_ml.flask_ml_server.metrics import PhaseTimer
+from flask_ml.flask_ml_server.profiling import PROFILE_HEADER
+from flask_ml.flask_ml_server.MLServer import EndpointDetailsNoSchema, MLServer
+from flask_ml.flask_ml_server.wsgi import error_response
+from flask_ml.flask_ml_server.streaming import NDJSON_MIMETYPE, is_stream, ndjson_lines
+from flask_ml.flask_ml_server.utils import parse_json_body
+
+logger = getLogger(__name__)
+
+Headers = List[Tuple[bytes, bytes]]
+
+_STREAM_END = object()
+
+# Bodies handed to the Flask app, like multipart uploads, move from memory to a temporary file past this size.
+_SPOOL_MAX_SIZE = 1024 * 1024
+
+
+async def _read_body(receive: Callable) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _spool_body(receive: Callable) -> IO[bytes]:
+    body = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+    while True:
+        message = await receive()
+        body.write(message.get("body", b""))
+        if not message.get("more_body", False):
+            body.seek(0)
+            return body
+
+
+async def _send_response(send: Callable, status: int, headers: Headers, body: bytes):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _wsgi_environ(scope: Dict[str, Any], body: IO[bytes]) -> Dict[str, Any]:
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    content_length = body.seek(0, io.SEEK_END)
+    body.seek(0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "CONTENT_LENGTH": str(content_length),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = "HTTP_" + name
+            environ[key] = environ[key] + "," + value if key in environ else value
+    return environ
+
+
+class ASGIApp:
+    """
+    Serves an MLServer as an ASGI application, so an asyncio server can hold many waiting clients while
+    a small thread pool runs the ML functions.
+
+    Task requests are parsed and validated on the event loop. Synchronous ML functions run in the thread
+    pool; async ML functions are awaited on the event loop. Every other request (metadata, jobs,
+    multipart uploads, requests asking to be profiled) is handed to the Flask app in a thread pool of its
+    own, so the schema endpoints and the error contract are the same as when serving over WSGI, and
+    metadata and metrics requests are answered even while every ML thread is busy. The sample_rate of
+    profiling only applies to requests handled by the Flask app.
+
+    max_workers : int - the number of threads that run ML functions
+    flask_workers : int - the number of threads that run Flask views
+    """
+
+    def __init__(self, server: MLServer, max_workers: int = 4, flask_workers: int = 4):
+        self._server = server
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="flask-ml-asgi")
+        self._flask_executor = ThreadPoolExecutor(
+            max_workers=flask_workers, thread_name_prefix="flask-ml-asgi-flask"
+        )
+
+    def _find_task_endpoint(self, scope: Dict[str, Any]) -> Optional[EndpointDetailsNoSchema]:
+        if scope["method"] != "POST":
+            return None
+        for name, value in scope.get("headers", []):
+            name = name.lower()
+            # Uploads are parsed and spooled by the Flask app.
+            if name == b"content-type" and value.lower().startswith(b"multipart/form-data"):
+                return None
+            # So are the requests that ask to be profiled.
+            if name == PROFILE_HEADER.lower().encode():
+                return None
+        for endpoint in self._server.endpoints:
+            if endpoint.rule == scope["path"]:
+                return endpoint
+        return None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        endpoint = self._find_task_endpoint(scope)
+        if endpoint is None:
+            await self._call_wsgi(scope, receive, send)
+        else:
+            await self._run_task(endpoint, await _read_body(receive), send)
+
+    async def _lifespan(self, receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._flask_executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _run_task(self, endpoint: EndpointDetailsNoSchema, body: bytes, send: Callable):
+        loop = asyncio.get_running_loop()
+        route_metrics = self._server.metrics.route(endpoint.rule)
+        route_metrics.in_flight.inc()
+        timer = PhaseTimer()
+        stream = None
+        try:
+            data = parse_json_body(body)
+            timer.mark("parse")
+            inputs, parameters = endpoint.plan.parse(data)
+            timer.mark("validate")
+            route_metrics.record_inputs(inputs)
+            limiter = self._server.limiters.get(endpoint.rule)
+            if inspect.iscoroutinefunction(endpoint.func):
+                result = endpoint.invoke(inputs, parameters)
+            elif limiter is not None:
+                # Requests are admitted here, so the ones waiting for a thread count as queued and those
+                # beyond the queue get a 429 right away.
+                reservation = limiter.reserve()
+                try:
+                    result = await loop.run_in_executor(
+                        self._executor, reservation.run, endpoint.invoke, inputs, parameters
+                    )
+                finally:
+                    limiter.cancel(reservation)
+            else:
+                result = await loop.run_in_executor(self._executor, endpoint.invoke, inputs, parameters)
+            if inspect.isawaitable(result):
+                result = await result
+            timer.mark("model")
+            if is_stream(result):
+                stream = result
+                status = 200
+            else:
+                logger.info(f"200: Successful request")
+                status = 200
+                headers = [(b"content-type", b"application/json")]
+                response_body = result.model_dump_json().encode()
+                timer.mark("serialize")
+        except Exception as e:
+            response = error_response(e)
+            status = response.status_code
+            headers = [
+                (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()
+            ]
+            response_body = response.get_data()
+        finally:
+            route_metrics.in_flight.dec()
+        route_metrics.record_phases(timer)
+        route_metrics.record_status(status)
+        timing = [(b"server-timing", timer.server_timing().encode())] if timer.phases else []
+        if stream is not None:
+            await self._stream(stream, send, timing)
+        else:
+            await _send_response(send, status, headers + timing, response_body)
+
+    async def _stream(self, items: Iterator[Any], send: Callable, extra_headers: Headers):
+        loop = asyncio.get_running_loop()
+        lines = ndjson_lines(items)
+        headers = [(b"content-type", NDJSON_MIMETYPE.encode())] + extra_headers
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        while True:
+            line = await loop.run_in_executor(self._executor, next, lines, _STREAM_END)
+            if line is _STREAM_END:
+                break
+            await send({"type": "http.response.body", "body": line, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    def _wsgi_call(self, environ: Dict[str, Any]) -> Tuple[int, Headers, bytes]:
+        started: Dict[str, Any] = {}
+
+        def start_response(status: str, response_headers: List[Tuple[str, str]], exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [
+                (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response_headers
+            ]
+
+        iterable = self._server.app(environ, start_response)
+        try:
+            body = b"".join(iterable)
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+        return started["status"], started["headers"], body
+
+    async def _call_wsgi(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        loop = asyncio.get_running_loop()
+        # Uploads can be large, so the body is spooled to disk rather than held in memory.
+        body = await _spool_body(receive)
+        try:
+            status, headers, response_body = await loop.run_in_executor(
+                self._flask_executor, self._wsgi_call, _wsgi_environ(scope, body)
+            )
+        finally:
+            body.close()
+        await _send_response(send, status, headers, response_body)
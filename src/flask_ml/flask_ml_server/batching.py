@@ -0,0 +1,169 @@
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from flask_ml.flask_ml_server.models import (
+    BatchDirectoryResponse,
+    BatchFileInput,
+    BatchFileResponse,
+    BatchTextInput,
+    BatchTextResponse,
+    ResponseBody,
+)
+from flask_ml.flask_ml_server.request_plan import RequestPlan
+
+BATCH_INPUT_FIELDS = {BatchTextInput: "texts", BatchFileInput: "files"}
+BATCH_RESPONSE_FIELDS = {
+    BatchTextResponse: "texts",
+    BatchFileResponse: "files",
+    BatchDirectoryResponse: "directories",
+}
+
+
+@dataclass(frozen=True)
+class BatchingConfig:
+    """
+    max_batch_size : int - the maximum number of items (texts or files) sent to the ML function at once
+    max_wait : float - the number of seconds the first request waits for others to join its batch
+    """
+
+    max_batch_size: int = 32
+    max_wait: float = 0.01
+
+    def __post_init__(self):
+        if self.max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if self.max_wait < 0:
+            raise ValueError("max_wait must not be negative")
+
+
+def find_batch_input_key(plan: RequestPlan) -> str:
+    """
+    Returns the key of the only BatchTextInput or BatchFileInput of a route.
+    """
+    keys = [key for key, model in plan.input_models.items() if model in BATCH_INPUT_FIELDS]
+    if len(keys) != 1:
+        raise ValueError(
+            f"Batching and deduplication need exactly one BatchTextInput or BatchFileInput input. Found {keys=}."
+        )
+    return keys[0]
+
+
+def batch_items(batch_input: BaseModel) -> List[Any]:
+    return getattr(batch_input, BATCH_INPUT_FIELDS[type(batch_input)])
+
+
+def with_batch_items(batch_input: BaseModel, items: List[Any]) -> BaseModel:
+    return type(batch_input)(**{BATCH_INPUT_FIELDS[type(batch_input)]: items})
+
+
+def response_items(response: ResponseBody) -> List[Any]:
+    field = BATCH_RESPONSE_FIELDS.get(type(response.root))
+    if field is None:
+        raise TypeError(
+            f"A batched route must return a BatchTextResponse, BatchFileResponse or BatchDirectoryResponse. Got {type(response.root).__name__}."
+        )
+    return getattr(response.root, field)
+
+
+def with_response_items(response: ResponseBody, items: List[Any]) -> ResponseBody:
+    field = BATCH_RESPONSE_FIELDS[type(response.root)]
+    return ResponseBody(root=response.root.model_copy(update={field: items}))
+
+
+class _Batch:
+    def __init__(self, inputs: Dict[str, Any], parameters: Dict[str, Any]):
+        self.inputs = inputs
+        self.parameters = parameters
+        self.items: List[Any] = []
+        self.spans: List[Tuple[int, int]] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.result: Optional[ResponseBody] = None
+        self.error: Optional[Exception] = None
+
+    def add(self, items: List[Any]) -> int:
+        self.spans.append((len(self.items), len(self.items) + len(items)))
+        self.items.extend(items)
+        return len(self.spans) - 1
+
+    def run(self, ml_function: Callable[[Any, Any], ResponseBody], batch_key: str):
+        try:
+            if len(self.spans) == 1:
+                self.result = ml_function(self.inputs, self.parameters)
+            else:
+                inputs = dict(self.inputs)
+                inputs[batch_key] = with_batch_items(inputs[batch_key], self.items)
+                self.result = ml_function(inputs, self.parameters)
+                count = len(response_items(self.result))
+                if count != len(self.items):
+                    raise RuntimeError(
+                        f"A batched route must return one response item per input item. Got {count} for {len(self.items)} inputs."
+                    )
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    def result_for(self, index: int) -> ResponseBody:
+        if self.error is not None:
+            raise self.error
+        assert self.result is not None, "FATAL: A finished batch must have a result or an error"
+        if len(self.spans) == 1:
+            return self.result
+        start, end = self.spans[index]
+        return with_response_items(self.result, response_items(self.result)[start:end])
+
+
+class MicroBatcher:
+    """
+    Merges concurrent calls with equal parameters into a single call of the ML function.
+
+    The first request of a batch becomes its leader: it waits up to max_wait seconds (or until the
+    batch holds max_batch_size items), runs the ML function on the merged inputs and hands each
+    follower its slice of the batch response.
+    """
+
+    def __init__(
+        self, ml_function: Callable[[Any, Any], ResponseBody], plan: RequestPlan, config: BatchingConfig
+    ):
+        self._ml_function = ml_function
+        self._batch_key = find_batch_input_key(plan)
+        self._config = config
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, _Batch] = {}
+
+    def _compatibility_key(self, inputs: Dict[str, Any], parameters: Dict[str, Any]) -> Hashable:
+        other_inputs = {
+            key: value.model_dump(mode="json") for key, value in inputs.items() if key != self._batch_key
+        }
+        return json.dumps([other_inputs, parameters], sort_keys=True, default=str)
+
+    def __call__(self, inputs: Dict[str, Any], parameters: Dict[str, Any]) -> ResponseBody:
+        key = self._compatibility_key(inputs, parameters)
+        items = batch_items(inputs[self._batch_key])
+        with self._lock:
+            batch = self._pending.get(key)
+            is_leader = batch is None or len(batch.items) + len(items) > self._config.max_batch_size
+            if is_leader:
+                batch = _Batch(inputs, parameters)
+                self._pending[key] = batch
+            assert batch is not None
+            index = batch.add(items)
+            if len(batch.items) >= self._config.max_batch_size:
+                batch.full.set()
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+
+        if is_leader:
+            batch.full.wait(self._config.max_wait)
+            with self._lock:
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+            batch.run(self._ml_function, self._batch_key)
+        else:
+            batch.done.wait()
+        return batch.result_for(index)
@@ -0,0 +1,67 @@
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Optional
+
+from flask_ml.flask_ml_server.batching import (
+    batch_items,
+    find_batch_input_key,
+    response_items,
+    with_batch_items,
+    with_response_items,
+)
+from flask_ml.flask_ml_server.metrics import Counter
+from flask_ml.flask_ml_server.models import ResponseBody
+from flask_ml.flask_ml_server.request_plan import RequestPlan
+from flask_ml.flask_ml_server.streaming import collect_stream, is_stream
+
+logger = getLogger(__name__)
+
+
+class Deduplicator:
+    """
+    Calls the ML function once per distinct text or file of the batch input, then copies each result back
+    to every position the item appeared at, so the response matches the request item for item.
+
+    Streamed results are collected first, because the copies can only be placed once every item is known.
+    """
+
+    def __init__(
+        self,
+        ml_function: Callable[[Any, Any], ResponseBody],
+        plan: RequestPlan,
+        input_items: Optional[Counter] = None,
+        unique_items: Optional[Counter] = None,
+    ):
+        self._ml_function = ml_function
+        self._batch_key = find_batch_input_key(plan)
+        self._input_items = input_items
+        self._unique_items = unique_items
+
+    def __call__(self, inputs: Dict[str, Any], parameters: Dict[str, Any]) -> ResponseBody:
+        items = batch_items(inputs[self._batch_key])
+        unique: List[Any] = []
+        positions: List[int] = []
+        seen: Dict[str, int] = {}
+        for item in items:
+            key = item.model_dump_json()
+            if key not in seen:
+                seen[key] = len(unique)
+                unique.append(item)
+            positions.append(seen[key])
+        if self._input_items is not None and self._unique_items is not None:
+            self._input_items.inc(len(items))
+            self._unique_items.inc(len(unique))
+        if len(unique) == len(items):
+            return self._ml_function(inputs, parameters)
+
+        logger.info(f"Deduplicated {len(items)} items to {len(unique)} ({len(unique) / len(items):.0%} unique)")
+        unique_inputs = dict(inputs)
+        unique_inputs[self._batch_key] = with_batch_items(inputs[self._batch_key], unique)
+        result = self._ml_function(unique_inputs, parameters)
+        if is_stream(result):
+            result = collect_stream(result)
+        results = response_items(result)
+        if len(results) != len(unique):
+            raise RuntimeError(
+                f"A deduplicated route must return one response item per input item. Got {len(results)} for {len(unique)} inputs."
+            )
+        return with_response_items(result, [results[position] for position in positions])
@@ -1,2 +1,11 @@
+from typing import Optional
+
+
 class BadRequestError(Exception):
     pass
+
+
+class TooManyRequestsError(Exception):
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
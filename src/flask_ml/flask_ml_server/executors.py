@@ -0,0 +1,79 @@
+import importlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from flask_ml.flask_ml_server.file_access import mapping_scope
+from flask_ml.flask_ml_server.models import ResponseBody
+
+EXECUTORS = ("inline", "process")
+
+_worker_function: Optional[Callable[[Any, Any], ResponseBody]] = None
+
+
+def _resolve_ml_function(module_name: str, qualname: str) -> Callable[[Any, Any], ResponseBody]:
+    obj: Any = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _init_worker(module_name: str, qualname: str):
+    global _worker_function
+    _worker_function = _resolve_ml_function(module_name, qualname)
+
+
+def _call_worker(inputs: Dict[str, Any], parameters: Dict[str, Any]) -> ResponseBody:
+    assert _worker_function is not None, "FATAL: The worker process was not initialized"
+    with mapping_scope():
+        return _worker_function(inputs, parameters)
+
+
+class ProcessPoolInvoker:
+    """
+    Runs an ML function in a pool of worker processes so CPU-bound models are not serialized on the GIL.
+
+    Each worker imports the module that defines the ML function once, when it starts, so module-level
+    model loading happens once per worker. Inputs and parameters are sent as the validated pydantic
+    models and the ResponseBody is sent back pickled.
+    """
+
+    def __init__(self, ml_function: Callable[[Any, Any], ResponseBody], workers: Optional[int] = None):
+        if "<locals>" in ml_function.__qualname__:
+            raise ValueError(
+                f"executor='process' needs a module-level ML function so worker processes can import it. {ml_function.__qualname__} is defined inside a function."
+            )
+        self._module_name = ml_function.__module__
+        self._qualname = ml_function.__qualname__
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    initializer=_init_worker,
+                    initargs=(self._module_name, self._qualname),
+                )
+            return self._executor
+
+    def __call__(self, inputs: Dict[str, Any], parameters: Dict[str, Any]) -> ResponseBody:
+        executor = self._get_executor()
+        try:
+            return executor.submit(_call_worker, inputs, parameters).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. it ran out of memory). Start a fresh pool for the next request.
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
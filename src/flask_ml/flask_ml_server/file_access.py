@@ -0,0 +1,285 @@
+import fnmatch
+import functools
+import inspect
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from flask_ml.flask_ml_server.models import BatchDirectoryInput, BatchFileInput, DirectoryInput, FileInput
+
+logger = getLogger(__name__)
+
+# (device, inode, size, mtime_ns): a file that is replaced or rewritten during a request gets a new mapping.
+FileKey = Tuple[int, int, int, int]
+
+
+@dataclass
+class _Mapping:
+    mmap: mmap.mmap
+    view: memoryview
+    refs: int = 0
+
+    def close(self):
+        try:
+            self.view.release()
+            self.mmap.close()
+        except BufferError:
+            # The caller still holds a slice of the view (or a numpy array over it). The mapping is unmapped
+            # when those are garbage collected instead.
+            logger.debug("A memory-mapped file is still in use and will be unmapped when it is collected")
+
+
+class MappingScope:
+    """
+    The files memory-mapped while handling one request. Opening the same file again shares its mapping,
+    and every mapping still open when the scope ends is unmapped.
+    """
+
+    def __init__(self):
+        self._mappings: Dict[FileKey, _Mapping] = {}
+
+    def open(self, path: str) -> memoryview:
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                # mmap cannot map an empty file.
+                return memoryview(b"")
+            key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            mapping = self._mappings.get(key)
+            if mapping is None:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                mapping = self._mappings[key] = _Mapping(mapped, memoryview(mapped))
+        mapping.refs += 1
+        return mapping.view
+
+    def release(self, view: memoryview):
+        for key, mapping in self._mappings.items():
+            if mapping.view is view:
+                mapping.refs -= 1
+                if mapping.refs == 0:
+                    del self._mappings[key]
+                    mapping.close()
+                return
+
+    def close(self):
+        mappings, self._mappings = self._mappings, {}
+        for mapping in mappings.values():
+            mapping.close()
+
+
+_current_scope: ContextVar[Optional[MappingScope]] = ContextVar("flask_ml_mapping_scope", default=None)
+
+
+@contextmanager
+def mapping_scope() -> Iterator[MappingScope]:
+    """
+    Ties the lifetime of the files mapped with open_mmap to a block, usually one call of an ML function.
+    """
+    scope = MappingScope()
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        scope.close()
+
+
+def with_mapping_scope(ml_function: Callable[[Any, Any], Any]) -> Callable[[Any, Any], Any]:
+    """
+    Runs every call of an ML function in a mapping scope of its own.
+    """
+    if inspect.iscoroutinefunction(ml_function):
+
+        @functools.wraps(ml_function)
+        async def scoped_coroutine(inputs: Dict[str, Any], parameters: Dict[str, Any]) -> Any:
+            with mapping_scope():
+                return await ml_function(inputs, parameters)
+
+        return scoped_coroutine
+
+    @functools.wraps(ml_function)
+    def scoped(inputs: Dict[str, Any], parameters: Dict[str, Any]) -> Any:
+        with mapping_scope():
+            return ml_function(inputs, parameters)
+
+    return scoped
+
+
+def open_mmap(file_input: FileInput) -> memoryview:
+    """
+    Returns a read-only view of the file's contents, backed by the page cache instead of a copy in Python
+    bytes. Inside an ML function served by MLServer the mapping lasts until the function returns, so the
+    view must not be kept beyond that. Elsewhere it lasts as long as the view is referenced.
+
+    Streaming ML functions keep running after they return, so the files they map last until collected.
+    """
+    scope = _current_scope.get()
+    if scope is not None:
+        return scope.open(file_input.path)
+    with open(file_input.path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def iter_buffers(batch_input: BatchFileInput) -> Iterator[memoryview]:
+    """
+    Maps the files of a batch one at a time, in order. See open_mmap.
+    """
+    for file_input in batch_input.files:
+        yield open_mmap(file_input)
+
+
+def release(view: memoryview):
+    """
+    Unmaps a file before the end of the request, once nothing uses its view any more. A file that was
+    opened several times is unmapped when the last of them is released.
+    """
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.release(view)
+    else:
+        view.release()
+
+
+@dataclass(frozen=True)
+class _Listing:
+    mtime_ns: int
+    files: Tuple[str, ...]
+    directories: Tuple[str, ...]
+
+
+class DirectoryListingCache:
+    """
+    The entries of recently listed directories, keyed on the directory's mtime. Adding, removing or
+    renaming an entry changes the mtime of its directory, so only the directories that changed are listed
+    again. Editing a file in place does not, and needs no new listing either.
+
+    max_directories : int - the number of directories kept. The least recently used are evicted first.
+    """
+
+    def __init__(self, max_directories: int = 100_000):
+        self.max_directories = max_directories
+        self._listings: "OrderedDict[str, _Listing]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+    def get(self, path: str, mtime_ns: int) -> Optional[_Listing]:
+        with self._lock:
+            listing = self._listings.get(path)
+            if listing is None or listing.mtime_ns != mtime_ns:
+                return None
+            self._listings.move_to_end(path)
+            return listing
+
+    def set(self, path: str, listing: _Listing):
+        with self._lock:
+            self._listings[path] = listing
+            self._listings.move_to_end(path)
+            while len(self._listings) > self.max_directories:
+                self._listings.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+
+
+LISTING_CACHE = DirectoryListingCache()
+
+
+def _list_directory(path: str, cache: Optional[DirectoryListingCache]) -> _Listing:
+    mtime_ns = os.stat(path).st_mtime_ns
+    if cache is not None:
+        listing = cache.get(path, mtime_ns)
+        if listing is not None:
+            return listing
+    files: List[str] = []
+    directories: List[str] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.is_file():
+                    files.append(entry.path)
+            except OSError:
+                # The entry was removed while listing.
+                continue
+    # The mtime is read before listing, so a change made while listing is picked up by the next call.
+    listing = _Listing(mtime_ns, tuple(files), tuple(directories))
+    if cache is not None:
+        cache.set(path, listing)
+    return listing
+
+
+def _matching(files: Tuple[str, ...], pattern: Optional[str]) -> Iterator[str]:
+    if pattern is None:
+        yield from files
+        return
+    for path in files:
+        if fnmatch.fnmatch(os.path.basename(path), pattern):
+            yield path
+
+
+def iter_files(
+    directory_input: Union[DirectoryInput, BatchDirectoryInput],
+    pattern: Optional[str] = None,
+    recursive: bool = True,
+    workers: int = 8,
+    cache: bool = True,
+) -> Iterator[str]:
+    """
+    Yields the paths of the files in a directory (or in each directory of a batch), as soon as each
+    directory has been listed and in no particular order. Symbolic links to directories are not followed.
+
+    pattern : str - only yield files whose name matches this shell-style pattern, e.g. "*.wav"
+    recursive : bool - also yield the files in subdirectories
+    workers : int - the number of directories listed at the same time
+    cache : bool - reuse the listings of directories that have not changed since an earlier call. The
+        listings are kept in LISTING_CACHE, shared by the whole process.
+    """
+    listing_cache = LISTING_CACHE if cache else None
+    match directory_input:
+        case DirectoryInput():
+            roots = [directory_input.path]
+        case BatchDirectoryInput():
+            roots = [directory.path for directory in directory_input.directories]
+        case _:
+            raise TypeError(f"iter_files takes a DirectoryInput or BatchDirectoryInput, got {directory_input!r}")
+
+    if not recursive:
+        for root in roots:
+            yield from _matching(_list_directory(root, listing_cache).files, pattern)
+        return
+
+    pending: List[str] = list(reversed(roots))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flask-ml-scandir")
+    running: Dict[Future, str] = {}
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                path = pending.pop()
+                running[executor.submit(_list_directory, path, listing_cache)] = path
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = running.pop(future)
+                try:
+                    listing = future.result()
+                except FileNotFoundError:
+                    if path in roots:
+                        raise
+                    # A subdirectory was removed after its parent was listed.
+                    continue
+                pending.extend(listing.directories)
+                yield from _matching(listing.files, pattern)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
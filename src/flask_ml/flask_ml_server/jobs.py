@@ -0,0 +1,142 @@
+import asyncio
+import inspect
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Any, Callable, Dict, Optional
+
+from flask_ml.flask_ml_server.errors import TooManyRequestsError
+from flask_ml.flask_ml_server.models import Job, JobStatus, ResponseBody
+from flask_ml.flask_ml_server.streaming import collect_stream, is_stream
+
+logger = getLogger(__name__)
+
+FINISHED_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+@dataclass
+class _JobRecord:
+    job_id: str
+    rule: str
+    status: JobStatus = JobStatus.QUEUED
+    result: Optional[ResponseBody] = None
+    error: Optional[str] = None
+    finished_at: Optional[float] = None
+    future: Optional[Future] = field(default=None, repr=False)
+
+    def to_model(self) -> Job:
+        return Job(job_id=self.job_id, status=self.status, result=self.result, error=self.error)
+
+
+class JobManager:
+    """
+    Runs ML functions in the background for the /jobs endpoints of every route.
+
+    max_workers : int - the number of jobs that run at the same time
+    max_pending : int - the number of unfinished (queued or running) jobs accepted before new submissions
+        are rejected
+    ttl : float - the number of seconds a finished job is kept before it is evicted
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, ttl: float = 3600.0):
+        self._max_pending = max_pending
+        self._ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="flask-ml-job")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, _JobRecord]" = OrderedDict()
+        self._pending = 0
+
+    def _evict_expired(self, now: float):
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self._ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _finish(self, job: _JobRecord, status: JobStatus):
+        # Must be called with the lock held.
+        if job.status in FINISHED_STATUSES:
+            return
+        job.status = status
+        job.finished_at = time.monotonic()
+        self._pending -= 1
+
+    def _run(
+        self,
+        job: _JobRecord,
+        invoke: Callable[[Any, Any], ResponseBody],
+        inputs: Dict[str, Any],
+        parameters: Dict[str, Any],
+    ):
+        with self._lock:
+            if job.status is not JobStatus.QUEUED:
+                return
+            job.status = JobStatus.RUNNING
+        try:
+            result = invoke(inputs, parameters)
+            if inspect.isawaitable(result):
+                result = asyncio.run(result)
+            if is_stream(result):
+                result = collect_stream(result)
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {repr(e)}")
+            with self._lock:
+                if job.status is JobStatus.RUNNING:
+                    job.error = repr(e)
+                self._finish(job, JobStatus.FAILED)
+            return
+        with self._lock:
+            if job.status is JobStatus.RUNNING:
+                job.result = result
+            self._finish(job, JobStatus.COMPLETED)
+
+    def submit(
+        self,
+        rule: str,
+        invoke: Callable[[Any, Any], ResponseBody],
+        inputs: Dict[str, Any],
+        parameters: Dict[str, Any],
+    ) -> Job:
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            if self._pending >= self._max_pending:
+                raise TooManyRequestsError(
+                    f"There are already {self._pending} unfinished jobs. Try again later."
+                )
+            job = _JobRecord(job_id=uuid.uuid4().hex, rule=rule)
+            self._jobs[job.job_id] = job
+            self._pending += 1
+            model = job.to_model()
+        job.future = self._executor.submit(self._run, job, invoke, inputs, parameters)
+        return model
+
+    def get(self, rule: str, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            job = self._jobs.get(job_id)
+            if job is None or job.rule != rule:
+                return None
+            return job.to_model()
+
+    def cancel(self, rule: str, job_id: str) -> Optional[Job]:
+        """
+        Cancels a job. A queued job never runs. A running job cannot be interrupted, so it is reported as
+        cancelled right away and its result is discarded when it finishes.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.rule != rule:
+                return None
+            if job.future is not None:
+                job.future.cancel()
+            self._finish(job, JobStatus.CANCELLED)
+            return job.to_model()
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
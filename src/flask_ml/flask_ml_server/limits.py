@@ -0,0 +1,147 @@
+import math
+import threading
+import time
+from contextvars import ContextVar
+from logging import getLogger
+from typing import Any, Callable, Dict, Optional
+
+from flask_ml.flask_ml_server.errors import TooManyRequestsError
+from flask_ml.flask_ml_server.models import ResponseBody
+
+logger = getLogger(__name__)
+
+# Weight of the latest call in the moving average of the ML function's duration.
+_DURATION_SMOOTHING = 0.2
+
+_reservation: ContextVar[Optional["Reservation"]] = ContextVar("flask_ml_reservation", default=None)
+
+
+class Reservation:
+    """
+    A queue place taken by ConcurrencyLimiter.reserve for a call that has not reached the limiter yet.
+    """
+
+    def __init__(self, limiter: "ConcurrencyLimiter"):
+        self.limiter = limiter
+        self.used = False
+
+    def run(self, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Calls the function so that the limiter it reaches uses this place instead of taking a new one.
+        """
+        token = _reservation.set(self)
+        try:
+            return function(*args)
+        finally:
+            _reservation.reset(token)
+
+
+class ConcurrencyLimiter:
+    """
+    Runs at most max_concurrency calls of the ML function at a time. Up to max_queue more calls wait for a
+    free slot in arrival order, and any call beyond that is rejected right away with a TooManyRequestsError
+    whose retry_after estimates when a slot will be free.
+
+    For a streaming ML function the slot is held while the iterator is created, not while it is consumed.
+
+    Callers that queue work before it reaches the limiter, like the thread pool of asgi_app(), take a
+    place with reserve() first, so that the calls waiting in their own queue count as queued too.
+
+    Set blocking to queue every call beyond max_concurrency instead of rejecting any, for callers that
+    bound the number of calls themselves, like the batch mode of MLCli.
+    """
+
+    def __init__(
+        self, ml_function: Callable[[Any, Any], ResponseBody], max_concurrency: int, max_queue: int = 0
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if max_queue < 0:
+            raise ValueError("max_queue must not be negative")
+        self._ml_function = ml_function
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.running = 0
+        self.waiting = 0
+        self.blocking = False
+        self._average_duration: Optional[float] = None
+        self._condition = threading.Condition()
+
+    def _retry_after(self) -> int:
+        # Must be called with the condition held.
+        if self._average_duration is None:
+            return 1
+        rounds = (self.waiting + self.running) / self.max_concurrency
+        return max(1, math.ceil(self._average_duration * rounds))
+
+    def _too_many_requests(self) -> TooManyRequestsError:
+        # Must be called with the condition held.
+        retry_after = self._retry_after()
+        logger.warning(
+            f"Rejecting a request: {self.running} running and {self.waiting} queued. Retry after {retry_after}s."
+        )
+        return TooManyRequestsError(
+            f"The route is at its limit of {self.max_concurrency} running and {self.max_queue} queued requests. Try again later.",
+            retry_after=retry_after,
+        )
+
+    def reserve(self) -> Reservation:
+        """
+        Takes a queue place for a call that reaches the limiter later, through Reservation.run, or raises
+        TooManyRequestsError when the route is full. Hand the place back with cancel once the call is
+        done; it is only given back if the call never used it, e.g. on a cache hit.
+        """
+        with self._condition:
+            if self.running + self.waiting >= self.max_concurrency + self.max_queue:
+                raise self._too_many_requests()
+            self.waiting += 1
+        return Reservation(self)
+
+    def cancel(self, reservation: Reservation):
+        with self._condition:
+            if not reservation.used:
+                reservation.used = True
+                self.waiting -= 1
+
+    def _acquire(self):
+        reservation = _reservation.get()
+        with self._condition:
+            if reservation is not None and reservation.limiter is self and not reservation.used:
+                # The call is already counted as queued.
+                reservation.used = True
+                try:
+                    while self.running >= self.max_concurrency:
+                        self._condition.wait()
+                finally:
+                    self.waiting -= 1
+                self.running += 1
+                return
+            if self.running < self.max_concurrency and self.waiting == 0:
+                self.running += 1
+                return
+            if self.waiting >= self.max_queue and not self.blocking:
+                raise self._too_many_requests()
+            self.waiting += 1
+            try:
+                while self.running >= self.max_concurrency:
+                    self._condition.wait()
+            finally:
+                self.waiting -= 1
+            self.running += 1
+
+    def _release(self, duration: float):
+        with self._condition:
+            self.running -= 1
+            if self._average_duration is None:
+                self._average_duration = duration
+            else:
+                self._average_duration += _DURATION_SMOOTHING * (duration - self._average_duration)
+            self._condition.notify()
+
+    def __call__(self, inputs: Dict[str, Any], parameters: Dict[str, Any]) -> ResponseBody:
+        self._acquire()
+        start = time.perf_counter()
+        try:
+            return self._ml_function(inputs, parameters)
+        finally:
+            self._release(time.perf_counter() - start)
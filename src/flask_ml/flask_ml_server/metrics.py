@@ -0,0 +1,302 @@
+import bisect
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask_ml.flask_ml_server.models import BatchDirectoryInput, BatchFileInput, BatchTextInput
+
+METRICS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+PHASES = ("parse", "validate", "model", "serialize")
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """
+    A value that goes up and down. When a function is set, it is called for the value at scrape time.
+    """
+
+    def __init__(self):
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # One count per bucket plus one for +Inf. Cumulated only when rendered.
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative_counts(self) -> List[Tuple[float, int]]:
+        with self._lock:
+            counts = list(self._counts)
+        total = 0
+        cumulative = []
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+class MetricFamily:
+    """
+    All the series of one metric name, one per combination of label values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        metric_type: str,
+        documentation: str,
+        label_names: Sequence[str],
+        buckets: Optional[Sequence[float]] = None,
+    ):
+        self.name = name
+        self.metric_type = metric_type
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        if self.metric_type == "counter":
+            return Counter()
+        if self.metric_type == "gauge":
+            return Gauge()
+        return Histogram(self.buckets or LATENCY_BUCKETS)
+
+    def labels(self, *values: str):
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} takes the labels {self.label_names}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.metric_type}"
+        for values, child in sorted(self._children.items()):
+            labels = _format_labels(self.label_names, values)
+            if isinstance(child, Histogram):
+                for bound, count in child.cumulative_counts():
+                    bucket_labels = _format_labels(
+                        self.label_names + ("le",), values + (_format_number(bound),)
+                    )
+                    yield f"{self.name}_bucket{bucket_labels} {count}"
+                yield f"{self.name}_sum{labels} {_format_number(child.sum)}"
+                yield f"{self.name}_count{labels} {child.count}"
+            else:
+                yield f"{self.name}{labels} {_format_number(child.value)}"
+
+
+class PhaseTimer:
+    """
+    Measures the consecutive phases of one request. Each mark() closes the phase that started at the
+    previous mark (or at creation).
+    """
+
+    __slots__ = ("phases", "_last")
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+        self._last = time.perf_counter()
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def server_timing(self) -> str:
+        """
+        The phases as a Server-Timing header value, in milliseconds: "parse;dur=0.041, model;dur=12.3".
+        """
+        return ", ".join(f"{phase};dur={seconds * 1000:.3f}" for phase, seconds in self.phases)
+
+
+def batch_sizes(inputs: Dict[str, Any]) -> Iterable[int]:
+    for value in inputs.values():
+        match value:
+            case BatchTextInput():
+                yield len(value.texts)
+            case BatchFileInput():
+                yield len(value.files)
+            case BatchDirectoryInput():
+                yield len(value.directories)
+
+
+class RouteMetrics:
+    """
+    The series of one route, looked up once when the route is registered so that recording a request
+    does not go through the label lookups.
+    """
+
+    def __init__(self, metrics: "Metrics", rule: str):
+        self._metrics = metrics
+        self.rule = rule
+        self.in_flight: Gauge = metrics.in_flight.labels(rule)
+        self.phases: Dict[str, Histogram] = {
+            phase: metrics.phase_seconds.labels(rule, phase) for phase in PHASES
+        }
+        self.batch_size: Histogram = metrics.batch_size.labels(rule)
+        self._statuses: Dict[int, Counter] = {}
+
+    def record_status(self, status: int):
+        counter = self._statuses.get(status)
+        if counter is None:
+            counter = self._statuses.setdefault(status, self._metrics.requests.labels(self.rule, str(status)))
+        counter.inc()
+
+    def record_phases(self, timer: PhaseTimer):
+        for phase, seconds in timer.phases:
+            self.phases[phase].observe(seconds)
+
+    def record_inputs(self, inputs: Dict[str, Any]):
+        for size in batch_sizes(inputs):
+            self.batch_size.observe(size)
+
+
+class Metrics:
+    """
+    The metrics of an MLServer, served in the Prometheus text format at /api/metrics.
+
+    Recording is a few perf_counter calls and short critical sections per request, so it is always on.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._routes: Dict[str, RouteMetrics] = {}
+        self.requests = self.counter(
+            "flask_ml_requests_total", "Task requests by route and response status.", ["route", "status"]
+        )
+        self.phase_seconds = self.histogram(
+            "flask_ml_request_phase_seconds",
+            "Time spent in each phase of a task request: parse, validate, model and serialize.",
+            ["route", "phase"],
+        )
+        self.batch_size = self.histogram(
+            "flask_ml_batch_size",
+            "Number of items in the batch inputs of a task request.",
+            ["route"],
+            buckets=BATCH_SIZE_BUCKETS,
+        )
+        self.in_flight = self.gauge(
+            "flask_ml_in_flight_requests", "Task requests currently being handled.", ["route"]
+        )
+        self.running = self.gauge(
+            "flask_ml_running_calls",
+            "Calls of the ML function currently holding a slot of the route's concurrency limit.",
+            ["route"],
+        )
+        self.queue_depth = self.gauge(
+            "flask_ml_queue_depth", "Calls waiting for a slot of the route's concurrency limit.", ["route"]
+        )
+        self.queue_capacity = self.gauge(
+            "flask_ml_queue_capacity", "The max_queue of routes with a concurrency limit.", ["route"]
+        )
+        self.dedupe_input_items = self.counter(
+            "flask_ml_dedupe_input_items_total",
+            "Batch items received by routes with dedupe. Divide the unique items by it for the dedupe ratio.",
+            ["route"],
+        )
+        self.dedupe_unique_items = self.counter(
+            "flask_ml_dedupe_unique_items_total",
+            "Distinct batch items passed to the ML function by routes with dedupe.",
+            ["route"],
+        )
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        if family.name in self._families:
+            raise ValueError(f"A metric named {family.name} is already registered")
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, "counter", documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, "gauge", documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> MetricFamily:
+        return self._register(MetricFamily(name, "histogram", documentation, label_names, buckets))
+
+    def route(self, rule: str) -> RouteMetrics:
+        route_metrics = self._routes.get(rule)
+        if route_metrics is None:
+            route_metrics = self._routes[rule] = RouteMetrics(self, rule)
+        return route_metrics
+
+    def render(self) -> str:
+        lines = [line for family in self._families.values() for line in family.render()]
+        return "\n".join(lines) + "\n"
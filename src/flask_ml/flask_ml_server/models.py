@@ -353,3 +353,21 @@ class TaskSchema(BaseModel):
     )
     inputs: List[InputSchema]
     parameters: List[ParameterSchema]
+
+
+class JobStatus(Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+
+class Job(BaseModel):
+    model_config = ConfigDict(
+        populate_by_name=True,
+    )
+    job_id: str
+    status: JobStatus
+    result: Optional[ResponseBody] = None
+    error: Optional[str] = None
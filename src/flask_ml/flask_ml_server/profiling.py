@@ -0,0 +1,174 @@
+import cProfile
+import hmac
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from logging import getLogger
+from types import FrameType
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+logger = getLogger(__name__)
+
+PROFILE_HEADER = "X-Flask-ML-Profile"
+PROFILE_ID_HEADER = "X-Flask-ML-Profile-Id"
+ADMIN_TOKEN_HEADER = "X-Flask-ML-Admin-Token"
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    """
+    token : str - the admin token. A task request is profiled when its X-Flask-ML-Profile header holds it,
+        and the stored profiles are only served to requests whose X-Flask-ML-Admin-Token header holds it.
+    sample_rate : float - the fraction of all other task requests to profile, between 0 and 1
+    max_profiles : int - the number of profiles kept. The oldest are dropped first.
+    sampling_interval : float - the number of seconds between two stack samples for the collapsed stacks
+    """
+
+    token: str
+    sample_rate: float = 0.0
+    max_profiles: int = 100
+    sampling_interval: float = 0.001
+
+    def __post_init__(self):
+        if not self.token:
+            raise ValueError("token must not be empty")
+        if not 0 <= self.sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if self.max_profiles < 1:
+            raise ValueError("max_profiles must be at least 1")
+        if self.sampling_interval <= 0:
+            raise ValueError("sampling_interval must be positive")
+
+
+@dataclass(frozen=True)
+class StoredProfile:
+    profile_id: str
+    rule: str
+    created: float
+    duration: float
+    pstats: bytes
+    collapsed: str
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "profile_id": self.profile_id,
+            "rule": self.rule,
+            "created": self.created,
+            "duration": self.duration,
+            "pstats": f"/api/profiles/{self.profile_id}/pstats",
+            "collapsed": f"/api/profiles/{self.profile_id}/collapsed",
+        }
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler:
+    """
+    Samples the stack of one thread from a background thread and counts each distinct stack, in the
+    collapsed format read by flamegraph.pl and speedscope: one "root;caller;callee count" line per stack.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="flask-ml-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            frame: Optional[FrameType] = sys._current_frames().get(self._thread_id)
+            names: List[str] = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self._stacks[";".join(reversed(names))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+class Profiler:
+    """
+    Profiles selected task requests with cProfile and a stack sampler, and keeps the latest profiles.
+    """
+
+    def __init__(self, config: ProfilingConfig):
+        self.config = config
+        self._profiles: "OrderedDict[str, StoredProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+        # cProfile can only profile one request of a process at a time.
+        self._running = threading.Lock()
+
+    def is_authorized(self, token: Optional[str]) -> bool:
+        return token is not None and hmac.compare_digest(token.encode(), self.config.token.encode())
+
+    def should_profile(self, header: Optional[str]) -> bool:
+        if header is not None:
+            return self.is_authorized(header)
+        return self.config.sample_rate > 0 and random.random() < self.config.sample_rate
+
+    def run(self, rule: str, handle: Callable[[], T]) -> Tuple[T, Optional[str]]:
+        """
+        Runs handle under the profiler and returns its result with the id of the stored profile. Requests
+        that arrive while another one is being profiled run without the profiler, and get no id.
+        """
+        if not self._running.acquire(blocking=False):
+            return handle(), None
+        try:
+            profile = cProfile.Profile()
+            start = time.perf_counter()
+            with _StackSampler(threading.get_ident(), self.config.sampling_interval) as sampler:
+                profile.enable()
+                try:
+                    result = handle()
+                finally:
+                    profile.disable()
+            duration = time.perf_counter() - start
+        finally:
+            self._running.release()
+        profile.create_stats()
+        stored = StoredProfile(
+            profile_id=uuid.uuid4().hex,
+            rule=rule,
+            created=time.time(),
+            duration=duration,
+            # The format of pstats.Stats.dump_stats, so pstats.Stats(path) and snakeviz can load it.
+            pstats=marshal.dumps(profile.stats),  # type: ignore
+            collapsed=sampler.collapsed(),
+        )
+        with self._lock:
+            self._profiles[stored.profile_id] = stored
+            while len(self._profiles) > self.config.max_profiles:
+                self._profiles.popitem(last=False)
+        logger.info(f"Profiled a request to {rule} in {duration:.3f}s: {stored.profile_id}")
+        return result, stored.profile_id
+
+    def get(self, profile_id: str) -> Optional[StoredProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def profiles(self) -> List[StoredProfile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Mapping, Tuple, Type, Union, get_type_hints
+
+from pydantic import BaseModel, TypeAdapter
+
+from flask_ml.flask_ml_server.errors import BadRequestError
+from flask_ml.flask_ml_server.models import ParameterType, ResponseBody, TaskSchema
+from flask_ml.flask_ml_server.utils import (
+    input_model_for_type,
+    validate_data_has_keys,
+    validate_data_is_dict,
+)
+
+ParameterValue = Union[str, int, float]
+
+
+@dataclass(frozen=True)
+class RequestPlan:
+    """
+    Everything needed to turn a JSON request body into the arguments of an ML function.
+    Compiled once when the route is registered so the request path only checks keys and validates.
+    """
+
+    input_keys: FrozenSet[str]
+    parameter_keys: FrozenSet[str]
+    input_models: Mapping[str, Type[BaseModel]]
+    input_adapters: Mapping[str, TypeAdapter]
+    parameter_coercers: Mapping[str, Callable[[Any], ParameterValue]]
+
+    def parse(self, data: Any) -> Tuple[Dict[str, Any], Dict[str, ParameterValue]]:
+        validate_data_has_keys(data, ["inputs", "parameters"])
+        json_inputs = validate_data_is_dict(data["inputs"], "inputs")
+        if json_inputs.keys() != self.input_keys:
+            raise BadRequestError(
+                f"Keys mismatch. The input schema has input_keys={set(self.input_keys)} while your json data has json_keys={set(json_inputs.keys())}. Ensure the request body contains all keys under the key 'inputs'. Call /api/routes to see how to use the API."
+            )
+        inputs = {
+            key: adapter.validate_python(json_inputs[key]) for key, adapter in self.input_adapters.items()
+        }
+
+        json_parameters = validate_data_is_dict(data["parameters"], "parameters")
+        if json_parameters.keys() != self.parameter_keys:
+            raise BadRequestError(
+                f"Keys mismatch. The parameter schema has parameter_keys={set(self.parameter_keys)} while your json data has json_keys={set(json_parameters.keys())}. Ensure the request body contains all keys under the key 'parameters'. Call /api/routes to see how to use the API."
+            )
+        parameters = {key: coerce(json_parameters[key]) for key, coerce in self.parameter_coercers.items()}
+        return inputs, parameters
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _coerce_float(value: Any) -> Any:
+    # JSON has no separate float type, so clients routinely send 0 for a float parameter.
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def parameter_coercer_for_type(parameter_type: Any) -> Callable[[Any], ParameterValue]:
+    if parameter_type is float or parameter_type in (ParameterType.FLOAT, ParameterType.RANGED_FLOAT):
+        return _coerce_float
+    return _identity
+
+
+def _compile(
+    input_models: Mapping[str, Type[BaseModel]], parameter_types: Mapping[str, Any]
+) -> RequestPlan:
+    return RequestPlan(
+        input_keys=frozenset(input_models.keys()),
+        parameter_keys=frozenset(parameter_types.keys()),
+        input_models=dict(input_models),
+        input_adapters={key: TypeAdapter(model) for key, model in input_models.items()},
+        parameter_coercers={
+            key: parameter_coercer_for_type(parameter_type) for key, parameter_type in parameter_types.items()
+        },
+    )
+
+
+def compile_schema_request_plan(task_schema: TaskSchema) -> RequestPlan:
+    return _compile(
+        {
+            input_schema.key: input_model_for_type(input_schema.input_type)
+            for input_schema in task_schema.inputs
+        },
+        {parameter.key: parameter.value.parameter_type for parameter in task_schema.parameters},
+    )
+
+
+def compile_no_schema_request_plan(ml_function: Callable[[Any, Any], ResponseBody]) -> RequestPlan:
+    hints = get_type_hints(ml_function)
+    return _compile(get_type_hints(hints["inputs"]), get_type_hints(hints["parameters"]))
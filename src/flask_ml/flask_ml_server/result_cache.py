@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from logging import getLogger
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from pydantic import BaseModel
+
+from flask_ml.flask_ml_server.file_access import iter_files
+from flask_ml.flask_ml_server.models import (
+    BatchDirectoryInput,
+    BatchFileInput,
+    DirectoryInput,
+    FileInput,
+    ResponseBody,
+)
+
+logger = getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    """
+    Keeps cached responses in memory, evicting the least recently used ones beyond max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DiskCacheBackend:
+    """
+    Keeps cached responses as files in a directory, evicting the least recently used ones beyond max_bytes.
+    Entries already in the directory are picked up again when the server restarts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".json")]
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime_ns):
+            self._index[entry.name[: -len(".json")]] = entry.stat().st_size
+            self.size += entry.stat().st_size
+        with self._lock:
+            self._evict()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            key, size = self._index.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            with self._lock:
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self.size -= size
+            return None
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old is not None:
+                self.size -= old
+            self._index[key] = len(value)
+            self.size += len(value)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for key in self._index:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._index.clear()
+            self.size = 0
+
+
+def _iter_paths(value: BaseModel) -> Iterator[str]:
+    match value:
+        case FileInput() | DirectoryInput():
+            yield value.path
+        case BatchFileInput():
+            for file_input in value.files:
+                yield file_input.path
+        case BatchDirectoryInput():
+            for directory_input in value.directories:
+                yield directory_input.path
+    if isinstance(value, (DirectoryInput, BatchDirectoryInput)):
+        # Editing a file in place, or anything in a subdirectory, leaves the stat of the directory as it
+        # was, so the files inside are part of the key too.
+        try:
+            yield from iter_files(value)
+        except OSError:
+            # A missing directory is keyed by its own state.
+            pass
+
+
+def _path_state(path: str) -> Optional[List[int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+class ResultCache:
+    """
+    An opt-in cache of ML function results for routes whose output only depends on their request.
+
+    The key combines the route, the app version, the canonicalized inputs and parameters, and the
+    (size, mtime_ns, inode) of every file or directory the inputs point to and of every file inside those
+    directories, so a file that changes on disk is a cache miss. Directory inputs are therefore walked on
+    every request.
+
+    max_bytes : int - the byte budget of the cached responses. The least recently used are evicted first.
+    directory : str - keep the responses in this directory instead of in memory
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, directory: Optional[str] = None):
+        self.backend: Union[MemoryCacheBackend, DiskCacheBackend] = (
+            DiskCacheBackend(directory, max_bytes) if directory is not None else MemoryCacheBackend(max_bytes)
+        )
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def key(self, namespace: str, inputs: Dict[str, Any], parameters: Dict[str, Any]) -> str:
+        canonical = json.dumps(
+            {
+                "namespace": namespace,
+                "inputs": {key: value.model_dump(mode="json") for key, value in inputs.items()},
+                "parameters": parameters,
+                "paths": {
+                    path: _path_state(path) for value in inputs.values() for path in _iter_paths(value)
+                },
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def wrap(
+        self, invoke: Callable[[Any, Any], ResponseBody], namespace: Callable[[], str]
+    ) -> Callable[[Any, Any], ResponseBody]:
+        def cached_invoke(inputs: Dict[str, Any], parameters: Dict[str, Any]) -> ResponseBody:
+            key = self.key(namespace(), inputs, parameters)
+            cached = self.backend.get(key)
+            with self._stats_lock:
+                if cached is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if cached is not None:
+                return ResponseBody.model_validate_json(cached)
+            result = invoke(inputs, parameters)
+            if isinstance(result, ResponseBody):
+                self.backend.set(key, result.model_dump_json().encode())
+            return result
+
+        return cached_invoke
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.backend),
+            "bytes": self.backend.size,
+        }
+
+    def clear(self):
+        logger.info("Clearing the result cache")
+        self.backend.clear()
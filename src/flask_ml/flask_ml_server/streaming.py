@@ -0,0 +1,68 @@
+import json
+from logging import getLogger
+from typing import Any, Iterable, Iterator, List, Union
+
+from flask_ml.flask_ml_server.models import (
+    BatchDirectoryResponse,
+    BatchFileResponse,
+    BatchTextResponse,
+    DirectoryResponse,
+    FileResponse,
+    MarkdownResponse,
+    ResponseBody,
+    TextResponse,
+)
+
+logger = getLogger(__name__)
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+STREAM_ITEM_TYPES = (FileResponse, DirectoryResponse, MarkdownResponse, TextResponse)
+
+StreamItem = Union[FileResponse, DirectoryResponse, MarkdownResponse, TextResponse]
+
+
+def is_stream(result: Any) -> bool:
+    """
+    ML functions may return an iterator (usually a generator) of response items instead of a ResponseBody.
+    """
+    return not isinstance(result, ResponseBody) and isinstance(result, Iterator)
+
+
+def _check_item(item: Any) -> StreamItem:
+    if isinstance(item, ResponseBody):
+        item = item.root
+    if not isinstance(item, STREAM_ITEM_TYPES):
+        raise TypeError(
+            f"A streaming ML function must yield FileResponse, DirectoryResponse, MarkdownResponse or TextResponse items. Got {type(item).__name__}."
+        )
+    return item
+
+
+def ndjson_lines(items: Iterable[Any]) -> Iterator[bytes]:
+    """
+    Serializes each item as one line of JSON as soon as the ML function yields it. An error raised while
+    iterating ends the stream with a line in the same shape as the 500 SERVER_ERROR response.
+    """
+    count = 0
+    try:
+        for item in items:
+            yield _check_item(item).model_dump_json().encode() + b"\n"
+            count += 1
+        logger.info(f"200: Streamed {count} items")
+    except Exception as e:
+        logger.error(f"500: Error after streaming {count} items: {repr(e)}")
+        yield json.dumps({"error": repr(e), "status": "SERVER_ERROR"}).encode() + b"\n"
+
+
+def collect_stream(items: Iterable[Any]) -> ResponseBody:
+    """
+    Gathers the items of a stream into the matching batch response, for callers that need the whole result.
+    """
+    collected: List[StreamItem] = [_check_item(item) for item in items]
+    if all(isinstance(item, TextResponse) for item in collected):
+        return ResponseBody(root=BatchTextResponse(texts=collected))  # type: ignore
+    if all(isinstance(item, FileResponse) for item in collected):
+        return ResponseBody(root=BatchFileResponse(files=collected))  # type: ignore
+    if all(isinstance(item, DirectoryResponse) for item in collected):
+        return ResponseBody(root=BatchDirectoryResponse(directories=collected))  # type: ignore
+    raise TypeError("A stream can only be collected when all of its items have the same response type")
@@ -40,7 +40,12 @@ def generate_text_response(predictions: Dict[str, str]) -> models.ResponseBody:
 
 
 class FileML:
-    def __init__(self, parameters: Dict={}):
+    def __init__(self, parameters: Dict={}, dedupe: bool = False):
+        """
+        dedupe : bool - run the model once per distinct input of a batch. Routes registered with this
+            template's task_schema_func use it unless route() is given dedupe explicitly.
+        """
+        self.dedupe = dedupe
         self.InputType = FileInputs
         self.parameters = parameters
         parameter_types = parameters_to_types(parameters)
@@ -62,7 +67,12 @@ class FileML:
 
 
 class TextML:
-    def __init__(self, parameters: Dict={}):
+    def __init__(self, parameters: Dict={}, dedupe: bool = False):
+        """
+        dedupe : bool - run the model once per distinct input of a batch. Routes registered with this
+            template's task_schema_func use it unless route() is given dedupe explicitly.
+        """
+        self.dedupe = dedupe
         self.InputType = TextInputs
         self.parameters = parameters
         parameter_types = parameters_to_types(parameters)
@@ -0,0 +1,7 @@
+# The names shared by the server and the client for multipart task requests. They live apart from
+# uploads.py so that the client can use them without importing werkzeug.
+
+# The paths of FileInputs in the JSON request body that refer to an uploaded part: upload://<part name>.
+UPLOAD_SCHEME = "upload://"
+# The part of a multipart task request that holds the JSON request body.
+REQUEST_PART = "request"
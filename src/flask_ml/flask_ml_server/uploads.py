@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import tempfile
+from logging import getLogger
+from typing import Any, Mapping, Optional
+
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from flask_ml.flask_ml_server.errors import BadRequestError
+from flask_ml.flask_ml_server.upload_scheme import REQUEST_PART, UPLOAD_SCHEME
+
+logger = getLogger(__name__)
+
+
+class UploadSpool:
+    """
+    The files uploaded with one multipart task request.
+
+    Werkzeug keeps small parts in memory while parsing the request and spills bigger ones to temporary
+    files. Each part is then written to a temporary directory of its own, because ML functions read their
+    inputs by path, and the directory is removed by cleanup() once the response has been sent.
+
+    directory : str - where the temporary directories are created. Defaults to the system temp directory.
+    """
+
+    def __init__(self, files: Mapping[str, FileStorage], directory: Optional[str] = None):
+        self.directory = tempfile.mkdtemp(prefix="flask-ml-upload-", dir=directory)
+        self.paths = {}
+        try:
+            for index, (name, storage) in enumerate(files.items()):
+                part_directory = os.path.join(self.directory, str(index))
+                os.mkdir(part_directory)
+                path = os.path.join(part_directory, secure_filename(storage.filename or "") or "upload")
+                storage.save(path)
+                self.paths[name] = path
+        except Exception:
+            self.cleanup()
+            raise
+
+    def _resolve_path(self, path: str) -> str:
+        name = path[len(UPLOAD_SCHEME) :]
+        if name not in self.paths:
+            raise BadRequestError(
+                f"The path {path} refers to an upload named {name!r}, but the request has no file part with that name. Uploaded parts: {sorted(self.paths)}."
+            )
+        return self.paths[name]
+
+    def resolve(self, value: Any) -> Any:
+        """
+        Replaces every path of the form upload://<part name> in the request with the path of the spooled
+        file.
+        """
+        if isinstance(value, dict):
+            return {
+                key: (
+                    self._resolve_path(item)
+                    if key == "path" and isinstance(item, str) and item.startswith(UPLOAD_SCHEME)
+                    else self.resolve(item)
+                )
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [self.resolve(item) for item in value]
+        return value
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def parse_multipart_request(form: Mapping[str, str], files: Mapping[str, FileStorage]) -> Any:
+    """
+    Reads the JSON request body from the "request" part of a multipart task request.
+    """
+    if REQUEST_PART not in form:
+        raise BadRequestError(
+            f"A multipart task request must have a {REQUEST_PART!r} part holding the JSON request body."
+        )
+    try:
+        return json.loads(form[REQUEST_PART])
+    except ValueError as e:
+        raise BadRequestError(f"The {REQUEST_PART!r} part must be valid JSON. {e}")
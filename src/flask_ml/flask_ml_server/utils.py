@@ -1,11 +1,11 @@
-from typing import Any, Callable, Dict, List, Mapping, Union, get_type_hints
+import json
+from typing import Any, Callable, Dict, List, Mapping, Type, Union, get_type_hints
 
 from pydantic import BaseModel
 from typing_extensions import assert_never
 
 from flask_ml.flask_ml_server import models
 from flask_ml.flask_ml_server.errors import BadRequestError
-from flask_ml.flask_ml_server.MLServer import TaskSchema
 from flask_ml.flask_ml_server.models import (
     BatchDirectoryInput,
     BatchFileInput,
@@ -23,11 +23,23 @@ from flask_ml.flask_ml_server.models import (
     RangedIntParameterDescriptor,
     RequestBody,
     ResponseBody,
+    TaskSchema,
     TextInput,
     TextParameterDescriptor,
 )
 
 
+def parse_json_body(body: bytes) -> Any:
+    """
+    Parses the body of a task request as JSON, whatever its Content-Type, so that serving over WSGI
+    and ASGI accepts and rejects the same bodies.
+    """
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise BadRequestError(f"Request body must be valid JSON. {e}")
+
+
 def validate_data_is_dict(data_: Any, key="Request body"):
     if not isinstance(data_, dict):
         raise BadRequestError(
@@ -45,28 +57,32 @@ def validate_data_has_keys(data_: Any, keys: List[str]):
         )
 
 
-def input_from_data(input_type: Union[InputType, NewFileInputType], data: Dict[str, Any]):
+def input_model_for_type(input_type: Union[InputType, NewFileInputType]) -> Type[BaseModel]:
     match input_type:
         case NewFileInputType():
-            return FileInput(**data)
+            return FileInput
         case InputType.FILE:
-            return FileInput(**data)
+            return FileInput
         case InputType.DIRECTORY:
-            return DirectoryInput(**data)
+            return DirectoryInput
         case InputType.TEXT:
-            return TextInput(**data)
+            return TextInput
         case InputType.TEXTAREA:
-            return TextInput(**data)
+            return TextInput
         case InputType.BATCHFILE:
-            return BatchFileInput(**data)
+            return BatchFileInput
         case InputType.BATCHTEXT:
-            return BatchTextInput(**data)
+            return BatchTextInput
         case InputType.BATCHDIRECTORY:
-            return BatchDirectoryInput(**data)
+            return BatchDirectoryInput
         case _:  # pragma: no cover
             assert_never(input_type)
 
 
+def input_from_data(input_type: Union[InputType, NewFileInputType], data: Dict[str, Any]):
+    return input_model_for_type(input_type)(**data)
+
+
 def schema_get_inputs(schema: TaskSchema, data_: Dict[str, Any]):
     json_inputs = validate_data_is_dict(data_, "inputs")
     input_schema = schema.inputs
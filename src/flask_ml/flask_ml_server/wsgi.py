@@ -0,0 +1,283 @@
+import asyncio
+import inspect
+import json
+import traceback
+from logging import getLogger
+from typing import TYPE_CHECKING, Any, Callable, Union, get_type_hints
+
+from flask import Flask, Response, request
+from pydantic import ValidationError
+
+from flask_ml.flask_ml_server.errors import BadRequestError, TooManyRequestsError
+from flask_ml.flask_ml_server.metrics import METRICS_MIMETYPE, PhaseTimer
+from flask_ml.flask_ml_server.profiling import ADMIN_TOKEN_HEADER, PROFILE_HEADER, PROFILE_ID_HEADER, Profiler
+from flask_ml.flask_ml_server.streaming import NDJSON_MIMETYPE, is_stream, ndjson_lines
+from flask_ml.flask_ml_server.uploads import UploadSpool, parse_multipart_request
+from flask_ml.flask_ml_server.utils import (
+    parse_json_body,
+    schema_get_sample_payload,
+    type_hinting_get_sample_payload,
+)
+
+if TYPE_CHECKING:
+    from flask_ml.flask_ml_server.MLServer import EndpointDetailsNoSchema, MLServer
+
+logger = getLogger(__name__)
+
+
+def error_response(e: Exception) -> Response:
+    """
+    Converts an exception raised while handling a task request into the JSON error response.
+    """
+    if isinstance(e, ValidationError):
+        error = {"error": e.errors(), "status": "VALIDATION_ERROR"}
+        logger.error(f"400: Validation error: {error}")
+        return Response(status=400, mimetype="application/json", response=json.dumps(error))
+    if isinstance(e, BadRequestError):
+        logger.error(f"400: Bad request: {e}")
+        return Response(
+            status=400,
+            mimetype="application/json",
+            response=json.dumps({"error": str(e), "status": "VALIDATION_ERROR"}),
+        )
+    if isinstance(e, TooManyRequestsError):
+        logger.warning(f"429: Too many requests: {e}")
+        response = Response(
+            status=429,
+            mimetype="application/json",
+            response=json.dumps({"error": str(e), "status": "TOO_MANY_REQUESTS"}),
+        )
+        if e.retry_after is not None:
+            response.headers["Retry-After"] = str(e.retry_after)
+        return response
+    logger.error(f"500: Internal server error: {repr(e)}")
+    logger.error(traceback.format_exc())
+    return Response(
+        status=500,
+        mimetype="application/json",
+        response=json.dumps({"error": repr(e), "status": "SERVER_ERROR"}),
+    )
+
+
+def metadata_response(server: "MLServer", key: str, build: Callable[[], Union[str, bytes]]) -> Response:
+    """
+    Serves a metadata payload from the cache of the server, with a strong ETag so that clients polling
+    with If-None-Match get an empty 304 while nothing has changed.
+    """
+    body, etag = server._cached_metadata(key, build)
+    response = Response(status=200, mimetype="application/json", response=body)
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def build_flask_app(server: "MLServer") -> Flask:
+    """
+    Creates the Flask app that serves an MLServer, with the rules of every route registered so far.
+    Routes registered later are added by MLServer.route.
+    """
+    app = Flask(server.import_name, static_folder=None)
+
+    @app.route("/api/routes", methods=["GET"])
+    def list_routes():
+        """
+        Lists all the routes/endpoints available in the Flask app.
+        """
+        return metadata_response(server, "/api/routes", server._build_api_routes)
+
+    @app.route("/api/app_metadata", methods=["GET"])
+    def get_app_metadata():
+        return metadata_response(server, "/api/app_metadata", server._build_app_metadata)
+
+    @app.route("/api/metrics", methods=["GET"])
+    def get_metrics():
+        """
+        Exposes the request counts and latencies of every route in the Prometheus text format.
+        """
+        return Response(status=200, content_type=METRICS_MIMETYPE, response=server.metrics.render())
+
+    if server.profiler is not None:
+        add_profile_rules(app, server.profiler)
+    for endpoint in server.endpoints:
+        add_endpoint_rules(app, server, endpoint)
+    return app
+
+
+def add_profile_rules(app: Flask, profiler: Profiler):
+    def json_response(status: int, body: Any) -> Response:
+        return Response(status=status, mimetype="application/json", response=json.dumps(body))
+
+    @app.before_request
+    def check_admin_token():
+        if request.path.startswith("/api/profiles") and not profiler.is_authorized(
+            request.headers.get(ADMIN_TOKEN_HEADER)
+        ):
+            return json_response(
+                403, {"error": f"Send the admin token in {ADMIN_TOKEN_HEADER}", "status": "FORBIDDEN"}
+            )
+
+    def not_found(profile_id: str) -> Response:
+        return json_response(404, {"error": f"Profile {profile_id} not found", "status": "NOT_FOUND"})
+
+    @app.route("/api/profiles", methods=["GET"])
+    def list_profiles():
+        return json_response(200, [profile.summary() for profile in profiler.profiles()])
+
+    @app.route("/api/profiles/<profile_id>", methods=["GET"])
+    def get_profile(profile_id: str):
+        profile = profiler.get(profile_id)
+        return json_response(200, profile.summary()) if profile is not None else not_found(profile_id)
+
+    @app.route("/api/profiles/<profile_id>/pstats", methods=["GET"])
+    def get_profile_pstats(profile_id: str):
+        profile = profiler.get(profile_id)
+        if profile is None:
+            return not_found(profile_id)
+        response = Response(status=200, mimetype="application/octet-stream", response=profile.pstats)
+        response.headers["Content-Disposition"] = f"attachment; filename={profile_id}.pstats"
+        return response
+
+    @app.route("/api/profiles/<profile_id>/collapsed", methods=["GET"])
+    def get_profile_collapsed(profile_id: str):
+        profile = profiler.get(profile_id)
+        if profile is None:
+            return not_found(profile_id)
+        return Response(status=200, mimetype="text/plain", response=profile.collapsed)
+
+
+def add_endpoint_rules(app: Flask, server: "MLServer", endpoint: "EndpointDetailsNoSchema"):
+    """
+    Adds the metadata, task and job rules of one route to the Flask app.
+    """
+    from flask_ml.flask_ml_server.MLServer import EndpointDetails
+
+    if isinstance(endpoint, EndpointDetails):
+
+        @app.route(endpoint.task_schema_rule, endpoint=endpoint.task_schema_rule, methods=["GET"])
+        def get_task_schema():
+            return metadata_response(
+                server, endpoint.task_schema_rule, lambda: endpoint.task_schema_func().model_dump_json()
+            )
+
+        @app.route(endpoint.sample_payload_rule, endpoint=endpoint.sample_payload_rule, methods=["GET"])
+        def get_sample_payload():
+            return metadata_response(
+                server,
+                endpoint.sample_payload_rule,
+                lambda: schema_get_sample_payload(endpoint.task_schema_func()).model_dump_json(),
+            )
+
+        @app.route(endpoint.payload_schema_rule, endpoint=endpoint.payload_schema_rule, methods=["GET"])
+        def get_payload_schema():
+            return metadata_response(
+                server,
+                endpoint.payload_schema_rule,
+                lambda: json.dumps(
+                    schema_get_sample_payload(endpoint.task_schema_func()).model_json_schema()
+                ),
+            )
+
+    else:
+        hints = get_type_hints(endpoint.func)
+
+        @app.route(endpoint.sample_payload_rule, endpoint=endpoint.sample_payload_rule, methods=["GET"])
+        def get_sample_payload():
+            return metadata_response(
+                server,
+                endpoint.sample_payload_rule,
+                lambda: type_hinting_get_sample_payload(hints).model_dump_json(),
+            )
+
+        @app.route(endpoint.payload_schema_rule, endpoint=endpoint.payload_schema_rule, methods=["GET"])
+        def get_payload_schema():
+            return metadata_response(
+                server,
+                endpoint.payload_schema_rule,
+                lambda: json.dumps(type_hinting_get_sample_payload(hints).model_json_schema()),
+            )
+
+    add_task_rules(app, server, endpoint)
+
+
+def add_task_rules(app: Flask, server: "MLServer", endpoint: "EndpointDetailsNoSchema"):
+    route_metrics = server.metrics.route(endpoint.rule)
+
+    def handle_task() -> Response:
+        route_metrics.in_flight.inc()
+        timer = PhaseTimer()
+        spool = None
+        try:
+            if request.mimetype == "multipart/form-data":
+                data = parse_multipart_request(request.form, request.files)
+                spool = UploadSpool(request.files)
+                data = spool.resolve(data)
+            else:
+                data = parse_json_body(request.get_data())
+            timer.mark("parse")
+            inputs, parameters = endpoint.plan.parse(data)
+            timer.mark("validate")
+            route_metrics.record_inputs(inputs)
+            result = endpoint.invoke(inputs, parameters)
+            if inspect.isawaitable(result):
+                result = asyncio.run(result)
+            timer.mark("model")
+            if is_stream(result):
+                response = Response(status=200, mimetype=NDJSON_MIMETYPE, response=ndjson_lines(result))
+            else:
+                logger.info(f"200: Successful request")
+                response = Response(
+                    status=200, mimetype="application/json", response=result.model_dump_json()
+                )
+                timer.mark("serialize")
+        except Exception as e:
+            response = error_response(e)
+        finally:
+            route_metrics.in_flight.dec()
+        if spool is not None:
+            # Streamed results may still read the uploaded files, so they are removed once the
+            # response is closed rather than here.
+            response.call_on_close(spool.cleanup)
+        route_metrics.record_phases(timer)
+        route_metrics.record_status(response.status_code)
+        if timer.phases:
+            response.headers["Server-Timing"] = timer.server_timing()
+        return response
+
+    @app.route(endpoint.rule, endpoint=endpoint.func.__name__, methods=["POST"])
+    def wrapper():
+        profiler = server.profiler
+        if profiler is not None and profiler.should_profile(request.headers.get(PROFILE_HEADER)):
+            response, profile_id = profiler.run(endpoint.rule, handle_task)
+            if profile_id is not None:
+                response.headers[PROFILE_ID_HEADER] = profile_id
+            return response
+        return handle_task()
+
+    @app.route(endpoint.rule + "/jobs", endpoint=endpoint.rule + "/jobs", methods=["POST"])
+    def submit_job():
+        try:
+            inputs, parameters = endpoint.plan.parse(parse_json_body(request.get_data()))
+            job = server.jobs.submit(endpoint.rule, endpoint.invoke, inputs, parameters)
+            logger.info(f"202: Job {job.job_id} submitted")
+            response = Response(status=202, mimetype="application/json", response=job.model_dump_json())
+            response.headers["Location"] = f"{endpoint.rule}/jobs/{job.job_id}"
+        except Exception as e:
+            response = error_response(e)
+        return response
+
+    @app.route(
+        endpoint.rule + "/jobs/<job_id>",
+        endpoint=endpoint.rule + "/jobs/<job_id>",
+        methods=["GET", "DELETE"],
+    )
+    def job_details(job_id: str):
+        if request.method == "DELETE":
+            job = server.jobs.cancel(endpoint.rule, job_id)
+        else:
+            job = server.jobs.get(endpoint.rule, job_id)
+        if job is None:
+            return Response(
+                status=404,
+                mimetype="application/json",
+                response=json.dumps({"error": f"Job {job_id} not found", "status": "NOT_FOUND"}),
+            )
+        return Response(status=200, mimetype="application/json", response=job.model_dump_json())
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+from typing import Iterator, TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.batching import BatchingConfig
+from flask_ml.flask_ml_server.models import *
+from flask_ml.flask_ml_server.result_cache import ResultCache
+
+
+class TextInputs(TypedDict):
+    text_input: TextInput
+
+
+class BatchTextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+@pytest.fixture
+def asgi_server():
+    server = MLServer(__name__)
+
+    @server.route("/upper")
+    def upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        return ResponseBody(root=TextResponse(value=inputs["text_input"].text.upper()))
+
+    @server.route("/async_upper")
+    async def async_upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        await asyncio.sleep(0)
+        return ResponseBody(root=TextResponse(value=inputs["text_input"].text.upper()))
+
+    @server.route("/fails")
+    def fails(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        raise Exception("Model crashed")
+
+    @server.route("/stream")
+    def stream(inputs: BatchTextInputs, parameters: IntParameters) -> Iterator[TextResponse]:
+        for text_input in inputs["text_inputs"].texts:
+            yield TextResponse(value=text_input.text.upper())
+
+    return server
+
+
+def call(app, method, path, body=b""):
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}
+    received = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], headers, b"".join(message.get("body", b"") for message in sent[1:])
+
+
+TEXT_DATA = json.dumps({"inputs": {"text_input": {"text": "hello"}}, "parameters": {"param1": 1}}).encode()
+
+
+@pytest.mark.parametrize("rule", ["/upper", "/async_upper"])
+def test_task_request(asgi_server, rule):
+    status, headers, body = call(asgi_server.asgi_app(), "POST", rule, TEXT_DATA)
+    assert status == 200
+    assert headers["content-type"] == "application/json"
+    assert json.loads(body)["value"] == "HELLO"
+
+
+def test_async_route_over_wsgi(asgi_server):
+    client = asgi_server.app.test_client()
+    response = client.post("/async_upper", data=TEXT_DATA, content_type="application/json")
+    assert response.status_code == 200
+    assert response.get_json()["value"] == "HELLO"
+
+
+def test_errors_match_wsgi(asgi_server):
+    app = asgi_server.asgi_app()
+    status, _, body = call(app, "POST", "/upper", b'{"inputs": {}, "parameters": {"param1": 1}}')
+    assert status == 400
+    assert json.loads(body)["status"] == "VALIDATION_ERROR"
+
+    status, _, body = call(app, "POST", "/upper", b"not json")
+    assert status == 400
+    assert json.loads(body)["status"] == "VALIDATION_ERROR"
+
+    status, _, body = call(app, "POST", "/fails", TEXT_DATA)
+    assert status == 500
+    assert json.loads(body) == {"error": "Exception('Model crashed')", "status": "SERVER_ERROR"}
+
+
+@pytest.mark.parametrize(
+    "body, status",
+    [(TEXT_DATA, 200), (b"not json", 400), (b"", 400), (b"[1, 2]", 400)],
+)
+def test_bodies_are_parsed_the_same_over_wsgi_and_asgi(asgi_server, body, status):
+    # The Content-Type does not matter, like with asgi_app().
+    response = asgi_server.app.test_client().post("/upper", data=body)
+    assert response.status_code == status
+    asgi_status, _, asgi_body = call(asgi_server.asgi_app(), "POST", "/upper", body)
+    assert asgi_status == status
+    assert json.loads(asgi_body) == response.get_json()
+
+
+def test_other_requests_fall_back_to_flask(asgi_server):
+    status, headers, body = call(asgi_server.asgi_app(), "GET", "/api/routes")
+    assert status == 200
+    assert "etag" in headers
+    rules = [route["run_task"] for route in json.loads(body)]
+    assert rules == ["/upper", "/async_upper", "/fails", "/stream"]
+
+    status, _, _ = call(asgi_server.asgi_app(), "GET", "/missing")
+    assert status == 404
+
+
+def test_stream(asgi_server):
+    data = {"inputs": {"text_inputs": {"texts": [{"text": "a"}, {"text": "b"}]}}, "parameters": {"param1": 1}}
+    status, headers, body = call(asgi_server.asgi_app(), "POST", "/stream", json.dumps(data).encode())
+    assert status == 200
+    assert headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["value"] for line in body.splitlines()] == ["A", "B"]
+
+
+def test_lifespan(asgi_server):
+    received = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_server.asgi_app()({"type": "lifespan"}, receive, send))
+    types = [message["type"] for message in sent]
+    assert types == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+
+def test_flask_requests_do_not_wait_for_ml_threads():
+    server = MLServer(__name__)
+    release = threading.Event()
+
+    @server.route("/blocks")
+    def blocks(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        release.wait(5)
+        return ResponseBody(root=TextResponse(value="done"))
+
+    app = server.asgi_app(max_workers=1)
+
+    async def main():
+        task = asyncio.ensure_future(asyncio.to_thread(call, app, "POST", "/blocks", TEXT_DATA))
+        await asyncio.sleep(0.1)
+        status, _, _ = await asyncio.wait_for(asyncio.to_thread(call, app, "GET", "/api/routes"), 2)
+        release.set()
+        return status, await task
+
+    routes_status, (task_status, _, _) = asyncio.run(main())
+    assert routes_status == 200 and task_status == 200
+
+
+def test_run_asgi_without_uvicorn(asgi_server, monkeypatch):
+    import sys
+
+    monkeypatch.setitem(sys.modules, "uvicorn", None)
+    with pytest.raises(ImportError, match="flask_ml\\[asgi\\]"):
+        asgi_server.run_asgi()
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"batching": BatchingConfig()},
+        {"executor": "process"},
+        {"cache": ResultCache()},
+        {"max_concurrency": 1},
+        {"dedupe": True},
+    ],
+)
+def test_async_functions_reject_unsupported_options(options):
+    server = MLServer(__name__)
+    with pytest.raises(ValueError, match="does not support async ML functions"):
+
+        @server.route("/async_upper", **options)
+        async def async_upper(inputs: BatchTextInputs, parameters: IntParameters) -> ResponseBody:
+            return ResponseBody(root=BatchTextResponse(texts=[]))
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+from typing import TypedDict
+
+import pytest
+from werkzeug.serving import make_server
+from werkzeug.utils import redirect
+
+from flask_ml.flask_ml_client import AsyncMLClient, MLClient
+from flask_ml.flask_ml_client.MLClient import TimedResult
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+INPUTS = {"text_inputs": {"texts": [{"text": "a"}, {"text": "b"}]}}
+PARAMETERS = {"param1": 1}
+
+
+def start_server(name: str):
+    server = MLServer(__name__)
+    running = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    @server.route("/upper")
+    def upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        texts = [TextResponse(value=f"{name}:{t.text.upper()}") for t in inputs["text_inputs"].texts]
+        return ResponseBody(root=BatchTextResponse(texts=texts))
+
+    @server.route("/slow")
+    def slow(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(parameters["param1"] / 1000)
+        with lock:
+            running["now"] -= 1
+        return ResponseBody(root=BatchTextResponse(texts=[]))
+
+    http_server = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server, f"http://127.0.0.1:{http_server.server_port}", running
+
+
+@pytest.fixture
+def servers():
+    started = [start_server("one"), start_server("two")]
+    yield [(url, running) for _, url, running in started]
+    for http_server, _, _ in started:
+        http_server.shutdown()
+
+
+def test_request_matches_the_sync_client(servers):
+    url = servers[0][0] + "/upper"
+
+    async def send():
+        async with AsyncMLClient(url) as client:
+            return await client.request(INPUTS, PARAMETERS), await client.request(INPUTS, {"wrong": 1})
+
+    result, error = asyncio.run(send())
+    assert isinstance(result, TimedResult)
+    assert result == MLClient(url).request(INPUTS, PARAMETERS)
+    assert [t["value"] for t in result["texts"]] == ["one:A", "one:B"]
+    assert "model" in result.server_timing
+    assert error["status"] == "VALIDATION_ERROR"
+
+
+def test_gather_across_servers(servers):
+    calls = [
+        (url + "/upper", {"text_inputs": {"texts": [{"text": str(i)}]}}, PARAMETERS)
+        for i in range(20)
+        for url, _ in servers
+    ]
+
+    async def send():
+        async with AsyncMLClient() as client:
+            return await client.gather(calls)
+
+    results = asyncio.run(send())
+    assert [r["texts"][0]["value"] for r in results] == [
+        f"{name}:{i}" for i in range(20) for name in ("one", "two")
+    ]
+
+
+def test_max_concurrency(servers):
+    url, running = servers[0]
+
+    async def send():
+        async with AsyncMLClient(url + "/slow", max_concurrency=2) as client:
+            return await asyncio.gather(*(client.request(INPUTS, {"param1": 50}) for _ in range(6)))
+
+    results = asyncio.run(send())
+    assert len(results) == 6
+    assert running["max"] == 2
+
+
+def test_deadline(servers):
+    url = servers[0][0]
+
+    async def send():
+        async with AsyncMLClient(timeout=5) as client:
+            calls = [(url + "/slow", INPUTS, {"param1": 1000}), (url + "/upper", INPUTS, PARAMETERS)]
+            slow, fast = await client.gather(calls, timeout=0.2)
+            return slow, fast, await client.request(INPUTS, PARAMETERS, url=url + "/upper")
+
+    slow, fast, after = asyncio.run(send())
+    assert isinstance(slow, asyncio.TimeoutError)
+    assert fast["texts"][0]["value"] == "one:A"
+    assert after["texts"][0]["value"] == "one:A"
+
+
+def test_follows_redirects(servers):
+    url = servers[0][0] + "/upper"
+
+    def moved(environ, start_response):
+        return redirect(url, 307)(environ, start_response)
+
+    redirect_server = make_server("127.0.0.1", 0, moved, threaded=True)
+    threading.Thread(target=redirect_server.serve_forever, daemon=True).start()
+
+    async def send():
+        async with AsyncMLClient(f"http://127.0.0.1:{redirect_server.server_port}/moved") as client:
+            return await client.request(INPUTS, PARAMETERS)
+
+    try:
+        result = asyncio.run(send())
+    finally:
+        redirect_server.shutdown()
+    assert [t["value"] for t in result["texts"]] == ["one:A", "one:B"]
+
+
+def test_request_needs_a_url():
+    with pytest.raises(ValueError):
+        asyncio.run(AsyncMLClient().request(INPUTS, PARAMETERS))
@@ -0,0 +1,152 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.batching import BatchingConfig, MicroBatcher, find_batch_input_key
+from flask_ml.flask_ml_server.models import *
+from flask_ml.flask_ml_server.request_plan import compile_no_schema_request_plan
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class TextParameters(TypedDict):
+    prefix: str
+
+
+class MixedInputs(TypedDict):
+    text_inputs: BatchTextInput
+    file_inputs: BatchFileInput
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, inputs: TextInputs, parameters: TextParameters) -> ResponseBody:
+        texts = [t.text for t in inputs["text_inputs"].texts]
+        with self.lock:
+            self.calls.append(texts)
+        return ResponseBody(
+            root=BatchTextResponse(texts=[TextResponse(value=parameters["prefix"] + text) for text in texts])
+        )
+
+
+def make_batcher(recorder, **config):
+    def ml_function(inputs: TextInputs, parameters: TextParameters) -> ResponseBody:
+        return recorder(inputs, parameters)
+
+    return MicroBatcher(ml_function, compile_no_schema_request_plan(ml_function), BatchingConfig(**config))
+
+
+def call(batcher, texts, prefix="p:"):
+    inputs = {"text_inputs": BatchTextInput(texts=[TextInput(text=t) for t in texts])}
+    response = batcher(inputs, {"prefix": prefix})
+    return [t.value for t in response.root.texts]
+
+
+def test_concurrent_calls_are_merged_and_split_in_order():
+    recorder = Recorder()
+    batcher = make_batcher(recorder, max_batch_size=100, max_wait=0.2)
+    requests = [[f"{i}a", f"{i}b"] for i in range(5)]
+    with ThreadPoolExecutor(5) as pool:
+        results = list(pool.map(lambda texts: call(batcher, texts), requests))
+
+    assert results == [[f"p:{t}" for t in texts] for texts in requests]
+    assert len(recorder.calls) < len(requests)
+    assert sum(len(c) for c in recorder.calls) == 10
+
+
+def test_incompatible_parameters_are_not_merged():
+    recorder = Recorder()
+    batcher = make_batcher(recorder, max_batch_size=100, max_wait=0.1)
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(call, batcher, ["x"], "a:")
+        second = pool.submit(call, batcher, ["y"], "b:")
+        assert first.result() == ["a:x"]
+        assert second.result() == ["b:y"]
+    assert sorted(recorder.calls) == [["x"], ["y"]]
+
+
+def test_batch_never_exceeds_max_batch_size():
+    recorder = Recorder()
+    batcher = make_batcher(recorder, max_batch_size=3, max_wait=0.1)
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(lambda i: call(batcher, [str(i)]), range(6)))
+    assert results == [[f"p:{i}"] for i in range(6)]
+    assert all(len(c) <= 3 for c in recorder.calls)
+
+
+def test_oversized_request_runs_alone():
+    recorder = Recorder()
+    batcher = make_batcher(recorder, max_batch_size=2, max_wait=1.0)
+    assert call(batcher, ["a", "b", "c"]) == ["p:a", "p:b", "p:c"]
+    assert recorder.calls == [["a", "b", "c"]]
+
+
+def test_errors_are_raised_for_every_caller():
+    def ml_function(inputs: TextInputs, parameters: TextParameters) -> ResponseBody:
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(
+        ml_function, compile_no_schema_request_plan(ml_function), BatchingConfig(max_wait=0.1)
+    )
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(call, batcher, [str(i)]) for i in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_mismatched_response_length_is_an_error():
+    def ml_function(inputs: TextInputs, parameters: TextParameters) -> ResponseBody:
+        return ResponseBody(root=BatchTextResponse(texts=[TextResponse(value="only one")]))
+
+    batcher = MicroBatcher(
+        ml_function, compile_no_schema_request_plan(ml_function), BatchingConfig(max_wait=0.2)
+    )
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(call, batcher, [str(i)]) for i in range(2)]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_find_batch_input_key():
+    def single(inputs: TextInputs, parameters: TextParameters) -> ResponseBody: ...
+
+    def mixed(inputs: MixedInputs, parameters: TextParameters) -> ResponseBody: ...
+
+    assert find_batch_input_key(compile_no_schema_request_plan(single)) == "text_inputs"
+    with pytest.raises(ValueError):
+        find_batch_input_key(compile_no_schema_request_plan(mixed))
+
+
+@pytest.mark.parametrize("config", [{"max_batch_size": 0}, {"max_wait": -1}])
+def test_invalid_batching_config(config):
+    with pytest.raises(ValueError):
+        BatchingConfig(**config)
+
+
+def test_batching_route():
+    server = MLServer(__name__)
+    recorder = Recorder()
+
+    @server.route("/batched", batching=BatchingConfig(max_batch_size=10, max_wait=0.2))
+    def batched(inputs: TextInputs, parameters: TextParameters) -> ResponseBody:
+        return recorder(inputs, parameters)
+
+    app = server.app.test_client()
+
+    def post(text):
+        data = {"inputs": {"text_inputs": {"texts": [{"text": text}]}}, "parameters": {"prefix": ">"}}
+        return app.post("/batched", json=data).json["texts"][0]["value"]
+
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(post, "abcd")) == [">a", ">b", ">c", ">d"]
+    assert len(recorder.calls) < 4
@@ -1,9 +1,14 @@
 import argparse
+import os
+import subprocess
+import sys
+from typing import TypedDict
+
 from flask_ml.flask_ml_cli import MLCli
 from flask_ml.flask_ml_server import MLServer
 import pytest
 
-from flask_ml.flask_ml_server.models import MarkdownResponse, ResponseBody
+from flask_ml.flask_ml_server.models import *
 
 
 @pytest.fixture
@@ -360,3 +365,79 @@ def test_print_markdown_response(ml_cli: MLCli):
             )
         )
     )
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class NoParameters(TypedDict):
+    pass
+
+
+def test_only_the_chosen_subcommand_builds_its_task_schema():
+    server = MLServer(__name__)
+    built = []
+
+    def task_schema_for(name):
+        def task_schema() -> TaskSchema:
+            built.append(name)
+            return TaskSchema(
+                inputs=[InputSchema(key="text_inputs", label="Texts", input_type=InputType.BATCHTEXT)],
+                parameters=[],
+            )
+
+        return task_schema
+
+    def echo(inputs: TextInputs, parameters: NoParameters) -> ResponseBody:
+        texts = [TextResponse(value=t.text) for t in inputs["text_inputs"].texts]
+        return ResponseBody(root=BatchTextResponse(texts=texts))
+
+    def echo_again(inputs: TextInputs, parameters: NoParameters) -> ResponseBody:
+        return echo(inputs, parameters)
+
+    server.route("/first", task_schema_for("first"))(echo)
+    server.route("/second", task_schema_for("second"))(echo_again)
+
+    built.clear()
+    ml_cli = MLCli(server, argparse.ArgumentParser())
+    ml_cli._setup_cli()
+    assert built == []
+    response = ml_cli._run_cli_and_return(ml_cli._parse_args(["second", "--text_inputs", "a"]), False)
+    assert built == ["second"]
+    assert response.root.texts[0].value == "a"  # type: ignore
+
+
+def test_async_subcommand():
+    server = MLServer(__name__)
+
+    def task_schema() -> TaskSchema:
+        return TaskSchema(
+            inputs=[InputSchema(key="text_inputs", label="Texts", input_type=InputType.BATCHTEXT)],
+            parameters=[],
+        )
+
+    @server.route("/upper", task_schema)
+    async def upper(inputs: TextInputs, parameters: NoParameters) -> ResponseBody:
+        texts = [TextResponse(value=t.text.upper()) for t in inputs["text_inputs"].texts]
+        return ResponseBody(root=BatchTextResponse(texts=texts))
+
+    ml_cli = MLCli(server, argparse.ArgumentParser())
+    ml_cli._setup_cli()
+    response = ml_cli._run_cli_and_return(ml_cli._parse_args(["upper", "--text_inputs", "a"]), False)
+    assert response.root.texts[0].value == "A"  # type: ignore
+
+
+def test_cli_does_not_import_flask():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "import sys\n"
+        "sys.argv = ['simple_cli.py', 'transform_case', '--text_inputs', 'a']\n"
+        "import simple_cli\n"
+        "simple_cli.main()\n"
+        "print(sorted({m.split('.')[0] for m in sys.modules} & {'flask', 'werkzeug'}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.splitlines()[-1] == "[]"
@@ -0,0 +1,181 @@
+import argparse
+import io
+import json
+import threading
+import time
+from typing import TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_cli import MLCli
+from flask_ml.flask_ml_cli.batch import run_jsonl
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+def task_schema() -> TaskSchema:
+    return TaskSchema(
+        inputs=[InputSchema(key="text_inputs", label="Texts", input_type=InputType.BATCHTEXT)],
+        parameters=[ParameterSchema(key="param1", label="Param", value=IntParameterDescriptor(default=1))],
+    )
+
+
+@pytest.fixture
+def batch_server():
+    server = MLServer(__name__)
+    state = {"running": 0, "most": 0}
+    lock = threading.Lock()
+
+    @server.route("/upper", task_schema)
+    def upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        with lock:
+            state["running"] += 1
+            state["most"] = max(state["most"], state["running"])
+        time.sleep(0.02 * parameters["param1"])
+        with lock:
+            state["running"] -= 1
+        texts = [t.text for t in inputs["text_inputs"].texts]
+        if "fail" in texts:
+            raise RuntimeError("model failed")
+        return ResponseBody(root=BatchTextResponse(texts=[TextResponse(value=t.upper()) for t in texts]))
+
+    @server.route("/stream", task_schema)
+    def stream(inputs: TextInputs, parameters: IntParameters):
+        for t in inputs["text_inputs"].texts:
+            yield TextResponse(value=t.text * parameters["param1"])
+
+    server.state = state  # type: ignore
+    return server
+
+
+def request_line(*texts, param1=1):
+    inputs = {"text_inputs": {"texts": [{"text": text} for text in texts]}}
+    return json.dumps({"inputs": inputs, "parameters": {"param1": param1}})
+
+
+def test_results_are_written_in_input_order(batch_server):
+    # The earlier lines are the slower ones, so they finish last.
+    lines = [request_line(f"t{i}", param1=5 - i) for i in range(5)]
+    output = io.StringIO()
+    summary = run_jsonl(batch_server.endpoints[0], lines, output, parallelism=5)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [record["line"] for record in records] == [1, 2, 3, 4, 5]
+    assert [record["result"]["texts"][0]["value"] for record in records] == ["T0", "T1", "T2", "T3", "T4"]
+    assert all(record["status"] == "OK" and record["duration"] > 0 for record in records)
+    assert summary.requests == 5 and summary.failed == 0
+    assert batch_server.state["most"] > 1
+
+
+def test_failed_lines_do_not_stop_the_batch(batch_server):
+    lines = [
+        request_line("a"),
+        "not json",
+        json.dumps({"inputs": {"wrong": {"texts": []}}, "parameters": {"param1": 1}}),
+        "",
+        request_line("fail"),
+        request_line("b"),
+    ]
+    output = io.StringIO()
+    summary = run_jsonl(batch_server.endpoints[0], lines, output, parallelism=2)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(record["line"], record["status"]) for record in records] == [
+        (1, "OK"),
+        (2, "VALIDATION_ERROR"),
+        (3, "VALIDATION_ERROR"),
+        (5, "SERVER_ERROR"),
+        (6, "OK"),
+    ]
+    assert "model failed" in records[3]["error"]
+    assert summary.requests == 5 and summary.failed == 3
+
+
+def test_parallelism_is_bounded(batch_server):
+    run_jsonl(batch_server.endpoints[0], [request_line("a")] * 8, io.StringIO(), parallelism=2)
+    assert batch_server.state["most"] <= 2
+    with pytest.raises(ValueError):
+        run_jsonl(batch_server.endpoints[0], [], io.StringIO(), parallelism=0)
+
+
+def test_run_cli_from_jsonl(batch_server, tmp_path, capsys):
+    requests_file = tmp_path / "requests.jsonl"
+    requests_file.write_text("\n".join([request_line("a", "b", param1=2), request_line("c")]) + "\n")
+    output_file = tmp_path / "results.jsonl"
+    ml_cli = MLCli(batch_server, argparse.ArgumentParser())
+    ml_cli.run_cli(
+        ["--from-jsonl", str(requests_file), "--task", "stream", "--output", str(output_file)]
+        + ["--parallelism", "2"]
+    )
+    records = [json.loads(line) for line in output_file.read_text().splitlines()]
+    assert [[t["value"] for t in record["result"]["texts"]] for record in records] == [["aa", "bb"], ["c"]]
+    assert "2 requests, 0 failed" in capsys.readouterr().err
+
+    ml_cli = MLCli(batch_server, argparse.ArgumentParser())
+    ml_cli.run_cli(["--from-jsonl", str(requests_file), "--task", "/upper"])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["status"] for record in records] == ["OK", "OK"]
+
+
+def test_run_cli_from_jsonl_needs_a_known_task(batch_server, tmp_path):
+    requests_file = tmp_path / "requests.jsonl"
+    requests_file.write_text(request_line("a"))
+    for args in (["--from-jsonl", str(requests_file)], ["--from-jsonl", str(requests_file), "--task", "x"]):
+        with pytest.raises(SystemExit):
+            MLCli(batch_server, argparse.ArgumentParser()).run_cli(args)
+    with pytest.raises(SystemExit):
+        MLCli(batch_server, argparse.ArgumentParser()).run_cli(
+            ["--from-jsonl", str(requests_file), "--task", "upper", "upper"]
+        )
+
+
+def test_lines_wait_for_the_route_limit(tmp_path):
+    server = MLServer(__name__)
+
+    @server.route("/limited", task_schema, max_concurrency=1)
+    def limited(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        time.sleep(0.01)
+        return ResponseBody(root=BatchTextResponse(texts=[TextResponse(value="ok")]))
+
+    requests_file = tmp_path / "requests.jsonl"
+    requests_file.write_text("\n".join([request_line("a")] * 12))
+    summary = MLCli(server, argparse.ArgumentParser()).run_batch(str(requests_file), parallelism=8)
+    assert summary.requests == 12 and summary.failed == 0
+    assert server.limiters["/limited"].blocking is False
+
+
+class ClashingParameters(TypedDict):
+    output: str
+    parallelism: str
+
+
+def test_subcommand_options_are_not_taken_for_batch_options(tmp_path, capsys):
+    server = MLServer(__name__)
+
+    def clashing_schema() -> TaskSchema:
+        return TaskSchema(
+            inputs=[InputSchema(key="text_inputs", label="Texts", input_type=InputType.BATCHTEXT)],
+            parameters=[
+                ParameterSchema(key=key, label=key, value=TextParameterDescriptor(default=""))
+                for key in ("output", "parallelism")
+            ],
+        )
+
+    @server.route("/clash", clashing_schema)
+    def clash(inputs: TextInputs, parameters: ClashingParameters) -> ResponseBody:
+        return ResponseBody(root=TextResponse(value=f"{parameters['output']} {parameters['parallelism']}"))
+
+    args = ["clash", "--text_inputs", "a", "--output", "out", "--parallelism", "many"]
+    MLCli(server, argparse.ArgumentParser()).run_cli(args)
+    assert "out many" in capsys.readouterr().out
+
+    requests_file = tmp_path / "requests.jsonl"
+    requests_file.write_text(request_line("a"))
+    with pytest.raises(SystemExit):
+        MLCli(server, argparse.ArgumentParser()).run_cli(["clash", "--from-jsonl", str(requests_file)])
@@ -0,0 +1,91 @@
+import time
+from email.utils import formatdate
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from flask_ml.flask_ml_client import MLClient
+from flask_ml.flask_ml_client.MLClient import parse_retry_after
+
+URL = "http://127.0.0.1:5000/upper"
+INPUTS = {"text_inputs": {"texts": [{"text": "a"}]}}
+PARAMETERS = {"param1": 1}
+
+
+class FakeResponse:
+    def __init__(self, status_code, body, headers=None):
+        self.status_code = status_code
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.body = body
+        self.closed = False
+
+    def json(self):
+        return self.body
+
+    def close(self):
+        self.closed = True
+
+
+OK = {"output_type": "batchtext", "texts": [{"output_type": "text", "value": "A"}]}
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after("-1") == 0
+    assert 8 < parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10  # type: ignore
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retries_429_and_503_with_retry_after():
+    busy = FakeResponse(429, {"status": "TOO_MANY_REQUESTS"}, {"Retry-After": "2"})
+    unavailable = FakeResponse(503, {"status": "UNAVAILABLE"})
+    responses = [busy, unavailable, FakeResponse(200, OK)]
+    with patch("requests.Session.post", side_effect=responses) as post, patch("time.sleep") as sleep:
+        result = MLClient(URL, backoff_factor=0.5).request(INPUTS, PARAMETERS)
+    assert result["texts"][0]["value"] == "A"
+    assert post.call_count == 3
+    assert [call.args[0] for call in sleep.call_args_list] == [2, 1.0]
+    assert busy.closed and unavailable.closed
+
+
+def test_last_response_is_returned_when_retries_run_out():
+    responses = [FakeResponse(429, {"status": "TOO_MANY_REQUESTS", "error": "busy"}) for _ in range(3)]
+    with patch("requests.Session.post", side_effect=responses), patch("time.sleep"):
+        result = MLClient(URL, retries=2).request(INPUTS, PARAMETERS)
+    assert result["status"] == "TOO_MANY_REQUESTS"
+
+
+def test_connection_errors_back_off_exponentially():
+    errors = [requests.ConnectionError("refused")] * 4
+    with patch("requests.Session.post", side_effect=errors) as post, patch("time.sleep") as sleep:
+        with pytest.raises(requests.ConnectionError):
+            MLClient(URL, retries=3, backoff_factor=1, max_backoff=3).request(INPUTS, PARAMETERS)
+    assert post.call_count == 4
+    assert [call.args[0] for call in sleep.call_args_list] == [1, 2, 3]
+
+
+def test_errors_are_not_retried():
+    with patch("requests.Session.post", return_value=FakeResponse(500, {"status": "SERVER_ERROR"})) as post:
+        assert MLClient(URL).request(INPUTS, PARAMETERS)["status"] == "SERVER_ERROR"
+    assert post.call_count == 1
+
+
+def test_timeouts_and_pool():
+    client = MLClient(URL, pool_size=4, connect_timeout=1, read_timeout=5)
+    assert client.session.get_adapter(URL)._pool_maxsize == 4  # type: ignore
+    with patch("requests.Session.post", return_value=FakeResponse(200, OK)) as post:
+        client.request(INPUTS, PARAMETERS)
+    assert post.call_args.kwargs["timeout"] == (1, 5)
+    # By default the client waits as long as the task takes.
+    with patch("requests.Session.post", return_value=FakeResponse(200, OK)) as post:
+        MLClient(URL).request(INPUTS, PARAMETERS)
+    assert post.call_args.kwargs["timeout"] == (10.0, None)
+
+
+def test_context_manager_closes_the_session():
+    with patch("requests.Session.close") as close:
+        with MLClient(URL) as client:
+            assert isinstance(client, MLClient)
+    close.assert_called_once()
@@ -0,0 +1,110 @@
+from typing import Iterator, TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.dedupe import Deduplicator
+from flask_ml.flask_ml_server.models import *
+from flask_ml.flask_ml_server.templates import TextML
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class FileInputs(TypedDict):
+    file_inputs: BatchFileInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+def texts_payload(*texts):
+    return {"inputs": {"text_inputs": {"texts": [{"text": t} for t in texts]}}, "parameters": {"param1": 1}}
+
+
+@pytest.fixture
+def dedupe_server():
+    server = MLServer(__name__)
+    calls = []
+
+    @server.route("/upper", dedupe=True)
+    def upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        texts = [t.text for t in inputs["text_inputs"].texts]
+        calls.append(texts)
+        return ResponseBody(root=BatchTextResponse(texts=[TextResponse(value=t.upper()) for t in texts]))
+
+    @server.route("/files", dedupe=True)
+    def files(inputs: FileInputs, parameters: IntParameters) -> Iterator[FileResponse]:
+        paths = [f.path for f in inputs["file_inputs"].files]
+        calls.append(paths)
+        for path in paths:
+            yield FileResponse(path=path + ".out", file_type=FileType.IMG)
+
+    server.calls = calls  # type: ignore
+    return server
+
+
+def test_duplicate_texts_are_computed_once(dedupe_server):
+    response = dedupe_server.app.test_client().post("/upper", json=texts_payload("a", "b", "a", "c", "b"))
+    assert [t["value"] for t in response.get_json()["texts"]] == ["A", "B", "A", "C", "B"]
+    assert dedupe_server.calls == [["a", "b", "c"]]
+
+    metrics = dedupe_server.metrics.render()
+    assert 'flask_ml_dedupe_input_items_total{route="/upper"} 5' in metrics
+    assert 'flask_ml_dedupe_unique_items_total{route="/upper"} 3' in metrics
+
+
+def test_duplicate_files_are_computed_once(dedupe_server):
+    data = {
+        "inputs": {"file_inputs": {"files": [{"path": "/x.png"}, {"path": "/y.png"}, {"path": "/x.png"}]}},
+        "parameters": {"param1": 1},
+    }
+    response = dedupe_server.app.test_client().post("/files", json=data)
+    assert [f["path"] for f in response.get_json()["files"]] == ["/x.png.out", "/y.png.out", "/x.png.out"]
+    assert dedupe_server.calls == [["/x.png", "/y.png"]]
+
+
+def test_unique_batches_are_passed_through(dedupe_server):
+    dedupe_server.app.test_client().post("/upper", json=texts_payload("a", "b"))
+    assert dedupe_server.calls == [["a", "b"]]
+
+
+def test_wrong_number_of_results():
+    server = MLServer(__name__)
+
+    @server.route("/short", dedupe=True)
+    def short(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        return ResponseBody(root=BatchTextResponse(texts=[TextResponse(value="only one")]))
+
+    response = server.app.test_client().post("/short", json=texts_payload("a", "b", "a"))
+    assert response.status_code == 500
+    assert "one response item per input item" in response.get_json()["error"]
+
+
+def test_template_dedupe():
+    server = MLServer(__name__)
+    ml = TextML({"param1": 1}, dedupe=True)
+
+    @server.route("/template", ml.task_schema_func)
+    def template(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        texts = inputs["text_inputs"].texts
+        results = [TextResponse(value=str(len(texts))) for _ in texts]
+        return ResponseBody(root=BatchTextResponse(texts=results))
+
+    assert isinstance(server.endpoints[0].invoke, Deduplicator)
+    response = server.app.test_client().post("/template", json=texts_payload("a", "a"))
+    assert [t["value"] for t in response.get_json()["texts"]] == ["1", "1"]
+
+
+def test_dedupe_needs_one_batch_input():
+    class SingleText(TypedDict):
+        text_input: TextInput
+
+    server = MLServer(__name__)
+    with pytest.raises(ValueError):
+
+        @server.route("/single", dedupe=True)
+        def single(inputs: SingleText, parameters: IntParameters) -> ResponseBody:
+            return ResponseBody(root=TextResponse(value=""))
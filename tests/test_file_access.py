@@ -0,0 +1,177 @@
+from typing import TypedDict
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.file_access import (
+    LISTING_CACHE,
+    _current_scope,
+    _list_directory,
+    iter_buffers,
+    iter_files,
+    mapping_scope,
+    open_mmap,
+    release,
+)
+from flask_ml.flask_ml_server.models import *
+
+
+class FileInputs(TypedDict):
+    file_inputs: BatchFileInput
+
+
+class TextParameters(TypedDict):
+    param1: str
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name, content in [("a.bin", b"\x00\x01audio"), ("b.bin", b"video"), ("empty.bin", b"")]:
+        path = tmp_path / name
+        path.write_bytes(content)
+        paths.append(str(path))
+    return paths
+
+
+def test_open_mmap_is_read_only(files):
+    view = open_mmap(FileInput(path=files[0]))
+    assert view.readonly
+    assert bytes(view) == b"\x00\x01audio"
+    with pytest.raises(TypeError):
+        view[0] = 1  # type: ignore
+
+
+def test_empty_file(files):
+    with mapping_scope():
+        assert len(open_mmap(FileInput(path=files[2]))) == 0
+    assert len(open_mmap(FileInput(path=files[2]))) == 0
+
+    # Releasing one empty view must not release the views of other empty files.
+    release(open_mmap(FileInput(path=files[2])))
+    assert len(open_mmap(FileInput(path=files[2]))) == 0
+    with mapping_scope():
+        assert len(open_mmap(FileInput(path=files[2]))) == 0
+
+
+def test_iter_buffers(files):
+    batch = BatchFileInput(files=[FileInput(path=path) for path in files])
+    with mapping_scope():
+        buffers = [bytes(view) for view in iter_buffers(batch)]
+    assert buffers == [b"\x00\x01audio", b"video", b""]
+
+
+def test_scope_shares_and_unmaps(files):
+    with mapping_scope() as scope:
+        first = open_mmap(FileInput(path=files[0]))
+        second = open_mmap(FileInput(path=files[0]))
+        assert first is second
+        release(first)
+        assert bytes(second[2:]) == b"audio"
+        release(second)
+        assert scope._mappings == {}
+        kept = open_mmap(FileInput(path=files[1]))
+    with pytest.raises(ValueError):
+        bytes(kept)
+
+
+def test_scope_survives_views_still_in_use(files):
+    with mapping_scope():
+        view = open_mmap(FileInput(path=files[0]))
+        still_used = view[2:]
+    assert bytes(still_used) == b"audio"
+
+
+def test_ml_functions_run_in_a_scope(files):
+    server = MLServer(__name__)
+    seen = []
+
+    @server.route("/sizes")
+    def sizes(inputs: FileInputs, parameters: TextParameters) -> ResponseBody:
+        seen.append(_current_scope.get())
+        texts = [TextResponse(value=str(len(view))) for view in iter_buffers(inputs["file_inputs"])]
+        return ResponseBody(root=BatchTextResponse(texts=texts))
+
+    data = {
+        "inputs": {"file_inputs": {"files": [{"path": path} for path in files]}},
+        "parameters": {"param1": ""},
+    }
+    response = server.app.test_client().post("/sizes", json=data)
+    assert [text["value"] for text in response.get_json()["texts"]] == ["7", "5", "0"]
+    assert seen[0] is not None
+    assert seen[0]._mappings == {}
+    assert _current_scope.get() is None
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for relative in ["a.wav", "b.txt", "sub/c.wav", "sub/deeper/d.wav", "other/e.txt"]:
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(relative)
+    LISTING_CACHE.clear()
+    return tmp_path
+
+
+def relative_paths(root, paths):
+    return sorted(os.path.relpath(path, root) for path in paths)
+
+
+def test_iter_files(tree):
+    directory = DirectoryInput(path=str(tree))
+    assert relative_paths(tree, iter_files(directory)) == [
+        "a.wav",
+        "b.txt",
+        "other/e.txt",
+        "sub/c.wav",
+        "sub/deeper/d.wav",
+    ]
+    assert relative_paths(tree, iter_files(directory, pattern="*.wav", workers=1)) == [
+        "a.wav",
+        "sub/c.wav",
+        "sub/deeper/d.wav",
+    ]
+    assert relative_paths(tree, iter_files(directory, recursive=False)) == ["a.wav", "b.txt"]
+
+
+def test_iter_files_batch(tree):
+    batch = BatchDirectoryInput(
+        directories=[DirectoryInput(path=str(tree / "sub")), DirectoryInput(path=str(tree / "other"))]
+    )
+    assert relative_paths(tree, iter_files(batch)) == ["other/e.txt", "sub/c.wav", "sub/deeper/d.wav"]
+
+
+def test_iter_files_is_lazy(tree):
+    files = iter_files(DirectoryInput(path=str(tree)), workers=1)
+    assert next(files)
+    files.close()
+
+
+def test_iter_files_missing_directory(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(iter_files(DirectoryInput(path=str(tmp_path / "missing"))))
+
+
+def test_listing_cache_only_rescans_changed_directories(tree):
+    directory = DirectoryInput(path=str(tree))
+    list(iter_files(directory))
+    assert len(LISTING_CACHE) == 4
+
+    (tree / "sub" / "new.wav").write_text("new")
+    with patch("flask_ml.flask_ml_server.file_access.os.scandir", wraps=os.scandir) as scandir:
+        paths = relative_paths(tree, iter_files(directory, pattern="*.wav"))
+    assert paths == ["a.wav", "sub/c.wav", "sub/deeper/d.wav", "sub/new.wav"]
+    assert [call.args[0] for call in scandir.call_args_list] == [str(tree / "sub")]
+
+    with patch("flask_ml.flask_ml_server.file_access.os.scandir", wraps=os.scandir) as scandir:
+        list(iter_files(directory, cache=False))
+    assert scandir.call_count == 4
+
+
+def test_list_directory_skips_symlinked_directories(tree):
+    os.symlink(tree / "sub", tree / "link")
+    listing = _list_directory(str(tree), None)
+    assert str(tree / "link") not in listing.directories
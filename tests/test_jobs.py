@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import time
+from typing import TypedDict
+from unittest.mock import patch
+
+import pytest
+
+from flask_ml.flask_ml_client import MLClient
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.errors import TooManyRequestsError
+from flask_ml.flask_ml_server.jobs import JobManager
+from flask_ml.flask_ml_server.models import *
+from tests.conftest import MockResponse
+
+BASE_URL = "http://127.0.0.1:5000"
+DATA = {"inputs": {"text_input": {"text": "hello"}}, "parameters": {}}
+
+
+class SingleTextInput(TypedDict):
+    text_input: TextInput
+
+
+class NoParameters(TypedDict):
+    pass
+
+
+@pytest.fixture
+def release():
+    return threading.Event()
+
+
+@pytest.fixture
+def job_server(release):
+    server = MLServer(__name__, jobs=JobManager(max_workers=1, max_pending=2, ttl=60))
+
+    @server.route("/upper")
+    def upper(inputs: SingleTextInput, parameters: NoParameters) -> ResponseBody:
+        return ResponseBody(root=TextResponse(value=inputs["text_input"].text.upper()))
+
+    @server.route("/async_upper")
+    async def async_upper(inputs: SingleTextInput, parameters: NoParameters) -> ResponseBody:
+        await asyncio.sleep(0)
+        return ResponseBody(root=TextResponse(value=inputs["text_input"].text.upper()))
+
+    @server.route("/slow")
+    def slow(inputs: SingleTextInput, parameters: NoParameters) -> ResponseBody:
+        release.wait(5)
+        return ResponseBody(root=TextResponse(value="done"))
+
+    @server.route("/fail")
+    def fail(inputs: SingleTextInput, parameters: NoParameters) -> ResponseBody:
+        raise Exception("Internal Server Error")
+
+    yield server
+    release.set()
+    server.jobs.shutdown()
+
+
+@pytest.fixture
+def job_app(job_server):
+    return job_server.app.test_client()
+
+
+def wait_for_status(app, location, statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = app.get(location).json
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job never reached {statuses}")
+
+
+@pytest.mark.parametrize("rule", ["/upper", "/async_upper"])
+def test_submit_and_fetch_result(job_app, rule):
+    response = job_app.post(f"{rule}/jobs", json=DATA)
+    assert response.status_code == 202
+    job_id = response.json["job_id"]
+    assert response.headers["Location"] == f"{rule}/jobs/{job_id}"
+
+    job = wait_for_status(job_app, f"{rule}/jobs/{job_id}", ["completed"])
+    assert job["result"] == {"output_type": "text", "value": "HELLO", "title": None, "subtitle": None}
+    assert job["error"] is None
+
+
+def test_submit_validates_before_queueing(job_app):
+    response = job_app.post("/upper/jobs", json={"inputs": {}, "parameters": {}})
+    assert response.status_code == 400
+    assert response.json["status"] == "VALIDATION_ERROR"
+
+
+def test_failed_job(job_app):
+    job_id = job_app.post("/fail/jobs", json=DATA).json["job_id"]
+    job = wait_for_status(job_app, f"/fail/jobs/{job_id}", ["failed"])
+    assert job["error"] == "Exception('Internal Server Error')"
+    assert job["result"] is None
+
+
+def test_cancel_running_and_queued_jobs(job_app, release):
+    running = job_app.post("/slow/jobs", json=DATA).json["job_id"]
+    wait_for_status(job_app, f"/slow/jobs/{running}", ["running"])
+    queued = job_app.post("/slow/jobs", json=DATA).json["job_id"]
+
+    assert job_app.delete(f"/slow/jobs/{queued}").json["status"] == "cancelled"
+    assert job_app.delete(f"/slow/jobs/{running}").json["status"] == "cancelled"
+    release.set()
+    time.sleep(0.05)
+    job = job_app.get(f"/slow/jobs/{running}").json
+    assert job["status"] == "cancelled"
+    assert job["result"] is None
+
+
+def test_too_many_pending_jobs(job_app):
+    assert job_app.post("/slow/jobs", json=DATA).status_code == 202
+    assert job_app.post("/slow/jobs", json=DATA).status_code == 202
+    response = job_app.post("/slow/jobs", json=DATA)
+    assert response.status_code == 429
+    assert response.json["status"] == "TOO_MANY_REQUESTS"
+
+
+def test_unknown_job_and_job_of_other_route(job_app):
+    assert job_app.get("/upper/jobs/missing").status_code == 404
+    assert job_app.delete("/upper/jobs/missing").status_code == 404
+    job_id = job_app.post("/upper/jobs", json=DATA).json["job_id"]
+    assert job_app.get(f"/fail/jobs/{job_id}").status_code == 404
+
+
+def test_finished_jobs_are_evicted_after_ttl():
+    jobs = JobManager(max_workers=1, ttl=0.0)
+    job = jobs.submit("/rule", lambda inputs, parameters: ResponseBody(root=TextResponse(value="x")), {}, {})
+    jobs.shutdown()
+    time.sleep(0.01)
+    assert jobs.get("/rule", job.job_id) is None
+
+
+def test_job_manager_rejects_when_full():
+    jobs = JobManager(max_workers=1, max_pending=0)
+    with pytest.raises(TooManyRequestsError):
+        jobs.submit("/rule", lambda inputs, parameters: None, {}, {})  # type: ignore
+    jobs.shutdown()
+
+
+def patch_requests(app):
+    def forward(method):
+        def send(url, json=None, **kwargs):
+            return MockResponse(app.open(url.removeprefix(BASE_URL), method=method, json=json))
+
+        return send
+
+    return (
+        patch("requests.Session.post", side_effect=forward("POST")),
+        patch("requests.Session.get", side_effect=forward("GET")),
+        patch("requests.Session.delete", side_effect=forward("DELETE")),
+    )
+
+
+def test_client_submit_and_wait(job_app):
+    client = MLClient(f"{BASE_URL}/upper")
+    post, get, delete = patch_requests(job_app)
+    with post, get, delete:
+        job = client.submit(DATA["inputs"], DATA["parameters"])
+        assert job["status"] in ("queued", "running", "completed")
+        result = client.wait(job["job_id"], poll_interval=0.01, timeout=5)
+    assert result == {"output_type": "text", "value": "HELLO", "title": None, "subtitle": None}
+
+
+def test_client_wait_on_failed_and_unknown_job(job_app):
+    client = MLClient(f"{BASE_URL}/fail")
+    post, get, delete = patch_requests(job_app)
+    with post, get, delete:
+        job = client.submit(DATA["inputs"], DATA["parameters"])
+        assert client.wait(job["job_id"], poll_interval=0.01, timeout=5)["status"] == "failed"
+        assert client.wait("missing")["status"] == "NOT_FOUND"
+
+
+def test_client_wait_timeout_and_cancel(job_app, release):
+    client = MLClient(f"{BASE_URL}/slow")
+    post, get, delete = patch_requests(job_app)
+    with post, get, delete:
+        job = client.submit(DATA["inputs"], DATA["parameters"])
+        with pytest.raises(TimeoutError):
+            client.wait(job["job_id"], poll_interval=0.01, timeout=0.05)
+        assert client.cancel(job["job_id"])["status"] == "cancelled"
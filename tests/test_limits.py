@@ -0,0 +1,157 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.errors import TooManyRequestsError
+from flask_ml.flask_ml_server.limits import ConcurrencyLimiter
+from flask_ml.flask_ml_server.models import *
+
+
+class TextInputs(TypedDict):
+    text_input: TextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+TEXT_DATA = {"inputs": {"text_input": {"text": "hello"}}, "parameters": {"param1": 1}}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.005)
+
+
+def test_limited_route_rejects_beyond_queue():
+    server = MLServer(__name__)
+    release = threading.Event()
+
+    @server.route("/slow", max_concurrency=1, max_queue=1)
+    def slow(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        release.wait(5)
+        return ResponseBody(root=TextResponse(value=inputs["text_input"].text))
+
+    limiter = server.endpoints[0].invoke
+    assert isinstance(limiter, ConcurrencyLimiter)
+
+    def post():
+        return server.app.test_client().post("/slow", json=TEXT_DATA)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        running = pool.submit(post)
+        wait_for(lambda: limiter.running == 1)
+        queued = pool.submit(post)
+        wait_for(lambda: limiter.waiting == 1)
+
+        rejected = post()
+        assert rejected.status_code == 429
+        assert rejected.get_json()["status"] == "TOO_MANY_REQUESTS"
+        assert int(rejected.headers["Retry-After"]) >= 1
+
+        metrics = server.app.test_client().get("/api/metrics").get_data(as_text=True)
+        assert 'flask_ml_queue_depth{route="/slow"} 1' in metrics
+        assert 'flask_ml_running_calls{route="/slow"} 1' in metrics
+        assert 'flask_ml_queue_capacity{route="/slow"} 1' in metrics
+
+        release.set()
+        assert running.result().status_code == 200
+        assert queued.result().status_code == 200
+    assert limiter.running == 0 and limiter.waiting == 0
+
+
+def test_limiter_runs_queued_calls_in_order():
+    order = []
+    gate = threading.Event()
+
+    def ml_function(inputs, parameters):
+        if inputs == "first":
+            gate.wait(5)
+        order.append(inputs)
+
+    limiter = ConcurrencyLimiter(ml_function, max_concurrency=1, max_queue=3)
+    threads = []
+    for name in ["first", "second", "third", "fourth"]:
+        thread = threading.Thread(target=limiter, args=(name, {}))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: limiter.running + limiter.waiting == len(threads))
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert order == ["first", "second", "third", "fourth"]
+
+
+def test_limiter_releases_slot_on_error():
+    def fails(inputs, parameters):
+        raise Exception("Model crashed")
+
+    limiter = ConcurrencyLimiter(fails, max_concurrency=1)
+    for _ in range(2):
+        with pytest.raises(Exception, match="Model crashed"):
+            limiter({}, {})
+    assert limiter.running == 0
+
+
+def test_retry_after_grows_with_queue():
+    limiter = ConcurrencyLimiter(lambda inputs, parameters: None, max_concurrency=1, max_queue=0)
+    limiter._average_duration = 2.0
+    limiter.running = 1
+    with pytest.raises(TooManyRequestsError) as e:
+        limiter({}, {})
+    assert e.value.retry_after == 2
+
+
+def test_invalid_limits():
+    server = MLServer(__name__)
+    with pytest.raises(ValueError):
+        server.route("/a", max_queue=2)
+    with pytest.raises(ValueError):
+        ConcurrencyLimiter(lambda inputs, parameters: None, max_concurrency=0)
+
+
+def test_asgi_admits_requests_before_they_wait_for_a_thread():
+    server = MLServer(__name__)
+
+    @server.route("/slow", max_concurrency=1, max_queue=3)
+    def slow(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        time.sleep(0.05)
+        return ResponseBody(root=TextResponse(value=inputs["text_input"].text))
+
+    app = server.asgi_app(max_workers=2)
+    body = json.dumps(TEXT_DATA).encode()
+    depths = []
+
+    async def post():
+        scope = {"type": "http", "method": "POST", "path": "/slow", "headers": [], "query_string": b""}
+        received = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await app(scope, receive, send)
+        return sent[0]["status"]
+
+    async def main():
+        tasks = [asyncio.create_task(post()) for _ in range(10)]
+        await asyncio.sleep(0.02)
+        depths.append(server.limiters["/slow"].waiting)
+        return await asyncio.gather(*tasks)
+
+    statuses = asyncio.run(main())
+    assert sorted(statuses) == [200] * 4 + [429] * 6
+    assert depths == [3]
+    limiter = server.limiters["/slow"]
+    assert (limiter.running, limiter.waiting) == (0, 0)
@@ -0,0 +1,122 @@
+import json
+import threading
+from typing import TypedDict
+
+import pytest
+from werkzeug.serving import make_server
+
+from flask_ml.flask_ml_client.loadgen import (
+    LoadGenerator,
+    Target,
+    discover_routes,
+    main,
+    read_targets,
+    sample_targets,
+)
+from flask_ml.flask_ml_client.utils import percentile
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+@pytest.fixture
+def server_url():
+    server = MLServer(__name__)
+
+    @server.route("/upper")
+    def upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        texts = [TextResponse(value=t.text.upper()) for t in inputs["text_inputs"].texts]
+        return ResponseBody(root=BatchTextResponse(texts=texts))
+
+    @server.route("/fail")
+    def fail(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        raise RuntimeError("model failed")
+
+    http_server = make_server("127.0.0.1", 0, server.app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{http_server.server_port}"
+    http_server.shutdown()
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_sample_targets(server_url):
+    routes = discover_routes(server_url)
+    assert routes == ["/upper", "/fail"]
+    targets = sample_targets(server_url, routes)
+    assert [target.route for target in targets] == routes
+    assert "text_inputs" in targets[0].payloads[0]["inputs"]
+
+
+def test_read_targets(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    lines = [
+        {"inputs": {"text_inputs": {"texts": [{"text": "all"}]}}, "parameters": {"param1": 1}},
+        {
+            "route": "/upper",
+            "inputs": {"text_inputs": {"texts": [{"text": "one"}]}},
+            "parameters": {"param1": 1},
+        },
+    ]
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\n\n")
+    targets = read_targets(str(path), ["/upper", "/fail"])
+    assert [len(target.payloads) for target in targets] == [2, 1]
+    assert "route" not in targets[0].payloads[1]
+
+    path.write_text(json.dumps({"route": "/missing", "inputs": {}}))
+    with pytest.raises(ValueError):
+        read_targets(str(path), ["/upper"])
+
+
+def test_closed_loop(server_url):
+    targets = sample_targets(server_url, ["/upper", "/fail"])
+    report = LoadGenerator(server_url, targets, concurrency=4).run(duration=30, max_requests=20)
+    summary = report.summary()
+    assert summary["/upper"]["requests"] == 10
+    assert summary["/upper"]["error_rate"] == 0
+    assert summary["/upper"]["p50_ms"] <= summary["/upper"]["p99_ms"]
+    assert summary["/fail"]["error_rate"] == 1
+    assert summary["/fail"]["errors"] == {"SERVER_ERROR": 10}
+
+
+def test_open_loop(server_url):
+    targets = [Target("/upper", sample_targets(server_url, ["/upper"])[0].payloads)]
+    report = LoadGenerator(server_url, targets, concurrency=2, rate=100).run(duration=0.2)
+    requests = report.summary()["/upper"]["requests"]
+    assert 15 <= requests <= 20
+    assert report.elapsed >= 0.19
+
+
+def test_connection_errors_are_counted():
+    payload = {"inputs": {"text_inputs": {"texts": [{"text": "a"}]}}, "parameters": {"param1": 1}}
+    generator = LoadGenerator("http://127.0.0.1:1", [Target("/upper", [payload])], concurrency=1)
+    summary = generator.run(duration=30, max_requests=2).summary()["/upper"]
+    assert summary["errors"] == {"CLIENT_ERROR: ConnectionError": 2}
+
+
+def test_main(server_url, tmp_path, capsys):
+    output = tmp_path / "report.json"
+    assert main([server_url, "--route", "/upper", "--requests", "5", "--output", str(output)]) == 0
+    assert "/upper" in capsys.readouterr().out
+    assert json.loads(output.read_text())["routes"]["/upper"]["requests"] == 5
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        LoadGenerator("http://127.0.0.1:1", [])
+    with pytest.raises(ValueError):
+        LoadGenerator("http://127.0.0.1:1", [Target("/upper", [{}])], rate=0)
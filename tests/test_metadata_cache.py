@@ -0,0 +1,101 @@
+from typing import TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+
+from .constants import *
+
+
+class SingleTextInput(TypedDict):
+    text_input: TextInput
+
+
+class TextParameters(TypedDict):
+    param1: str
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/routes",
+        "/api/app_metadata",
+        "/process_text_with_schema/task_schema",
+        "/process_text_with_schema/sample_payload",
+        "/process_text_with_schema/payload_schema",
+        "/process_text/sample_payload",
+        "/process_text/payload_schema",
+    ],
+)
+def test_metadata_endpoints_support_etags(app, url):
+    response = app.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    assert app.get(url).headers["ETag"] == etag
+    not_modified = app.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+
+    stale = app.get(url, headers={"If-None-Match": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.json == response.json
+
+
+def test_payload_is_built_once(server: MLServer, app):
+    calls = []
+
+    def task_schema():
+        calls.append(1)
+        return TaskSchema(inputs=[TEXT_INPUT_SCHEMA], parameters=[TEXT_PARAM_SCHEMA])
+
+    @server.route("/counted", task_schema)
+    def counted(inputs: SingleTextInput, parameters: TextParameters) -> ResponseBody:
+        return ResponseBody(root=TextResponse(value=""))
+
+    calls.clear()
+    for _ in range(3):
+        app.get("/counted/task_schema")
+        app.get("/counted/sample_payload")
+    assert len(calls) == 2
+
+
+def test_add_app_metadata_refreshes_the_cache(server: MLServer, app):
+    metadata_etag = app.get("/api/app_metadata").headers["ETag"]
+    server.add_app_metadata(name="App", author="Author", version="1.0.0", info="# Info")
+
+    metadata = app.get("/api/app_metadata", headers={"If-None-Match": metadata_etag})
+    assert metadata.status_code == 200
+    assert metadata.json["name"] == "App"
+
+
+def test_invalidate_metadata_for_dynamic_task_schema(server: MLServer, app):
+    labels = ["First label"]
+
+    def task_schema():
+        input_schema = InputSchema(key="text_input", label=labels[-1], input_type=InputType.TEXT)
+        return TaskSchema(inputs=[input_schema], parameters=[TEXT_PARAM_SCHEMA])
+
+    @server.route("/dynamic", task_schema)
+    def dynamic(inputs: SingleTextInput, parameters: TextParameters) -> ResponseBody:
+        return ResponseBody(root=TextResponse(value=""))
+
+    assert app.get("/dynamic/task_schema").json["inputs"][0]["label"] == "First label"
+    labels.append("Second label")
+    assert app.get("/dynamic/task_schema").json["inputs"][0]["label"] == "First label"
+
+    server.invalidate_metadata("/dynamic")
+    assert app.get("/dynamic/task_schema").json["inputs"][0]["label"] == "Second label"
+
+
+def test_invalidate_metadata_rejects_invalid_schema(server: MLServer):
+    schemas = [TaskSchema(inputs=[TEXT_INPUT_SCHEMA], parameters=[TEXT_PARAM_SCHEMA])]
+
+    @server.route("/changing", lambda: schemas[-1])
+    def changing(inputs: SingleTextInput, parameters: TextParameters) -> ResponseBody:
+        return ResponseBody(root=TextResponse(value=""))
+
+    schemas.append(TaskSchema(inputs=[FILE_INPUT_SCHEMA], parameters=[TEXT_PARAM_SCHEMA]))
+    with pytest.raises(AssertionError):
+        server.invalidate_metadata()
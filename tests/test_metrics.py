@@ -0,0 +1,114 @@
+import asyncio
+import json
+import re
+from typing import TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.metrics import Histogram, Metrics, PhaseTimer
+from flask_ml.flask_ml_server.models import *
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+@pytest.fixture
+def metrics_server():
+    server = MLServer(__name__)
+
+    @server.route("/upper")
+    def upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        texts = [TextResponse(value=t.text.upper()) for t in inputs["text_inputs"].texts]
+        return ResponseBody(root=BatchTextResponse(texts=texts))
+
+    @server.route("/fails")
+    def fails(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        raise Exception("Model crashed")
+
+    return server
+
+
+def payload(*texts):
+    return {"inputs": {"text_inputs": {"texts": [{"text": t} for t in texts]}}, "parameters": {"param1": 1}}
+
+
+def sample(text: str, name: str, **labels) -> float:
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}{{{re.escape(label_text)}}} (\S+)$", text, re.MULTILINE)
+    assert match is not None, f"{name}{labels} not found"
+    return float(match.group(1))
+
+
+def test_metrics_endpoint(metrics_server):
+    client = metrics_server.app.test_client()
+    client.post("/upper", json=payload("a", "b", "c"))
+    client.post("/upper", json=payload("a"))
+    client.post("/upper", json={"inputs": {}, "parameters": {"param1": 1}})
+    client.post("/fails", json=payload("a"))
+
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+
+    assert sample(text, "flask_ml_requests_total", route="/upper", status="200") == 2
+    assert sample(text, "flask_ml_requests_total", route="/upper", status="400") == 1
+    assert sample(text, "flask_ml_requests_total", route="/fails", status="500") == 1
+    assert sample(text, "flask_ml_request_phase_seconds_count", route="/upper", phase="parse") == 3
+    for phase in ("validate", "model", "serialize"):
+        assert sample(text, "flask_ml_request_phase_seconds_count", route="/upper", phase=phase) == 2
+    assert sample(text, "flask_ml_request_phase_seconds_count", route="/fails", phase="model") == 0
+    assert sample(text, "flask_ml_batch_size_bucket", route="/upper", le="1") == 1
+    assert sample(text, "flask_ml_batch_size_bucket", route="/upper", le="4") == 2
+    assert sample(text, "flask_ml_batch_size_sum", route="/upper") == 4
+    assert sample(text, "flask_ml_in_flight_requests", route="/upper") == 0
+    assert "# TYPE flask_ml_request_phase_seconds histogram" in text
+
+
+def test_asgi_requests_are_recorded(metrics_server):
+    scope = {"type": "http", "method": "POST", "path": "/upper", "headers": [], "query_string": b""}
+    body = json.dumps(payload("a", "b")).encode()
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(metrics_server.asgi_app()(scope, receive, send))
+    assert sent[0]["status"] == 200
+    text = metrics_server.metrics.render()
+    assert sample(text, "flask_ml_requests_total", route="/upper", status="200") == 1
+    assert sample(text, "flask_ml_batch_size_sum", route="/upper") == 2
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram([1, 5])
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+    assert histogram.cumulative_counts() == [(1, 2), (5, 3), (float("inf"), 4)]
+    assert histogram.sum == 14.5
+
+
+def test_custom_gauge_and_label_escaping():
+    metrics = Metrics()
+    family = metrics.gauge("queue_depth", "Queued requests.", ["route"])
+    family.labels('/a"b').set_function(lambda: 3)
+    assert 'queue_depth{route="/a\\"b"} 3' in metrics.render()
+    with pytest.raises(ValueError):
+        metrics.gauge("queue_depth", "Registered twice.")
+
+
+def test_phase_timer():
+    timer = PhaseTimer()
+    timer.mark("parse")
+    timer.mark("model")
+    assert [phase for phase, _ in timer.phases] == ["parse", "model"]
+    assert all(seconds >= 0 for _, seconds in timer.phases)
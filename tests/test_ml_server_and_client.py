@@ -265,7 +265,7 @@ def test_valid_text_request(app):
     }
 
 
-@patch("requests.post")
+@patch("requests.Session.post")
 def test_valid_text_request_client(mock_post, client: MLClient):
     data = {
         "inputs": {"text_inputs": {"texts": [{"text": "Sample text"}]}},
@@ -315,7 +315,7 @@ def test_valid_file_request(app):
     }
 
 
-@patch("requests.post")
+@patch("requests.Session.post")
 def test_valid_file_request_client(mock_post, client):
     data = {
         "inputs": {"file_inputs": {"files": [{"path": "/path/to/image.jpg"}]}},
@@ -339,7 +339,7 @@ def test_valid_file_request_client(mock_post, client):
     }
 
 
-@patch("requests.post")
+@patch("requests.Session.post")
 def test_invalid_response_not_json(mock_post, client):
     data = {
         "inputs": {"file_inputs": {"files": [{"path": "/path/to/image.jpg"}]}},
@@ -353,7 +353,7 @@ def test_invalid_response_not_json(mock_post, client):
     assert "Unknown error" in response["errors"][0]["msg"]
 
 
-@patch("requests.post")
+@patch("requests.Session.post")
 def test_400_response(mock_post, client):
     data = {
         "inputs": {"file_inputs": {"files": [{"path": "/path/to/image.jpg"}]}},
@@ -366,7 +366,7 @@ def test_400_response(mock_post, client):
     response = client.request(data["inputs"], data["parameters"])
     assert {"status": "failed"} == response
 
-@patch("requests.post")
+@patch("requests.Session.post")
 def test_500_response(mock_post, client):
     data = {
         "inputs": {"file_inputs": {"files": [{"path": "/path/to/image.jpg"}]}},
@@ -407,4 +407,30 @@ def test_500_error_handling_for_endpoint_with_schema(app):
     }
     response = app.post("/process_invalid_with_schema", json=data)
     assert response.status_code == 500
-    assert response.json == {'status': "SERVER_ERROR", 'error': "Exception('Internal Server Error')"}
\ No newline at end of file
+    assert response.json == {'status': "SERVER_ERROR", 'error': "Exception('Internal Server Error')"}
+
+
+class EchoInputs(TypedDict):
+    text_input: TextInput
+
+
+class EchoParameters(TypedDict):
+    pass
+
+
+def test_ml_function_names_must_be_unique():
+    server = MLServer(__name__)
+
+    @server.route("/first")
+    def echo(inputs: EchoInputs, parameters: EchoParameters) -> ResponseBody:
+        return ResponseBody(root=TextResponse(value=inputs["text_input"].text))
+
+    with pytest.raises(ValueError):
+
+        @server.route("/second")
+        def echo(inputs: EchoInputs, parameters: EchoParameters) -> ResponseBody:  # noqa: F811
+            return ResponseBody(root=TextResponse(value=inputs["text_input"].text))
+
+    assert [endpoint.rule for endpoint in server.endpoints] == ["/first"]
+    data = {"inputs": {"text_input": {"text": "a"}}, "parameters": {}}
+    assert server.app.test_client().post("/first", json=data).json["value"] == "a"
@@ -0,0 +1,73 @@
+import os
+from typing import TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.executors import ProcessPoolInvoker
+from flask_ml.flask_ml_server.models import *
+
+
+class SingleTextInput(TypedDict):
+    text_input: TextInput
+
+
+class NoParameters(TypedDict):
+    pass
+
+
+process_server = MLServer(__name__)
+
+
+@process_server.route("/pid", executor="process", workers=2)
+def pid(inputs: SingleTextInput, parameters: NoParameters) -> ResponseBody:
+    return ResponseBody(root=TextResponse(value=str(os.getpid()), title=inputs["text_input"].text))
+
+
+@process_server.route("/crash", executor="process", workers=1)
+def crash(inputs: SingleTextInput, parameters: NoParameters) -> ResponseBody:
+    raise ValueError("model failed")
+
+
+DATA = {"inputs": {"text_input": {"text": "hello"}}, "parameters": {}}
+
+
+@pytest.fixture(scope="module")
+def process_app():
+    yield process_server.app.test_client()
+    for endpoint in process_server.endpoints:
+        assert isinstance(endpoint.invoke, ProcessPoolInvoker)
+        endpoint.invoke.shutdown()
+
+
+def test_ml_function_runs_in_worker_process(process_app):
+    response = process_app.post("/pid", json=DATA)
+    assert response.status_code == 200
+    assert response.json["title"] == "hello"
+    assert int(response.json["value"]) != os.getpid()
+
+
+def test_worker_failure_maps_to_server_error(process_app):
+    response = process_app.post("/crash", json=DATA)
+    assert response.status_code == 500
+    assert response.json == {"status": "SERVER_ERROR", "error": "ValueError('model failed')"}
+
+
+def test_validation_still_happens_in_the_server(process_app):
+    response = process_app.post("/pid", json={"inputs": {}, "parameters": {}})
+    assert response.status_code == 400
+
+
+def test_process_executor_needs_module_level_function():
+    server = MLServer(__name__)
+    with pytest.raises(ValueError):
+
+        @server.route("/local", executor="process")
+        def local(inputs: SingleTextInput, parameters: NoParameters) -> ResponseBody:
+            return ResponseBody(root=TextResponse(value=""))
+
+
+def test_unknown_executor():
+    server = MLServer(__name__)
+    with pytest.raises(ValueError):
+        server.route("/thread", executor="thread")
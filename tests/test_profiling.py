@@ -0,0 +1,101 @@
+import marshal
+import pstats
+import time
+from typing import TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+from flask_ml.flask_ml_server.profiling import ProfilingConfig
+
+TOKEN = "secret-token"
+
+
+class TextInputs(TypedDict):
+    text_input: TextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+TEXT_DATA = {"inputs": {"text_input": {"text": "hello"}}, "parameters": {"param1": 1}}
+
+
+def slow_model(text: str) -> str:
+    time.sleep(0.02)
+    return text.upper()
+
+
+def create_server(**config):
+    server = MLServer(__name__, profiling=ProfilingConfig(token=TOKEN, **config))
+
+    @server.route("/upper")
+    def upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        return ResponseBody(root=TextResponse(value=slow_model(inputs["text_input"].text)))
+
+    return server
+
+
+def test_profile_requested_with_token():
+    server = create_server()
+    client = server.app.test_client()
+    response = client.post("/upper", json=TEXT_DATA, headers={"X-Flask-ML-Profile": TOKEN})
+    assert response.status_code == 200
+    assert response.get_json()["value"] == "HELLO"
+    profile_id = response.headers["X-Flask-ML-Profile-Id"]
+
+    admin = {"X-Flask-ML-Admin-Token": TOKEN}
+    summary = client.get(f"/api/profiles/{profile_id}", headers=admin).get_json()
+    assert summary["rule"] == "/upper"
+    assert summary["duration"] >= 0.02
+    assert [p["profile_id"] for p in client.get("/api/profiles", headers=admin).get_json()] == [profile_id]
+
+    raw = client.get(summary["pstats"], headers=admin).data
+    stats = pstats.Stats()
+    stats.stats = marshal.loads(raw)  # type: ignore
+    assert any(name == "slow_model" for _, _, name in stats.stats)  # type: ignore
+
+    collapsed = client.get(summary["collapsed"], headers=admin).get_data(as_text=True)
+    assert "slow_model" in collapsed
+    stack, count = collapsed.splitlines()[0].rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+
+def test_requests_without_valid_token_are_not_profiled():
+    server = create_server()
+    client = server.app.test_client()
+    assert "X-Flask-ML-Profile-Id" not in client.post("/upper", json=TEXT_DATA).headers
+    response = client.post("/upper", json=TEXT_DATA, headers={"X-Flask-ML-Profile": "wrong"})
+    assert "X-Flask-ML-Profile-Id" not in response.headers
+    assert server.profiler.profiles() == []  # type: ignore
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Flask-ML-Admin-Token": "wrong"}])
+def test_profiles_need_admin_token(headers):
+    response = create_server().app.test_client().get("/api/profiles", headers=headers)
+    assert response.status_code == 403
+    assert response.get_json()["status"] == "FORBIDDEN"
+
+
+def test_sample_rate_and_max_profiles():
+    server = create_server(sample_rate=1.0, max_profiles=2)
+    client = server.app.test_client()
+    ids = [client.post("/upper", json=TEXT_DATA).headers["X-Flask-ML-Profile-Id"] for _ in range(3)]
+    assert [p.profile_id for p in server.profiler.profiles()] == ids[:0:-1]  # type: ignore
+    response = client.get(f"/api/profiles/{ids[0]}", headers={"X-Flask-ML-Admin-Token": TOKEN})
+    assert response.status_code == 404
+
+
+def test_profiling_disabled_by_default():
+    server = MLServer(__name__)
+    assert server.profiler is None
+    assert server.app.test_client().get("/api/profiles").status_code == 404
+
+
+def test_invalid_config():
+    with pytest.raises(ValueError):
+        ProfilingConfig(token="")
+    with pytest.raises(ValueError):
+        ProfilingConfig(token=TOKEN, sample_rate=2)
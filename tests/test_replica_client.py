@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict
+
+import pytest
+import requests
+from flask import Response
+from werkzeug.serving import make_server
+
+from flask_ml.flask_ml_client import ReplicaMLClient
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+INPUTS = {"text_inputs": {"texts": [{"text": "a"}]}}
+PARAMETERS = {"param1": 1}
+
+
+def start_replica(name: str):
+    server = MLServer(__name__)
+    state = {"delay": 0.0, "healthy": True, "requests": 0}
+
+    @server.route("/name")
+    def replica_name(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        state["requests"] += 1
+        time.sleep(state["delay"])
+        return ResponseBody(root=BatchTextResponse(texts=[TextResponse(value=name)]))
+
+    @server.app.before_request
+    def unhealthy():
+        if not state["healthy"]:
+            time.sleep(state["delay"])
+            return Response("unavailable", status=502, mimetype="text/plain")
+
+    http_server = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server, f"http://127.0.0.1:{http_server.server_port}", state
+
+
+@pytest.fixture
+def replicas():
+    started = [start_replica(name) for name in ("a", "b", "c")]
+    yield [(url, state) for _, url, state in started]
+    for http_server, _, _ in started:
+        http_server.shutdown()
+
+
+def value(result):
+    return result["texts"][0]["value"]
+
+
+def test_least_outstanding_spreads_requests(replicas):
+    for _, state in replicas:
+        state["delay"] = 0.2
+    client = ReplicaMLClient([url for url, _ in replicas], "/name")
+    with ThreadPoolExecutor(6) as executor:
+        results = list(executor.map(lambda _: value(client.request(INPUTS, PARAMETERS)), range(6)))
+    assert sorted(results) == ["a", "a", "b", "b", "c", "c"]
+
+
+def test_ewma_prefers_the_fastest_replica(replicas):
+    replicas[0][1]["delay"] = 0.2
+    replicas[1][1]["delay"] = 0.2
+    client = ReplicaMLClient([url for url, _ in replicas], "name", policy="ewma")
+    results = [value(client.request(INPUTS, PARAMETERS)) for _ in range(20)]
+    # Each replica is tried once, then the fastest one gets the rest.
+    assert results[3:].count("c") == 17
+
+
+def test_unreachable_replicas_are_ejected_and_probed_back(replicas):
+    (url_a, state_a), (url_b, _), _ = replicas
+    state_a["healthy"] = False
+    client = ReplicaMLClient([url_a, url_b], "/name", max_failures=2, ejection_time=0.2)
+    results = [value(client.request(INPUTS, PARAMETERS)) for _ in range(6)]
+    assert results == ["b"] * 6
+    assert client.replicas[0].ejected
+    assert client.replicas[0].requests == 2
+
+    # The probe fails while the replica is still unhealthy.
+    time.sleep(0.25)
+    assert value(client.request(INPUTS, PARAMETERS)) == "b"
+    assert client.replicas[0].ejected
+    assert client.replicas[0].requests == 2
+
+    state_a["healthy"] = True
+    time.sleep(0.25)
+    results = [value(client.request(INPUTS, PARAMETERS)) for _ in range(4)]
+    assert not client.replicas[0].ejected
+    assert "a" in results
+
+
+def test_no_reachable_replica(replicas):
+    for _, state in replicas:
+        state["healthy"] = False
+    client = ReplicaMLClient([url for url, _ in replicas], "/name")
+    assert client.request(INPUTS, PARAMETERS)["status"].startswith("Unknown error")
+
+    client = ReplicaMLClient(["http://127.0.0.1:1"], "/name", max_failures=1)
+    with pytest.raises(requests.ConnectionError):
+        client.request(INPUTS, PARAMETERS)
+    with pytest.raises(requests.ConnectionError):
+        client.request(INPUTS, PARAMETERS)
+
+
+def test_hedging(replicas):
+    urls = [url for url, _ in replicas[:2]]
+    client = ReplicaMLClient(urls, "/name", hedge_percentile=90, hedge_min_samples=10)
+    for _ in range(10):
+        client.request(INPUTS, PARAMETERS)
+    assert client.hedged == 0
+
+    replicas[0][1]["delay"] = 0.5
+    start = time.perf_counter()
+    results = [value(client.request(INPUTS, PARAMETERS)) for _ in range(2)]
+    assert time.perf_counter() - start < 0.5
+    assert results == ["b", "b"]
+    assert client.hedged == 1
+
+
+def test_hedged_replica_is_not_tried_again(replicas):
+    client = ReplicaMLClient([url for url, _ in replicas], "/name", hedge_percentile=50, hedge_min_samples=5)
+    for _ in range(6):
+        client.request(INPUTS, PARAMETERS)
+    excluded = []
+    pick = client._pick
+
+    def recording_pick(exclude=()):
+        excluded.append([replica.base_url for replica in exclude])
+        return pick(exclude)
+
+    client._pick = recording_pick  # type: ignore
+    client._turn = 0
+    # The first replica fails slowly, so the request is hedged to the third, which fails at once.
+    replicas[0][1].update(delay=0.3, healthy=False)
+    replicas[2][1]["healthy"] = False
+    assert value(client.request(INPUTS, PARAMETERS)) == "b"
+    assert client.hedged == 1
+    # The failover after both failed excludes the hedged replica too. Only the hedge excludes the first alone.
+    assert [replicas[0][0], replicas[2][0]] in excluded
+    assert excluded.count([replicas[0][0]]) == 1
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        ReplicaMLClient([], "/name")
+    with pytest.raises(ValueError):
+        ReplicaMLClient(["http://127.0.0.1:1"], "/name", policy="random")
+    with pytest.raises(ValueError):
+        ReplicaMLClient(["http://127.0.0.1:1"], "/name", hedge_percentile=100)
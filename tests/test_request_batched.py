@@ -0,0 +1,108 @@
+import threading
+from typing import TypedDict
+
+import pytest
+from werkzeug.serving import make_server
+
+from flask_ml.flask_ml_client import MLClient
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class FileInputs(TypedDict):
+    file_inputs: BatchFileInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+@pytest.fixture
+def batch_server():
+    server = MLServer(__name__)
+    calls = []
+    failures = {}
+    lock = threading.Lock()
+
+    @server.route("/upper")
+    def upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        texts = [t.text for t in inputs["text_inputs"].texts]
+        with lock:
+            calls.append(texts)
+            # Fail the first try of the chunks starting with a text listed in failures.
+            if failures.get(texts[0], 0) > 0:
+                failures[texts[0]] -= 1
+                raise RuntimeError("flaky model")
+        return ResponseBody(root=BatchTextResponse(texts=[TextResponse(value=t.upper()) for t in texts]))
+
+    @server.route("/files")
+    def files(inputs: FileInputs, parameters: IntParameters) -> ResponseBody:
+        paths = [f.path for f in inputs["file_inputs"].files]
+        results = [FileResponse(path=p + ".out", file_type=FileType.IMG) for p in paths]
+        return ResponseBody(root=BatchFileResponse(files=results))
+
+    http_server = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{http_server.server_port}"  # type: ignore
+    server.calls = calls  # type: ignore
+    server.failures = failures  # type: ignore
+    yield server
+    http_server.shutdown()
+
+
+def texts(count):
+    return {"text_inputs": {"texts": [{"text": f"t{i}"} for i in range(count)]}}
+
+
+def test_chunks_are_merged_in_order(batch_server):
+    with MLClient(batch_server.url + "/upper") as client:
+        result = client.request_batched(texts(25), {"param1": 1}, chunk_size=10, parallelism=3)
+    assert [t["value"] for t in result["texts"]] == [f"T{i}" for i in range(25)]
+    assert result["output_type"] == "batchtext"
+    assert sorted(len(call) for call in batch_server.calls) == [5, 10, 10]
+    assert "model" in result.server_timing
+
+
+def test_only_failed_chunks_are_retried(batch_server):
+    batch_server.failures["t10"] = 1
+    result = MLClient(batch_server.url + "/upper").request_batched(texts(30), {"param1": 1}, chunk_size=10)
+    assert [t["value"] for t in result["texts"]] == [f"T{i}" for i in range(30)]
+    assert sorted(call[0] for call in batch_server.calls) == ["t0", "t10", "t10", "t20"]
+
+
+def test_errors_are_returned_once_retries_run_out(batch_server):
+    batch_server.failures["t10"] = 5
+    client = MLClient(batch_server.url + "/upper")
+    result = client.request_batched(texts(30), {"param1": 1}, chunk_size=10, retries=1)
+    assert result["status"] == "SERVER_ERROR"
+    assert len(batch_server.calls) == 4
+
+
+def test_invalid_chunks_are_not_retried(batch_server):
+    client = MLClient(batch_server.url + "/upper")
+    result = client.request_batched(texts(30), {"wrong": 1}, chunk_size=10)
+    assert result["status"] == "VALIDATION_ERROR"
+    assert batch_server.calls == []
+
+
+def test_files_and_small_batches(batch_server):
+    client = MLClient(batch_server.url + "/files")
+    inputs = {"file_inputs": {"files": [{"path": f"/{i}.png"} for i in range(7)]}}
+    result = client.request_batched(inputs, {"param1": 1}, chunk_size=3)
+    assert [f["path"] for f in result["files"]] == [f"/{i}.png.out" for i in range(7)]
+
+    small = MLClient(batch_server.url + "/upper").request_batched(texts(3), {"param1": 1}, chunk_size=10)
+    assert [t["value"] for t in small["texts"]] == ["T0", "T1", "T2"]
+    assert len(batch_server.calls) == 1
+
+
+def test_needs_one_batch_input(batch_server):
+    client = MLClient(batch_server.url + "/upper")
+    with pytest.raises(ValueError):
+        client.request_batched({"text_input": {"text": "a"}}, {"param1": 1})
+    with pytest.raises(ValueError):
+        client.request_batched({**texts(2), "more": {"texts": []}}, {"param1": 1})
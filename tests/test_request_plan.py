@@ -0,0 +1,88 @@
+from typing import TypedDict
+
+import pytest
+from pydantic import ValidationError
+
+from flask_ml.flask_ml_server.errors import BadRequestError
+from flask_ml.flask_ml_server.models import *
+from flask_ml.flask_ml_server.request_plan import compile_no_schema_request_plan, compile_schema_request_plan
+from flask_ml.flask_ml_server.utils import input_model_for_type
+
+from .constants import *
+
+
+class FileInputs(TypedDict):
+    file_inputs: BatchFileInput
+
+
+class FloatParameters(TypedDict):
+    param1: float
+
+
+def ml_function(inputs: FileInputs, parameters: FloatParameters) -> ResponseBody:
+    return ResponseBody(root=TextResponse(value="ok"))
+
+
+FILES_SCHEMA = TaskSchema(inputs=[BATCHFILE_INPUT_SCHEMA], parameters=[RANGED_FLOAT_PARAM_SCHEMA])
+VALID_DATA = {
+    "inputs": {"file_inputs": {"files": [{"path": "/path/to/image.jpg"}]}},
+    "parameters": {"param1": 0.5},
+}
+
+
+@pytest.mark.parametrize(
+    "plan", [compile_schema_request_plan(FILES_SCHEMA), compile_no_schema_request_plan(ml_function)]
+)
+def test_plan_parse_on_valid_data(plan):
+    inputs, parameters = plan.parse(VALID_DATA)
+    assert inputs == {"file_inputs": BatchFileInput(files=[FileInput(path="/path/to/image.jpg")])}
+    assert parameters == {"param1": 0.5}
+
+
+def test_plan_keys_are_frozen_at_compile_time():
+    plan = compile_schema_request_plan(FILES_SCHEMA)
+    assert plan.input_keys == frozenset({"file_inputs"})
+    assert plan.parameter_keys == frozenset({"param1"})
+    assert plan.input_models == {"file_inputs": BatchFileInput}
+
+
+def test_plan_coerces_integer_for_float_parameter():
+    plan = compile_schema_request_plan(FILES_SCHEMA)
+    _, parameters = plan.parse({**VALID_DATA, "parameters": {"param1": 1}})
+    assert parameters == {"param1": 1.0}
+    assert isinstance(parameters["param1"], float)
+
+
+def test_plan_leaves_other_parameters_untouched():
+    plan = compile_schema_request_plan(TaskSchema(inputs=[TEXT_INPUT_SCHEMA], parameters=[TEXT_PARAM_SCHEMA]))
+    _, parameters = plan.parse({"inputs": {"text_input": {"text": "a"}}, "parameters": {"param1": 0}})
+    assert parameters == {"param1": 0}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        {"inputs": {}},
+        {"inputs": {"wrong_key": {"files": []}}, "parameters": {"param1": 0.5}},
+        {"inputs": VALID_DATA["inputs"], "parameters": {"wrong_key": 0.5}},
+        {"inputs": VALID_DATA["inputs"], "parameters": []},
+    ],
+)
+def test_plan_parse_on_bad_request(data):
+    plan = compile_schema_request_plan(FILES_SCHEMA)
+    with pytest.raises(BadRequestError):
+        plan.parse(data)
+
+
+@pytest.mark.parametrize("bad_input", [{"wrong_key": []}, "not a dict"])
+def test_plan_parse_on_invalid_input(bad_input):
+    plan = compile_schema_request_plan(FILES_SCHEMA)
+    with pytest.raises(ValidationError):
+        plan.parse({"inputs": {"file_inputs": bad_input}, "parameters": {"param1": 0.5}})
+
+
+def test_input_model_for_type():
+    assert input_model_for_type(InputType.TEXTAREA) is TextInput
+    assert input_model_for_type(NEWFILEINPUT_INPUT_SCHEMA.input_type) is FileInput
+    assert input_model_for_type(InputType.BATCHDIRECTORY) is BatchDirectoryInput
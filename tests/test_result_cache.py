@@ -0,0 +1,176 @@
+import os
+from pathlib import Path
+from typing import TypedDict
+
+import pytest
+
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+from flask_ml.flask_ml_server.result_cache import DiskCacheBackend, MemoryCacheBackend, ResultCache
+
+
+class SingleFileInput(TypedDict):
+    file_input: FileInput
+
+
+class TextParameters(TypedDict):
+    param1: str
+
+
+@pytest.fixture
+def input_file(tmp_path: Path) -> Path:
+    path = tmp_path / "input.txt"
+    path.write_text("first")
+    return path
+
+
+@pytest.fixture
+def cached_server():
+    server = MLServer(__name__)
+    cache = ResultCache(max_bytes=1024 * 1024)
+    calls = []
+
+    @server.route("/read", cache=cache)
+    def read(inputs: SingleFileInput, parameters: TextParameters) -> ResponseBody:
+        calls.append(parameters["param1"])
+        with open(inputs["file_input"].path) as f:
+            return ResponseBody(root=TextResponse(value=parameters["param1"] + f.read()))
+
+    return server, cache, calls
+
+
+def post(app, path, param1="p:"):
+    data = {"inputs": {"file_input": {"path": str(path)}}, "parameters": {"param1": param1}}
+    return app.post("/read", json=data).json["value"]
+
+
+def test_repeated_request_is_served_from_cache(cached_server, input_file):
+    server, cache, calls = cached_server
+    app = server.app.test_client()
+    assert post(app, input_file) == "p:first"
+    assert post(app, input_file) == "p:first"
+    assert calls == ["p:"]
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": cache.backend.size}
+
+    assert post(app, input_file, "q:") == "q:first"
+    assert calls == ["p:", "q:"]
+
+
+def test_changed_file_is_a_cache_miss(cached_server, input_file):
+    server, cache, calls = cached_server
+    app = server.app.test_client()
+    assert post(app, input_file) == "p:first"
+    input_file.write_text("second, longer")
+    assert post(app, input_file) == "p:second, longer"
+    assert len(calls) == 2
+
+
+def test_app_version_change_invalidates_the_cache(cached_server, input_file):
+    server, cache, calls = cached_server
+    app = server.app.test_client()
+    server.add_app_metadata(name="App", author="Author", version="1.0.0", info="")
+    post(app, input_file)
+    server.add_app_metadata(name="App", author="Author", version="1.0.0", info="")
+    post(app, input_file)
+    assert len(calls) == 1
+
+    server.add_app_metadata(name="App", author="Author", version="2.0.0", info="")
+    assert len(cache.backend) == 0
+    post(app, input_file)
+    assert len(calls) == 2
+
+
+def test_errors_are_not_cached(input_file):
+    server = MLServer(__name__)
+    cache = ResultCache()
+
+    @server.route("/fail", cache=cache)
+    def fail(inputs: SingleFileInput, parameters: TextParameters) -> ResponseBody:
+        raise Exception("Internal Server Error")
+
+    app = server.app.test_client()
+    data = {"inputs": {"file_input": {"path": str(input_file)}}, "parameters": {"param1": ""}}
+    assert app.post("/fail", json=data).status_code == 500
+    assert app.post("/fail", json=data).status_code == 500
+    assert cache.stats()["misses"] == 2
+    assert len(cache.backend) == 0
+
+
+def test_key_depends_on_path_state(tmp_path: Path):
+    cache = ResultCache()
+    path = tmp_path / "a.txt"
+    inputs = {"files": BatchFileInput(files=[FileInput(path=str(path))])}
+    missing = cache.key("ns", inputs, {})
+    path.write_text("x")
+    present = cache.key("ns", inputs, {})
+    assert missing != present
+    assert present == cache.key("ns", inputs, {})
+    assert present != cache.key("other", inputs, {})
+
+
+def test_key_depends_on_the_files_inside_directories(tmp_path: Path):
+    cache = ResultCache()
+    nested = tmp_path / "data" / "nested"
+    nested.mkdir(parents=True)
+    path = nested / "a.txt"
+    path.write_text("x")
+    inputs = {"directory": DirectoryInput(path=str(tmp_path / "data"))}
+    before = cache.key("ns", inputs, {})
+    stat = os.stat(tmp_path / "data")
+    # An edit in place changes the file but neither directory.
+    path.write_text("xy")
+    os.utime(tmp_path / "data", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.key("ns", inputs, {}) != before
+    missing = {"directory": DirectoryInput(path=str(tmp_path / "missing"))}
+    assert cache.key("ns", missing, {}) == cache.key("ns", missing, {})
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_bytes=10)
+    backend.set("a", b"1234")
+    backend.set("b", b"1234")
+    assert backend.get("a") == b"1234"
+    backend.set("c", b"1234")
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1234"
+    assert backend.size == 8
+    backend.set("big", b"x" * 11)
+    assert backend.get("big") is None
+
+
+def test_disk_backend_evicts_and_survives_restart(tmp_path: Path):
+    directory = str(tmp_path / "cache")
+    backend = DiskCacheBackend(directory, max_bytes=10)
+    backend.set("a", b"1234")
+    backend.set("b", b"1234")
+    backend.set("c", b"1234")
+    assert backend.get("a") is None
+    assert sorted(os.listdir(directory)) == ["b.json", "c.json"]
+
+    restarted = DiskCacheBackend(directory, max_bytes=10)
+    assert restarted.get("c") == b"1234"
+    assert restarted.size == 8
+    restarted.clear()
+    assert os.listdir(directory) == []
+
+
+def test_disk_backend_removes_the_temporary_file_of_a_failed_write(tmp_path: Path, monkeypatch):
+    directory = str(tmp_path / "cache")
+    backend = DiskCacheBackend(directory, max_bytes=10)
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        backend.set("a", b"1234")
+    assert os.listdir(directory) == []
+    assert backend.get("a") is None
+
+
+def test_disk_result_cache(tmp_path: Path):
+    cache = ResultCache(directory=str(tmp_path / "cache"))
+    invoke = cache.wrap(lambda inputs, parameters: ResponseBody(root=TextResponse(value="v")), lambda: "ns")
+    assert invoke({}, {}).root.value == "v"
+    assert invoke({}, {}).root.value == "v"
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,175 @@
+import threading
+from typing import TypedDict
+
+import pytest
+from flask import request
+from werkzeug.serving import make_server
+
+from flask_ml.flask_ml_client import SchemaMLClient
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.errors import BadRequestError
+from flask_ml.flask_ml_server.models import *
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class CaseParameters(TypedDict):
+    to_case: str
+    repeat: int
+    temperature: float
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+@pytest.fixture
+def schema_server():
+    server = MLServer(__name__)
+    choices = ["upper", "lower"]
+    log = []
+
+    def case_task_schema() -> TaskSchema:
+        return TaskSchema(
+            inputs=[InputSchema(key="text_inputs", label="Texts", input_type=InputType.BATCHTEXT)],
+            parameters=[
+                ParameterSchema(
+                    key="to_case",
+                    label="Case",
+                    value=EnumParameterDescriptor(
+                        enum_vals=[EnumVal(key=choice, label=choice) for choice in choices], default="upper"
+                    ),
+                ),
+                ParameterSchema(
+                    key="repeat",
+                    label="Repeat",
+                    value=RangedIntParameterDescriptor(range=IntRangeDescriptor(min=1, max=3), default=1),
+                ),
+                ParameterSchema(
+                    key="temperature",
+                    label="Temperature",
+                    value=RangedFloatParameterDescriptor(
+                        range=FloatRangeDescriptor(min=0, max=1), default=0.5
+                    ),
+                ),
+            ],
+        )
+
+    @server.route("/case", case_task_schema, short_title="Change case")
+    def case(inputs: TextInputs, parameters: CaseParameters) -> ResponseBody:
+        if parameters["to_case"] not in choices:
+            raise BadRequestError(f"Unsupported case {parameters['to_case']}")
+        change = {"upper": str.upper, "lower": str.lower, "title": str.title}[parameters["to_case"]]
+        texts = inputs["text_inputs"].texts
+        results = [TextResponse(value=change(t.text) * parameters["repeat"]) for t in texts]
+        return ResponseBody(root=BatchTextResponse(texts=results))
+
+    @server.route("/no_schema")
+    def no_schema(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        return ResponseBody(root=BatchTextResponse(texts=[]))
+
+    @server.app.after_request
+    def record(response):
+        log.append((request.method, request.path, response.status_code))
+        return response
+
+    http_server = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{http_server.server_port}"  # type: ignore
+    server.log = log  # type: ignore
+    server.choices = choices  # type: ignore
+    yield server
+    http_server.shutdown()
+
+
+INPUTS = {"text_inputs": {"texts": [{"text": "Ab"}]}}
+PARAMETERS = {"to_case": "lower", "repeat": 2, "temperature": 0}
+
+
+def posts(server):
+    return [entry for entry in server.log if entry[0] == "POST"]
+
+
+@pytest.mark.parametrize("task", ["/case", "case", "Change case"])
+def test_tasks_by_name(schema_server, task):
+    client = SchemaMLClient(schema_server.url, task=task)
+    assert client.url == schema_server.url + "/case"
+    assert client.request(INPUTS, PARAMETERS)["texts"][0]["value"] == "abab"
+    with pytest.raises(ValueError):
+        client.set_url("missing")
+    client.set_url(schema_server.url + "/no_schema")
+    assert client.url == schema_server.url + "/no_schema"
+
+
+@pytest.mark.parametrize(
+    "inputs, parameters",
+    [
+        ({"wrong": {"texts": []}}, PARAMETERS),
+        ({"text_inputs": {"text": "not a batch"}}, PARAMETERS),
+        (INPUTS, {"to_case": "lower", "repeat": 2}),
+        (INPUTS, {**PARAMETERS, "to_case": "title"}),
+        (INPUTS, {**PARAMETERS, "repeat": 4}),
+        (INPUTS, {**PARAMETERS, "repeat": 1.5}),
+        (INPUTS, {**PARAMETERS, "temperature": 1.1}),
+        (INPUTS, {**PARAMETERS, "temperature": "hot"}),
+    ],
+)
+def test_invalid_requests_are_not_sent(schema_server, inputs, parameters):
+    client = SchemaMLClient(schema_server.url, task="case")
+    assert client.request(inputs, parameters)["status"] == "VALIDATION_ERROR"
+    assert [item["status"] for item in client.request_stream(inputs, parameters)] == ["VALIDATION_ERROR"]
+    assert client.submit(inputs, parameters)["status"] == "VALIDATION_ERROR"
+    assert posts(schema_server) == []
+
+
+def test_metadata_is_fetched_once_and_revalidated(schema_server):
+    client = SchemaMLClient(schema_server.url, task="case")
+    for _ in range(3):
+        client.request(INPUTS, PARAMETERS)
+    gets = [entry for entry in schema_server.log if entry[0] == "GET"]
+    assert gets == [("GET", "/api/routes", 200), ("GET", "/case/task_schema", 200)]
+
+    schema_server.log.clear()
+    client.refresh()
+    client.request(INPUTS, PARAMETERS)
+    assert [entry for entry in schema_server.log if entry[0] == "GET"] == [
+        ("GET", "/api/routes", 304),
+        ("GET", "/case/task_schema", 304),
+    ]
+
+
+def test_changed_schema_is_picked_up(schema_server):
+    client = SchemaMLClient(schema_server.url, task="case", max_age=3600)
+    assert client.validate(INPUTS, {**PARAMETERS, "to_case": "title"}) is not None
+
+    schema_server.choices.append("title")
+    schema_server.invalidate_metadata("/case")
+    # The cached schema still rejects the new choice until it is revalidated.
+    assert client.request(INPUTS, {**PARAMETERS, "to_case": "title"})["status"] == "VALIDATION_ERROR"
+    client.refresh()
+    assert client.validate(INPUTS, {**PARAMETERS, "to_case": "title"}) is None
+    assert client.request(INPUTS, {**PARAMETERS, "to_case": "title"})["texts"][0]["value"] == "AbAb"
+
+    schema_server.choices.remove("title")
+    schema_server.invalidate_metadata("/case")
+    # The server rejects the request, which makes the client revalidate its metadata.
+    assert client.request(INPUTS, {**PARAMETERS, "to_case": "title"})["status"] == "VALIDATION_ERROR"
+    assert client.validate(INPUTS, {**PARAMETERS, "to_case": "title"}) is not None
+    assert len(posts(schema_server)) == 2
+
+
+def test_routes_without_schema_are_sent_as_is(schema_server):
+    client = SchemaMLClient(schema_server.url, task="no_schema")
+    assert client.task_schema() is None
+    assert client.request(INPUTS, {"param1": 1})["texts"] == []
+    assert client.request(INPUTS, {"wrong": 1})["status"] == "VALIDATION_ERROR"
+    assert len(posts(schema_server)) == 2
+
+
+def test_valid_requests_are_sent_on_every_path(schema_server):
+    client = SchemaMLClient(schema_server.url, task="case")
+    assert [item["value"] for item in client.request_stream(INPUTS, PARAMETERS)] == ["abab"]
+    job = client.submit(INPUTS, PARAMETERS)
+    assert client.wait(job["job_id"], poll_interval=0.01)["texts"][0]["value"] == "abab"
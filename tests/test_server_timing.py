@@ -0,0 +1,115 @@
+import asyncio
+import json
+from typing import Iterator, TypedDict
+from unittest.mock import patch
+
+import pytest
+
+from flask_ml.flask_ml_client import MLClient
+from flask_ml.flask_ml_client.MLClient import TimedResult, parse_server_timing
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+
+BASE_URL = "http://127.0.0.1:5000"
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+TEXTS_DATA = {"inputs": {"text_inputs": {"texts": [{"text": "a"}]}}, "parameters": {"param1": 1}}
+
+
+@pytest.fixture
+def timing_server():
+    server = MLServer(__name__)
+
+    @server.route("/upper")
+    def upper(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        texts = [TextResponse(value=t.text.upper()) for t in inputs["text_inputs"].texts]
+        return ResponseBody(root=BatchTextResponse(texts=texts))
+
+    @server.route("/stream")
+    def stream(inputs: TextInputs, parameters: IntParameters) -> Iterator[TextResponse]:
+        for t in inputs["text_inputs"].texts:
+            yield TextResponse(value=t.text)
+
+    return server
+
+
+def test_server_timing_header(timing_server):
+    client = timing_server.app.test_client()
+    timings = parse_server_timing(client.post("/upper", json=TEXTS_DATA).headers["Server-Timing"])
+    assert list(timings) == ["parse", "validate", "model", "serialize"]
+    assert all(duration >= 0 for duration in timings.values())
+
+    stream_timings = parse_server_timing(client.post("/stream", json=TEXTS_DATA).headers["Server-Timing"])
+    assert list(stream_timings) == ["parse", "validate", "model"]
+
+    error_timings = parse_server_timing(
+        client.post("/upper", json={"inputs": {}, "parameters": {}}).headers["Server-Timing"]
+    )
+    assert list(error_timings) == ["parse"]
+
+
+def test_asgi_server_timing_header(timing_server):
+    scope = {"type": "http", "method": "POST", "path": "/upper", "headers": [], "query_string": b""}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(TEXTS_DATA).encode(), "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(timing_server.asgi_app()(scope, receive, send))
+    headers = dict(sent[0]["headers"])
+    assert list(parse_server_timing(headers[b"server-timing"].decode())) == [
+        "parse",
+        "validate",
+        "model",
+        "serialize",
+    ]
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, {}),
+        ("model;dur=12.5", {"model": 12.5}),
+        ('parse;dur=0.1, cache;desc="Cache Read";dur=23.2, miss', {"parse": 0.1, "cache": 23.2}),
+        ("model;dur=abc", {}),
+    ],
+)
+def test_parse_server_timing(header, expected):
+    assert parse_server_timing(header) == expected
+
+
+class TimingMockResponse:
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+        self._response = response
+
+    def json(self):
+        return self._response.get_json()
+
+
+def test_client_exposes_server_timing(timing_server):
+    test_client = timing_server.app.test_client()
+
+    def send(url, json=None, **kwargs):
+        return TimingMockResponse(test_client.post(url.removeprefix(BASE_URL), json=json))
+
+    with patch("requests.Session.post", side_effect=send):
+        result = MLClient(BASE_URL + "/upper").request(TEXTS_DATA["inputs"], TEXTS_DATA["parameters"])
+        error = MLClient(BASE_URL + "/upper").request(TEXTS_DATA["inputs"], {"wrong": 1})
+    assert isinstance(result, TimedResult)
+    assert result["texts"][0]["value"] == "A"
+    assert set(result.server_timing) == {"parse", "validate", "model", "serialize"}
+    assert error["status"] == "VALIDATION_ERROR"
+    assert "validate" not in error.server_timing
@@ -0,0 +1,149 @@
+import argparse
+import json
+from typing import Iterator, TypedDict
+from unittest.mock import patch
+
+import pytest
+
+from flask_ml.flask_ml_cli import MLCli
+from flask_ml.flask_ml_client import MLClient
+from flask_ml.flask_ml_server import MLServer
+from flask_ml.flask_ml_server.models import *
+from flask_ml.flask_ml_server.streaming import collect_stream, is_stream, ndjson_lines
+
+from .constants import *
+
+BASE_URL = "http://127.0.0.1:5000"
+
+
+class FileInputs(TypedDict):
+    file_inputs: BatchFileInput
+
+
+class TextInputs(TypedDict):
+    text_inputs: BatchTextInput
+
+
+class IntParameters(TypedDict):
+    param1: int
+
+
+@pytest.fixture
+def stream_server():
+    server = MLServer(__name__)
+
+    @server.route("/stream_files")
+    def stream_files(inputs: FileInputs, parameters: IntParameters) -> Iterator[FileResponse]:
+        for file_input in inputs["file_inputs"].files:
+            yield FileResponse(title=file_input.path, path="processed.img", file_type=FileType.IMG)
+
+    @server.route("/stream_fails")
+    def stream_fails(inputs: FileInputs, parameters: IntParameters) -> Iterator[FileResponse]:
+        yield FileResponse(path="first.img", file_type=FileType.IMG)
+        raise Exception("Model crashed")
+
+    @server.route(
+        "/stream_texts", lambda: TaskSchema(inputs=[BATCHTEXT_INPUT_SCHEMA], parameters=[INT_PARAM_SCHEMA])
+    )
+    def stream_texts(inputs: TextInputs, parameters: IntParameters) -> Iterator[TextResponse]:
+        return (TextResponse(value=t.text.upper()) for t in inputs["text_inputs"].texts)
+
+    @server.route("/batch_texts")
+    def batch_texts(inputs: TextInputs, parameters: IntParameters) -> ResponseBody:
+        texts = [TextResponse(value=t.text.upper()) for t in inputs["text_inputs"].texts]
+        return ResponseBody(root=BatchTextResponse(texts=texts))
+
+    return server
+
+
+FILES_DATA = {
+    "inputs": {"file_inputs": {"files": [{"path": "/a.jpg"}, {"path": "/b.jpg"}]}},
+    "parameters": {"param1": 1},
+}
+TEXTS_DATA = {
+    "inputs": {"text_inputs": {"texts": [{"text": "a"}, {"text": "b"}]}},
+    "parameters": {"param1": 1},
+}
+
+
+def test_generator_results_are_streamed_as_ndjson(stream_server):
+    response = stream_server.app.test_client().post("/stream_files", json=FILES_DATA)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.data.splitlines()]
+    assert [line["title"] for line in lines] == ["/a.jpg", "/b.jpg"]
+    assert all(line["output_type"] == "file" for line in lines)
+
+
+def test_error_while_streaming_ends_with_error_line(stream_server):
+    response = stream_server.app.test_client().post("/stream_fails", json=FILES_DATA)
+    lines = [json.loads(line) for line in response.data.splitlines()]
+    assert lines[0]["path"] == "first.img"
+    assert lines[-1] == {"error": "Exception('Model crashed')", "status": "SERVER_ERROR"}
+
+
+def test_ndjson_lines_rejects_unknown_items():
+    lines = list(ndjson_lines(iter([TextResponse(value="ok"), "not a response"])))
+    assert json.loads(lines[0])["value"] == "ok"
+    assert json.loads(lines[1])["status"] == "SERVER_ERROR"
+
+
+def test_is_stream():
+    assert is_stream(iter([]))
+    assert not is_stream(ResponseBody(root=TextResponse(value="")))
+    assert not is_stream([TextResponse(value="")])
+
+
+def test_collect_stream():
+    assert collect_stream(iter([TextResponse(value="a")])).root == BatchTextResponse(
+        texts=[TextResponse(value="a")]
+    )
+    files = collect_stream(iter([FileResponse(path="p", file_type=FileType.IMG)]))
+    assert isinstance(files.root, BatchFileResponse)
+    with pytest.raises(TypeError):
+        collect_stream(iter([TextResponse(value="a"), FileResponse(path="p", file_type=FileType.IMG)]))
+
+
+def test_cli_collects_streamed_results(stream_server):
+    ml_cli = MLCli(stream_server, argparse.ArgumentParser())
+    ml_cli._setup_cli()
+    parsed_args = ml_cli._parse_args(["stream_texts", "--text_inputs", "a", "b", "--param1", "1"])
+    response = ml_cli._run_cli_and_return(parsed_args, print_response=False)
+    assert response is not None
+    assert [t.value for t in response.root.texts] == ["A", "B"]  # type: ignore
+
+
+class StreamingMockResponse:
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+        self._response = response
+
+    def iter_lines(self):
+        return iter(self._response.data.splitlines())
+
+    def json(self):
+        return self._response.get_json()
+
+
+def forward_to(app):
+    def send(url, json=None, **kwargs):
+        return StreamingMockResponse(app.post(url.removeprefix(BASE_URL), json=json))
+
+    return send
+
+
+@pytest.mark.parametrize("rule", ["/stream_texts", "/batch_texts"])
+def test_client_request_stream(stream_server, rule):
+    client = MLClient(BASE_URL + rule)
+    with patch("requests.Session.post", side_effect=forward_to(stream_server.app.test_client())):
+        items = list(client.request_stream(TEXTS_DATA["inputs"], TEXTS_DATA["parameters"]))
+    assert [item["value"] for item in items] == ["A", "B"]
+
+
+def test_client_request_stream_errors(stream_server):
+    client = MLClient(BASE_URL + "/stream_texts")
+    with patch("requests.Session.post", side_effect=forward_to(stream_server.app.test_client())):
+        items = list(client.request_stream({"wrong": {"text": "a"}}, {"param1": 1}))
+    assert len(items) == 1
+    assert items[0]["status"] == "VALIDATION_ERROR"
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Iterator, TypedDict
+from unittest.mock import patch
+
+import pytest
+from werkzeug.serving import make_server
+
+from flask_ml.flask_ml_client import MLClient
+from flask_ml.flask_ml_client.multipart import MultipartBody, upload_request_body
+from flask_ml.flask_ml_server import MLServer, asgi
+from flask_ml.flask_ml_server.models import *
+
+from .conftest import MockResponse
+
+BASE_URL = "http://127.0.0.1:5000"
+
+
+class SingleFileInput(TypedDict):
+    file_input: FileInput
+
+
+class FileInputs(TypedDict):
+    file_inputs: BatchFileInput
+
+
+class TextParameters(TypedDict):
+    param1: str
+
+
+@pytest.fixture
+def upload_server():
+    server = MLServer(__name__)
+    seen_paths = []
+
+    @server.route("/read_file")
+    def read_file(inputs: SingleFileInput, parameters: TextParameters) -> ResponseBody:
+        path = inputs["file_input"].path
+        seen_paths.append(path)
+        with open(path) as f:
+            return ResponseBody(root=TextResponse(title=os.path.basename(path), value=f.read()))
+
+    @server.route("/read_files")
+    def read_files(inputs: FileInputs, parameters: TextParameters) -> Iterator[TextResponse]:
+        for file_input in inputs["file_inputs"].files:
+            seen_paths.append(file_input.path)
+            with open(file_input.path) as f:
+                yield TextResponse(value=f.read())
+
+    server.seen_paths = seen_paths  # type: ignore
+    return server
+
+
+@pytest.fixture
+def local_files(tmp_path):
+    paths = []
+    for name, content in [("a.txt", "first"), ("b.txt", "second")]:
+        path = tmp_path / name
+        path.write_text(content)
+        paths.append(str(path))
+    return paths
+
+
+def test_multipart_request(upload_server, local_files):
+    request_json = {"inputs": {"file_input": {"path": "upload://doc"}}, "parameters": {"param1": "x"}}
+    with open(local_files[0], "rb") as f:
+        response = upload_server.app.test_client().post(
+            "/read_file",
+            data={"request": json.dumps(request_json), "doc": (f, "../../report.txt")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 200
+        assert response.get_json()["value"] == "first"
+        assert response.get_json()["title"] == "report.txt"
+        response.close()
+    assert not os.path.exists(upload_server.seen_paths[0])
+
+
+def test_streamed_results_can_read_uploads(upload_server, local_files):
+    request_json = {
+        "inputs": {"file_inputs": {"files": [{"path": "upload://a"}, {"path": "upload://b"}]}},
+        "parameters": {"param1": "x"},
+    }
+    with open(local_files[0], "rb") as a, open(local_files[1], "rb") as b:
+        response = upload_server.app.test_client().post(
+            "/read_files",
+            data={"request": json.dumps(request_json), "a": (a, "a.txt"), "b": (b, "b.txt")},
+            content_type="multipart/form-data",
+        )
+        assert [json.loads(line)["value"] for line in response.data.splitlines()] == ["first", "second"]
+        response.close()
+    assert not any(os.path.exists(path) for path in upload_server.seen_paths)
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        ({}, "'request' part"),
+        ({"request": "not json"}, "valid JSON"),
+        (
+            {"request": json.dumps({"inputs": {"file_input": {"path": "upload://x"}}, "parameters": {}})},
+            "no file part",
+        ),
+    ],
+)
+def test_invalid_multipart_requests(upload_server, data, message):
+    client = upload_server.app.test_client()
+    response = client.post("/read_file", data=data, content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "VALIDATION_ERROR"
+    assert message in response.get_json()["error"]
+
+
+def test_upload_request_body(local_files):
+    request_model = RequestBody.model_validate(
+        {
+            "inputs": {
+                "single": {"path": local_files[0]},
+                "batch": {"files": [{"path": local_files[1]}]},
+                "text": {"text": "unchanged"},
+            },
+            "parameters": {},
+        }
+    )
+    request_json, files = upload_request_body(request_model)
+    data = json.loads(request_json)
+    assert data["inputs"]["single"] == {"path": "upload://file0"}
+    assert data["inputs"]["batch"] == {"files": [{"path": "upload://file1"}]}
+    assert data["inputs"]["text"] == {"text": "unchanged"}
+    assert files == {"file0": local_files[0], "file1": local_files[1]}
+    assert request_model.inputs["single"].root.path == local_files[0]  # type: ignore
+
+
+def test_multipart_body_length_matches_content(local_files):
+    body = MultipartBody(b"{}", {"file0": local_files[0], "file1": local_files[1]})
+    content = b"".join(iter(lambda: body.read(7), b""))
+    assert len(content) == len(body)
+    assert content == b"".join(body)
+    assert content.endswith(f"--{body.boundary}--\r\n".encode())
+
+
+def test_multipart_body_quotes_file_names(upload_server, tmp_path):
+    path = tmp_path / 'we"ird\\name\r\nX: y.txt'
+    path.write_text("odd")
+    request_json = {"inputs": {"file_input": {"path": "upload://doc"}}, "parameters": {"param1": "x"}}
+    body = MultipartBody(json.dumps(request_json).encode(), {"doc": str(path)})
+    content = b"".join(body)
+    assert b'; filename="we\\"ird\\\\nameX: y.txt"\r\n' in content
+    response = upload_server.app.test_client().post(
+        "/read_file", data=content, content_type=body.content_type
+    )
+    assert response.status_code == 200
+    assert response.get_json()["value"] == "odd"
+
+
+def test_client_upload(upload_server, local_files):
+    client = MLClient(BASE_URL + "/read_file")
+    test_client = upload_server.app.test_client()
+
+    def send(url, data=None, headers=None, **kwargs):
+        response = test_client.post(url.removeprefix(BASE_URL), data=b"".join(data), headers=headers)
+        return MockResponse(response)
+
+    with patch("requests.Session.post", side_effect=send):
+        response = client.request({"file_input": {"path": local_files[1]}}, {"param1": "x"}, upload=True)
+    assert response["value"] == "second"
+
+
+def test_client_upload_over_http(upload_server, local_files):
+    http_server = make_server("127.0.0.1", 0, upload_server.app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = MLClient(f"http://127.0.0.1:{http_server.server_port}/read_file")
+        response = client.request({"file_input": {"path": local_files[0]}}, {"param1": "x"}, upload=True)
+    finally:
+        http_server.shutdown()
+    assert response["value"] == "first"
+    assert response["title"] == "a.txt"
+    # The server removes the upload after it has sent the response, so give it a moment.
+    deadline = time.monotonic() + 5
+    while os.path.exists(upload_server.seen_paths[0]) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not os.path.exists(upload_server.seen_paths[0])
+
+
+def test_client_upload_missing_file(tmp_path):
+    client = MLClient(BASE_URL + "/read_file")
+    with pytest.raises(FileNotFoundError):
+        client.request({"file_input": {"path": str(tmp_path / "missing.txt")}}, {"param1": "x"}, upload=True)
+
+
+def test_asgi_spools_uploads_to_disk(upload_server, local_files, monkeypatch):
+    spools = []
+    SpooledTemporaryFile = tempfile.SpooledTemporaryFile
+
+    def spooled_file(max_size):
+        spools.append(SpooledTemporaryFile(max_size=max_size))
+        return spools[-1]
+
+    monkeypatch.setattr(asgi, "_SPOOL_MAX_SIZE", 16)
+    monkeypatch.setattr(tempfile, "SpooledTemporaryFile", spooled_file)
+    request_json = {"inputs": {"file_input": {"path": "upload://doc"}}, "parameters": {"param1": "x"}}
+    body = MultipartBody(json.dumps(request_json).encode(), {"doc": local_files[0]})
+    received = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in body]
+    received.append({"type": "http.request", "body": b"", "more_body": False})
+    sent = []
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/read_file",
+        "headers": [(b"content-type", body.content_type.encode())],
+        "query_string": b"",
+    }
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(upload_server.asgi_app()(scope, receive, send))
+    assert sent[0]["status"] == 200
+    assert json.loads(sent[1]["body"])["value"] == "first"
+    assert len(spools) == 1 and spools[0]._rolled and spools[0].closed
+
+
+def test_client_does_not_import_flask():
+    code = (
+        "import sys\n"
+        "import flask_ml.flask_ml_client\n"
+        "print(sorted({m.split('.')[0] for m in sys.modules} & {'flask', 'werkzeug'}))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == "[]"